@@ -23,6 +23,10 @@ export default [
         console: "readonly",
         fetch: "readonly",
         URL: "readonly",
+        setTimeout: "readonly",
+        clearTimeout: "readonly",
+        AbortController: "readonly",
+        TextDecoder: "readonly",
       },
     },
     rules: sharedRules,
@@ -40,6 +44,10 @@ export default [
         confirm: "readonly",
         setInterval: "readonly",
         clearInterval: "readonly",
+        URLSearchParams: "readonly",
+        setTimeout: "readonly",
+        clearTimeout: "readonly",
+        AbortController: "readonly",
         console: "readonly",
       },
     },
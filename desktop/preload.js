@@ -40,6 +40,118 @@ async function request(path, options = {}) {
   return data;
 }
 
+// Last ETag and body per URL, so unchanged GETs are answered with 304 and served from here.
+const validated = new Map();
+
+async function requestCached(path) {
+  const url = toAbsoluteUrl(path);
+  const cached = validated.get(url);
+  const headers = cached ? { 'If-None-Match': cached.etag } : {};
+  const response = await fetch(url, { method: 'GET', headers });
+  if (response.status === 304 && cached) {
+    return cached.data;
+  }
+  const raw = await response.text();
+  let data;
+  try {
+    data = JSON.parse(raw);
+  } catch {
+    data = raw;
+  }
+  if (!response.ok) {
+    const err = new Error(`Request failed: ${response.status}`);
+    err.status = response.status;
+    err.payload = data;
+    throw err;
+  }
+  const etag = response.headers.get('ETag');
+  if (etag) {
+    validated.set(url, { etag, data });
+  } else {
+    validated.delete(url);
+  }
+  return data;
+}
+
+function dispatchEvent(block, onEvent) {
+  let event = 'message';
+  let id = null;
+  const dataLines = [];
+  block.split('\n').forEach((line) => {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('id:')) {
+      id = line.slice(3).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trim());
+    }
+  });
+  if (!dataLines.length) {
+    return;
+  }
+  let data;
+  try {
+    data = JSON.parse(dataLines.join('\n'));
+  } catch {
+    data = dataLines.join('\n');
+  }
+  onEvent(event, data, id);
+}
+
+async function stream(path, options = {}, onEvent = () => {}) {
+  const url = toAbsoluteUrl(path);
+  const init = { ...options };
+  init.headers = {
+    'Content-Type': 'application/json',
+    Accept: 'text/event-stream',
+    ...(options.headers || {}),
+  };
+  const response = await fetch(url, init);
+  if (!response.ok) {
+    const raw = await response.text();
+    let data;
+    try {
+      data = JSON.parse(raw);
+    } catch {
+      data = raw;
+    }
+    const err = new Error(`Request failed: ${response.status}`);
+    err.status = response.status;
+    err.payload = data;
+    throw err;
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) {
+      break;
+    }
+    buffer += decoder.decode(value, { stream: true });
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      dispatchEvent(buffer.slice(0, boundary), onEvent);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+    }
+  }
+  if (buffer.trim()) {
+    dispatchEvent(buffer, onEvent);
+  }
+}
+
+// Long-lived stream (e.g. /events); returns a function that closes it.
+// onClose gets the error that ended the stream, or null if it ended cleanly or was closed.
+function subscribe(path, onEvent = () => {}, onClose = () => {}) {
+  const controller = new AbortController();
+  stream(path, { method: 'GET', signal: controller.signal }, onEvent).then(
+    () => onClose(null),
+    (error) => onClose(controller.signal.aborted ? null : error),
+  );
+  return () => controller.abort();
+}
+
 contextBridge.exposeInMainWorld('ekupkaran', {
   getBackendHost: () => state.backendHost,
   setBackendHost: (host) => {
@@ -47,5 +159,8 @@ contextBridge.exposeInMainWorld('ekupkaran', {
     return state.backendHost;
   },
   request,
+  requestCached,
+  stream,
+  subscribe,
   openExternal: (url) => shell.openExternal(url),
 });
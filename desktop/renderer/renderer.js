@@ -74,7 +74,10 @@ const state = {
 		status: { ok: false, message: 'Waiting…', documents: null, backend: {} },
 	plugins: [],
 	documents: [],
+	documentsLoaded: false,
 	documentsLoading: false,
+	// Cursor of the next /documents page, or null once the list is complete.
+	documentsNext: null,
 	selectedDocument: null,
 	documentDetail: null,
 	documentDetailLoading: false,
@@ -94,6 +97,18 @@ const state = {
 	preferences: loadPreferences(),
 	auditTrail: [],
 	quickActionRunning: null,
+	// Change feed (/events): last sequence seen, the runtime's epoch, and the
+	// sequence the last status snapshot already accounts for.
+	feed: {
+		seq: null,
+		epoch: null,
+		statusSeq: 0,
+		connected: false,
+		close: null,
+		token: 0,
+		retryTimer: null,
+		retryDelay: 1000,
+	},
 };
 
 state.plan.params = {
@@ -102,7 +117,7 @@ state.plan.params = {
 };
 state.plan.includeKnowledge = state.preferences.planDefaults.includeKnowledge;
 
-let statusInterval = null;
+let renderTimer = null;
 
 function applyBackendHost(host) {
 	const fallback = window.ekupkaran.getBackendHost();
@@ -126,31 +141,35 @@ function updateStatusIndicator() {
 	statusDotElem.style.background = state.status.ok ? '#22c55e' : '#f97316';
 }
 
+function applyStatus(data) {
+	state.status = {
+		ok: true,
+		message: data.ready === false ? 'Online · warming up' : 'Online',
+		documents: data.documents ?? data.document_count ?? 0,
+		backend: data.backend || {},
+	};
+}
+
+function applyOffline(error) {
+	const message = error?.payload?.error || error?.message || String(error);
+	state.status = {
+		ok: false,
+		message: `Offline · ${message}`,
+		documents: null,
+		backend: {},
+	};
+}
+
 async function refreshStatus({ silent = false } = {}) {
 	try {
 		const data = await window.ekupkaran.request('/health', { method: 'GET' });
-		state.status = {
-			ok: true,
-			message: 'Online',
-			documents: data.documents ?? data.document_count ?? 0,
-			backend: data.backend || {},
-		};
-		updateStatusIndicator();
-		if (!silent && state.route === 'dashboard') {
-			renderDashboard();
-		}
+		applyStatus(data);
 	} catch (error) {
-		const message = error?.payload?.error || error?.message || String(error);
-		state.status = {
-			ok: false,
-			message: `Offline · ${message}`,
-				documents: null,
-				backend: {},
-		};
-		updateStatusIndicator();
-		if (!silent && state.route === 'dashboard') {
-			renderDashboard();
-		}
+		applyOffline(error);
+	}
+	updateStatusIndicator();
+	if (!silent && state.route === 'dashboard') {
+		renderDashboard();
 	}
 }
 
@@ -165,15 +184,29 @@ async function loadPlugins() {
 	renderPlugins();
 }
 
+const DOCUMENTS_PAGE = 50;
+
+function documentsPath(after) {
+	const params = new URLSearchParams({ limit: String(DOCUMENTS_PAGE), fields: 'id,source,ts,preview' });
+	if (after) {
+		params.set('after', after);
+	}
+	return `/documents?${params.toString()}`;
+}
+
 async function loadDocuments() {
 	state.documentsLoading = true;
 	renderKnowledge();
 	try {
-		const data = await window.ekupkaran.request('/documents', { method: 'GET' });
-		state.documents = Array.isArray(data.documents) ? data.documents : [];
+		// Revalidated with the runtime's ETag; an unchanged store answers 304.
+		const data = await window.ekupkaran.requestCached(documentsPath());
+		state.documents = Array.isArray(data.documents) ? [...data.documents] : [];
+		state.documentsNext = data.next || null;
+		state.documentsLoaded = true;
 	} catch (error) {
 		console.warn('Failed to load documents', error);
 		state.documents = [];
+		state.documentsNext = null;
 	} finally {
 		state.documentsLoading = false;
 		if (state.route === 'knowledge') {
@@ -182,6 +215,24 @@ async function loadDocuments() {
 	}
 }
 
+async function loadMoreDocuments() {
+	if (!state.documentsNext) {
+		return;
+	}
+	try {
+		const data = await window.ekupkaran.requestCached(documentsPath(state.documentsNext));
+		const known = new Set(state.documents.map((doc) => doc.id));
+		const page = Array.isArray(data.documents) ? data.documents : [];
+		state.documents = state.documents.concat(page.filter((doc) => !known.has(doc.id)));
+		state.documentsNext = data.next || null;
+	} catch (error) {
+		console.warn('Failed to load more documents', error);
+	}
+	if (state.route === 'knowledge') {
+		renderKnowledgePanels();
+	}
+}
+
 async function fetchDocumentDetail(id) {
 	if (!id) {
 		state.selectedDocument = null;
@@ -220,8 +271,11 @@ async function deleteDocument(id) {
 			state.selectedDocument = null;
 			state.documentDetail = null;
 		}
-		await loadDocuments();
-		await loadAudit({ silent: true });
+		// With the change feed connected, the document.deleted and audit events patch the view.
+		if (!state.feed.connected) {
+			await loadDocuments();
+			await loadAudit({ silent: true });
+		}
 	} catch (error) {
 		alert(error?.payload?.error || error?.message || 'Failed to delete document.');
 	}
@@ -298,6 +352,8 @@ async function runPlan(goal, params, includeKnowledge, metadata = {}) {
 	}
 	state.plan.loading = true;
 	state.plan.error = null;
+	state.plan.goal = goal;
+	state.plan.actions = [];
 	renderPlanner();
 
 	let knowledgeHits = [];
@@ -321,17 +377,32 @@ async function runPlan(goal, params, includeKnowledge, metadata = {}) {
 			: goal;
 
 	try {
-		const data = await window.ekupkaran.request('/plan', {
-			method: 'POST',
-			body: JSON.stringify({
-				goal: enrichedGoal,
-				params: {
-					temperature: params.temperature,
-					max_tokens: params.maxTokens,
-				},
-			}),
-		});
-		const actions = Array.isArray(data.actions) ? data.actions : [];
+		const actions = [];
+		await window.ekupkaran.stream(
+			'/plan',
+			{
+				method: 'POST',
+				body: JSON.stringify({
+					goal: enrichedGoal,
+					stream: true,
+					params: {
+						temperature: params.temperature,
+						max_tokens: params.maxTokens,
+					},
+				}),
+			},
+			(event, data) => {
+				if (event !== 'action' || !data || !data.action) {
+					return;
+				}
+				// Surface each step as soon as the runtime finishes generating it.
+				actions.push(data.action);
+				state.plan.actions = actions.slice();
+				if (state.route === 'planner') {
+					renderPlanner();
+				}
+			}
+		);
 		state.plan = {
 			...state.plan,
 			goal,
@@ -344,7 +415,9 @@ async function runPlan(goal, params, includeKnowledge, metadata = {}) {
 			includeKnowledge,
 		};
 		await logPlan(goal, actions, { ...metadata, includeKnowledge, params });
-		await loadAudit({ silent: true });
+		if (!state.feed.connected) {
+			await loadAudit({ silent: true });
+		}
 	} catch (error) {
 		const message = error?.payload?.error || error?.message || 'Plan failed';
 		state.plan.loading = false;
@@ -506,7 +579,7 @@ function renderDashboard() {
 	`;
 }
 
-function renderKnowledge() {
+function documentsPanelMarkup() {
 	const documentsList = state.documents
 		.map(
 			(doc) => `
@@ -524,7 +597,35 @@ function renderKnowledge() {
 				</div>`
 		)
 		.join('');
+	const more = state.documentsNext
+		? '<button type="button" class="btn-secondary" data-action="more">Load more</button>'
+		: '';
+	return state.documentsLoading ? '<p>Loading documents…</p>' : documentsList ? `<div id="documents-list" class="list">${documentsList}</div>${more}` : '<p class="muted">No documents indexed yet.</p>';
+}
+
+function documentDetailMarkup() {
+	return state.documentDetailLoading
+		? '<p>Loading…</p>'
+		: state.documentDetail
+		? state.documentDetail.error
+			? `<p class="error">${state.documentDetail.error}</p>`
+			: `<pre>${state.documentDetail.text || JSON.stringify(state.documentDetail, null, 2)}</pre>`
+		: '<p class="muted">Select a document to view its full text.</p>';
+}
+
+// Feed updates only replace the document list and detail, so the forms keep their input.
+function renderKnowledgePanels() {
+	const documentsPanel = document.getElementById('documents-panel');
+	const detailPanel = document.getElementById('document-detail');
+	if (!documentsPanel || !detailPanel) {
+		renderKnowledge();
+		return;
+	}
+	documentsPanel.innerHTML = documentsPanelMarkup();
+	detailPanel.innerHTML = documentDetailMarkup();
+}
 
+function renderKnowledge() {
 	const queryResults = state.queryHits
 		.map(
 			(hit, idx) => `
@@ -547,19 +648,11 @@ function renderKnowledge() {
 					<button type="submit" class="btn-primary">Index snippet</button>
 				</form>
 				<h3>Documents</h3>
-				${state.documentsLoading ? '<p>Loading documents…</p>' : documentsList ? `<div id="documents-list" class="list">${documentsList}</div>` : '<p class="muted">No documents indexed yet.</p>'}
+				<div id="documents-panel">${documentsPanelMarkup()}</div>
 			</div>
 			<div>
 				<h3>Document detail</h3>
-				${
-					state.documentDetailLoading
-						? '<p>Loading…</p>'
-						: state.documentDetail
-						? state.documentDetail.error
-							? `<p class="error">${state.documentDetail.error}</p>`
-							: `<pre>${state.documentDetail.text || JSON.stringify(state.documentDetail, null, 2)}</pre>`
-						: '<p class="muted">Select a document to view its full text.</p>'
-				}
+				<div id="document-detail">${documentDetailMarkup()}</div>
 			</div>
 		</section>
 		<section>
@@ -602,17 +695,23 @@ function renderKnowledge() {
 				body: JSON.stringify({ text, source }),
 			});
 			document.getElementById('index-text').value = '';
-			await loadDocuments();
-			await loadAudit({ silent: true });
+			if (!state.feed.connected) {
+				await loadDocuments();
+				await loadAudit({ silent: true });
+			}
 		} catch (error) {
 			alert(error?.message || 'Failed to index snippet');
 		}
 	});
 
-	const documentsListElem = document.getElementById('documents-list');
+	const documentsListElem = document.getElementById('documents-panel');
 	if (documentsListElem) {
 		documentsListElem.addEventListener('click', (event) => {
 				const button = event.target.closest('[data-action]');
+				if (button && button.dataset.action === 'more') {
+					loadMoreDocuments();
+					return;
+				}
 				if (button && button.dataset.action === 'delete') {
 					event.stopPropagation();
 					const docId = button.dataset.docId;
@@ -675,7 +774,7 @@ function renderPlanner() {
 			<div>
 				<h3>Result</h3>
 				${
-					state.plan.loading
+					state.plan.loading && !state.plan.actions.length
 						? '<p>Generating plan…</p>'
 						: state.plan.error
 						? `<p class="error">${state.plan.error}</p>`
@@ -698,7 +797,11 @@ function renderPlanner() {
 										.join('')}
 								</tbody>
 							</table>
-							<p class="muted">Generated at ${formatTimestamp(state.plan.lastRunAt)}</p>
+							<p class="muted">${
+								state.plan.loading
+									? 'Generating more steps…'
+									: `Generated at ${formatTimestamp(state.plan.lastRunAt)}`
+							}</p>
 						`
 						: '<p class="muted">Fill out the form and generate a plan.</p>'
 				}
@@ -793,7 +896,7 @@ function renderSettings() {
 					</label>
 					<label class="toggle">
 						<input id="pref-auto-refresh" type="checkbox" ${state.preferences.autoRefreshStatus ? 'checked' : ''} />
-						Auto-refresh status every 30s
+						Live updates (status, documents, audit)
 					</label>
 					<button type="button" id="reset-preferences" class="btn-secondary">Reset to defaults</button>
 				</div>
@@ -814,7 +917,13 @@ function renderSettings() {
 	hostForm.addEventListener('submit', (event) => {
 		event.preventDefault();
 		applyBackendHost(hostInput.value);
+		state.feed.seq = null;
+		state.feed.epoch = null;
+		disconnectFeed();
+		state.documentsLoaded = false;
+		state.documentsNext = null;
 		refreshStatus();
+		ensureLiveUpdates();
 		alert('Backend host updated.');
 	});
 
@@ -851,7 +960,7 @@ function renderSettings() {
 	autoRefreshToggle.addEventListener('change', () => {
 		state.preferences.autoRefreshStatus = autoRefreshToggle.checked;
 		savePreferences(state.preferences);
-		ensureAutoRefresh();
+		ensureLiveUpdates();
 	});
 
 	resetPreferencesBtn.addEventListener('click', () => {
@@ -860,7 +969,7 @@ function renderSettings() {
 		state.plan.params = { ...state.preferences.planDefaults };
 		state.plan.includeKnowledge = state.preferences.planDefaults.includeKnowledge;
 		renderSettings();
-		ensureAutoRefresh();
+		ensureLiveUpdates();
 		renderPlanner();
 		if (state.route === 'dashboard') {
 			renderDashboard();
@@ -874,7 +983,7 @@ async function navTo(route) {
 		renderDashboard();
 	} else if (route === 'knowledge') {
 		renderKnowledge();
-		if (!state.documents.length) {
+		if (!state.documentsLoaded) {
 			await loadDocuments();
 		}
 	} else if (route === 'planner') {
@@ -884,18 +993,149 @@ async function navTo(route) {
 	}
 }
 
-function ensureAutoRefresh() {
-	if (statusInterval) {
-		clearInterval(statusInterval);
-		statusInterval = null;
+function scheduleRender() {
+	if (renderTimer) {
+		return;
+	}
+	// Coalesce bursts (e.g. a bulk ingest) into one repaint.
+	renderTimer = setTimeout(() => {
+		renderTimer = null;
+		updateStatusIndicator();
+		if (state.route === 'dashboard') {
+			renderDashboard();
+		} else if (state.route === 'knowledge') {
+			renderKnowledgePanels();
+		}
+	}, 100);
+}
+
+async function resyncFromFeed() {
+	await refreshStatus({ silent: true });
+	if (state.documentsLoaded) {
+		await loadDocuments();
+	}
+	await loadAudit({ silent: true });
+	scheduleRender();
+}
+
+function applyDocumentIndexed(data, seq) {
+	if (state.documentsLoaded && !state.documents.some((doc) => doc.id === data.id)) {
+		state.documents.unshift({ id: data.id, source: data.source, ts: data.ts, preview: data.preview });
+	}
+	if (typeof state.status.documents === 'number' && seq > state.feed.statusSeq) {
+		state.status.documents += 1;
 	}
+}
+
+function applyDocumentDeleted(data, seq) {
+	const ids = new Set(data.ids || []);
+	state.documents = state.documents.filter((doc) => !ids.has(doc.id));
+	if (ids.has(state.selectedDocument)) {
+		state.selectedDocument = null;
+		state.documentDetail = null;
+	}
+	if (data.user_id === null || data.user_id === undefined) {
+		// Deleted across partitions; only the runtime knows how many were ours.
+		refreshStatus({ silent: true });
+	} else if (typeof state.status.documents === 'number' && seq > state.feed.statusSeq) {
+		state.status.documents = Math.max(0, state.status.documents - ids.size);
+	}
+}
+
+function handleFeedEvent(event, data, id) {
+	const seq = id === null || id === undefined ? null : Number(id);
+	if (seq !== null) {
+		state.feed.seq = seq;
+	}
+	if (event === 'status') {
+		state.feed.connected = true;
+		state.feed.retryDelay = 1000;
+		state.feed.epoch = data.epoch;
+		state.feed.statusSeq = data.seq;
+		if (state.feed.seq === null) {
+			state.feed.seq = data.seq;
+		}
+		applyStatus(data);
+	} else if (event === 'reset' || event === 'store.reloaded') {
+		resyncFromFeed();
+	} else if (event === 'document.indexed') {
+		applyDocumentIndexed(data, seq);
+	} else if (event === 'document.deleted') {
+		applyDocumentDeleted(data, seq);
+	} else if (event === 'audit') {
+		if (state.preferences.auditLogging) {
+			state.auditTrail = [data, ...state.auditTrail].slice(0, 12);
+		}
+	} else if (event === 'ready') {
+		if (state.status.ok) {
+			state.status.message = data.ready ? 'Online' : 'Online · warming up';
+		}
+	} else {
+		return;
+	}
+	scheduleRender();
+}
+
+function connectFeed() {
+	if (state.feed.close) {
+		return;
+	}
+	clearTimeout(state.feed.retryTimer);
+	state.feed.retryTimer = null;
+	const token = ++state.feed.token;
+	const params = new URLSearchParams();
+	if (state.feed.seq !== null && state.feed.epoch) {
+		params.set('since', String(state.feed.seq));
+		params.set('epoch', state.feed.epoch);
+	}
+	const query = params.toString();
+	state.feed.close = window.ekupkaran.subscribe(
+		`/events${query ? `?${query}` : ''}`,
+		handleFeedEvent,
+		(error) => {
+			if (token !== state.feed.token) {
+				return;
+			}
+			state.feed.close = null;
+			state.feed.connected = false;
+			if (error) {
+				applyOffline(error);
+				scheduleRender();
+			}
+			state.feed.retryTimer = setTimeout(connectFeed, state.feed.retryDelay);
+			state.feed.retryDelay = Math.min(state.feed.retryDelay * 2, 30000);
+		},
+	);
+}
+
+function disconnectFeed() {
+	state.feed.token += 1;
+	clearTimeout(state.feed.retryTimer);
+	state.feed.retryTimer = null;
+	if (state.feed.close) {
+		state.feed.close();
+		state.feed.close = null;
+	}
+	state.feed.connected = false;
+}
+
+// Replaces the old 30 s /health poll: the runtime pushes changes over /events.
+function ensureLiveUpdates() {
 	if (state.preferences.autoRefreshStatus) {
-		statusInterval = setInterval(() => refreshStatus({ silent: true }), 30000);
+		connectFeed();
+	} else {
+		disconnectFeed();
 	}
 }
 
 function attachGlobalListeners() {
-	document.getElementById('status-refresh').addEventListener('click', () => refreshStatus());
+	document.getElementById('status-refresh').addEventListener('click', () => {
+		refreshStatus();
+		if (state.preferences.autoRefreshStatus && !state.feed.close) {
+			state.feed.retryDelay = 1000;
+			connectFeed();
+		}
+	});
 	document.getElementById('open-docs').addEventListener('click', () => {
 		window.ekupkaran.openExternal('https://github.com/gigakumar/ekupkaran');
 	});
@@ -913,8 +1153,8 @@ async function init() {
 	renderQuickActions();
 	attachGlobalListeners();
 	updateStatusIndicator();
-	ensureAutoRefresh();
 	await refreshStatus({ silent: true });
+	ensureLiveUpdates();
 	await loadPlugins();
 	await loadAudit({ silent: true });
 	await navTo('dashboard');
@@ -3,14 +3,23 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import os
 import signal
 import sys
 import threading
 import time
+from concurrent import futures
 from typing import Optional
 
-from core.server import create_server
+from core import audit, tracing
+from core.model_adapter import ModelAdapter
+from core.orchestrator import Orchestrator
+from core.scheduler import Scheduler
+from core.server import create_server, get_loop, rpc_metrics
+from core.shards import shard_metrics
+from core.vector_store import VectorStore
+from tools import mlx_runtime
 from tools.mlx_runtime import app as mlx_app
 from werkzeug.serving import make_server
 
@@ -20,7 +29,8 @@ class _FlaskServer(threading.Thread):
         super().__init__(daemon=True)
         self._host = host
         self._port = port
-        self._server = make_server(host, port, mlx_app)
+        # Threaded, so long-lived /events streams do not hold up other requests.
+        self._server = make_server(host, port, mlx_app, threaded=True)
         self._ctx = mlx_app.app_context()
 
     def run(self) -> None:
@@ -34,6 +44,48 @@ class _FlaskServer(threading.Thread):
         self._server.shutdown()
 
 
+# Where the gRPC service kept its store before it moved under the data directory.
+LEGACY_STORE_PATH = "/tmp/ondevice_store.db"
+
+
+def _migrate_legacy_store(store: VectorStore, legacy: str = LEGACY_STORE_PATH) -> int:
+    """Fold the old gRPC store into ``store`` once, then set the old file aside."""
+    if not os.path.exists(legacy) or os.path.realpath(legacy) == os.path.realpath(store.path):
+        return 0
+    imported = store.import_sqlite(legacy)
+    os.replace(legacy, legacy + ".migrated")
+    audit.write_event({"type": "documents_migrated", "source": legacy, "count": imported})
+    return imported
+
+
+def _start_background_jobs(orchestrator: Orchestrator) -> Scheduler:
+    """Housekeeping that should only run while the daemon is otherwise quiet."""
+    scheduler = Scheduler(max_parallel=1, loop=get_loop())
+
+    async def _purge_plan_cache() -> None:
+        orchestrator.plan_cache.purge_expired()
+
+    async def _rotate_audit_log() -> None:
+        await asyncio.to_thread(audit.rotate)
+
+    async def _compact_store() -> None:
+        await asyncio.to_thread(orchestrator.store.compact)
+
+    scheduler.add_interval_job("plan-cache-purge", _purge_plan_cache, 60, priority=1,
+                               jitter=5, when_idle=True, max_delay=600, initial_delay=60)
+    scheduler.add_interval_job("audit-rotate", _rotate_audit_log, 300, priority=0,
+                               jitter=30, when_idle=True, max_delay=3600, initial_delay=30)
+    scheduler.add_interval_job("store-compact", _compact_store, 900, priority=0,
+                               jitter=60, when_idle=True, max_delay=6 * 3600, initial_delay=300)
+    mlx_runtime.register_metrics("scheduler", scheduler.metrics)
+    mlx_runtime.register_metrics("dedup", orchestrator.dedup_stats)
+    mlx_runtime.register_metrics("rpc", rpc_metrics)
+    mlx_runtime.register_metrics("store", lambda: {**orchestrator.store.io_metrics(),
+                                                   "async": orchestrator.astore.metrics(),
+                                                   "shards": shard_metrics()})
+    return scheduler
+
+
 def _parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Launch the automation daemon.")
     parser.add_argument("--grpc-host", default="[::]", help="Host/interface for gRPC server")
@@ -41,6 +93,26 @@ def _parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
     parser.add_argument("--mlx-host", default="127.0.0.1", help="Host/interface for MLX HTTP runtime")
     parser.add_argument("--mlx-port", type=int, default=9000, help="Port for MLX HTTP runtime")
     parser.add_argument("--models-dir", help="Override ML models directory", default=None)
+    parser.add_argument("--planner-bundle", default=None, help="Signed model bundle (.zip) to load the planner from")
+    parser.add_argument("--bundle-pubkey", default=None, help="Base64 ed25519 key the bundle manifest must verify against")
+    parser.add_argument("--allow-unsigned-bundle", action="store_true",
+                        help="Load a planner bundle without a --bundle-pubkey, checking only its digests")
+    parser.add_argument(
+        "--warmup-policy",
+        choices=("queue", "fail"),
+        default=None,
+        help="How requests arriving before warmup completes are handled (default: queue)",
+    )
+    parser.add_argument("--store-path", default=None,
+                        help="SQLite store shared by gRPC and HTTP (default: <data dir>/store.db)")
+    parser.add_argument("--restore", default=None, metavar="SNAPSHOT",
+                        help="Fill an empty store from a snapshot (see `cli.index snapshot`) during warmup")
+    parser.add_argument("--store-shards", type=int, default=None,
+                        help="Search the vector store with this many worker processes (0 = in-process)")
+    parser.add_argument("--dedup", choices=("link", "drop", "off"), default=None,
+                        help="Near-duplicate handling at ingest (default: link)")
+    parser.add_argument("--trace-sample", type=float, default=None, help="Fraction of requests to trace (0.0-1.0)")
+    parser.add_argument("--trace-log", default=None, help="JSONL file receiving trace spans")
     return parser.parse_args(argv)
 
 
@@ -49,16 +121,63 @@ def main(argv: Optional[list[str]] = None) -> int:
 
     if args.models_dir:
         os.environ["ML_MODELS_DIR"] = os.path.abspath(args.models_dir)
+    if args.planner_bundle:
+        os.environ["PLANNER_BUNDLE_PATH"] = os.path.abspath(args.planner_bundle)
+    if args.bundle_pubkey:
+        os.environ["PLANNER_BUNDLE_PUBKEY"] = args.bundle_pubkey
+    if args.allow_unsigned_bundle:
+        os.environ["PLANNER_BUNDLE_ALLOW_UNSIGNED"] = "1"
+    if args.dedup:
+        os.environ["ONDEVICE_DEDUP"] = args.dedup
+    if args.store_path:
+        os.environ["ONDEVICE_STORE_PATH"] = os.path.abspath(args.store_path)
+    if args.store_shards is not None:
+        os.environ["ONDEVICE_STORE_SHARDS"] = str(args.store_shards)
+    if args.trace_sample is not None or args.trace_log:
+        tracing.configure(sample_rate=args.trace_sample, path=args.trace_log)
+    if args.warmup_policy:
+        mlx_runtime.configure_warmup(policy=args.warmup_policy)
+
+    runtime_host = "127.0.0.1" if args.mlx_host in ("0.0.0.0", "::", "") else args.mlx_host
+    model = ModelAdapter(url=f"http://{runtime_host}:{args.mlx_port}")
+    # gRPC calls wait on this (within their deadline) until the store is open.
+    pending: "futures.Future[Orchestrator]" = futures.Future()
+    store: VectorStore | None = None
+
+    def _open_store() -> VectorStore:
+        # One store for both front ends: the runtime's /index, /query and
+        # /documents see what gRPC indexed and vice versa.
+        nonlocal store
+        try:
+            store = VectorStore()
+            if args.restore and not store.stats()["documents"]:
+                restored = store.restore(args.restore)
+                print(f"Restored {restored['documents']} documents from {args.restore}")
+            migrated = _migrate_legacy_store(store)
+            if migrated:
+                print(f"Migrated {migrated} documents from {LEGACY_STORE_PATH} into {store.path}")
+            pending.set_result(Orchestrator(store=store, model=model))
+        except BaseException as exc:
+            pending.set_exception(exc)
+            raise
+        return store
+
+    mlx_runtime.configure_store_opener(_open_store)
 
     flask_server = _FlaskServer(host=args.mlx_host, port=args.mlx_port)
     flask_server.start()
-
-    grpc_server = create_server(host=args.grpc_host, port=args.grpc_port)
+    grpc_server = create_server(host=args.grpc_host, port=args.grpc_port, orchestrator=pending)
     grpc_server.start()
 
     print(f"MLX runtime listening http://{args.mlx_host}:{args.mlx_port}")
     print(f"gRPC server listening {args.grpc_host}:{args.grpc_port}")
 
+    # Both servers are bound; open (and restore or migrate) the store, then
+    # load documents and the model in the background. Progress is reported
+    # on /ready.
+    mlx_runtime.start_warmup()
+    scheduler: Scheduler | None = None
+
     stop_event = threading.Event()
 
     def _handle_signal(signum, frame):  # type: ignore[unused-argument]
@@ -69,10 +188,18 @@ def main(argv: Optional[list[str]] = None) -> int:
 
     try:
         while not stop_event.is_set():
+            if scheduler is None and pending.done() and pending.exception() is None:
+                scheduler = _start_background_jobs(pending.result())
             time.sleep(0.5)
     finally:
+        if scheduler is not None:
+            scheduler.cancel_all()
         grpc_server.stop(grace=0)
         flask_server.shutdown()
+        if pending.done() and pending.exception() is None:
+            pending.result().close()
+        if store is not None:
+            store.close()
 
     return 0
 
@@ -0,0 +1,257 @@
+"""Bulk ingest for ``cli.index bulk``: many documents over one channel.
+
+Records come from files, directories (walked recursively) or JSONL (``.jsonl``
+files, or ``-`` for stdin; one ``{"text": ..., "source": ...}`` object per
+line). They are sent as ``IndexText`` calls on a single channel with up to
+``in_flight`` calls outstanding, so the round trips overlap instead of being
+paid one process start at a time.
+
+Each acknowledged record's key (a hash of source and text) is appended to a
+state file. A rerun after an interruption skips everything already
+acknowledged. Records that failed are not written there and are retried on
+the next run. The state file is flushed every ``flush_every`` acknowledgements,
+so a crash loses at most that many entries (those records are sent again).
+
+Calls that fail with a retryable status are rescheduled after an exponential
+backoff. They keep their in-flight slot while they wait, but the loop goes on
+settling other calls in the meantime.
+"""
+from __future__ import annotations
+
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import queue
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, TextIO, Tuple, cast
+
+import grpc
+
+from core import assistant_pb2 as pb_module
+
+pb = cast(Any, pb_module)
+
+TEXT_SUFFIXES = (".txt", ".md", ".markdown", ".rst", ".html", ".htm", ".csv", ".log")
+# Comfortably under gRPC's default 4 MiB message limit.
+MAX_BYTES = 3 << 20
+RETRYABLE = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.RESOURCE_EXHAUSTED, grpc.StatusCode.DEADLINE_EXCEEDED)
+
+
+@dataclass
+class Record:
+    text: str
+    source: str
+    origin: str
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha256(f"{self.source}\0{self.text}".encode("utf-8")).hexdigest()[:32]
+
+
+class Invalid(Exception):
+    """An input that cannot become a record; counted and skipped."""
+
+
+def _read_jsonl(lines: Iterable[str], origin: str, default_source: str) -> Iterator[Record | Invalid]:
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+            text = obj["text"] if isinstance(obj, dict) else None
+        except (ValueError, KeyError):
+            text = None
+        if not isinstance(text, str) or not text.strip():
+            yield Invalid(f"{origin}:{n}: expected an object with a non-empty 'text'")
+            continue
+        yield Record(text=text, source=str(obj.get("source") or default_source), origin=f"{origin}:{n}")
+
+
+def _read_file(path: str, default_source: str, max_bytes: int) -> Iterator[Record | Invalid]:
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as fh:
+            yield from _read_jsonl(fh, path, default_source)
+        return
+    if os.path.getsize(path) > max_bytes:
+        yield Invalid(f"{path}: larger than {max_bytes} bytes")
+        return
+    try:
+        with open(path, encoding="utf-8") as fh:
+            text = fh.read()
+    except UnicodeDecodeError:
+        yield Invalid(f"{path}: not UTF-8 text")
+        return
+    if text.strip():
+        yield Record(text=text, source=path, origin=path)
+
+
+def iter_records(inputs: Sequence[str], default_source: str = "bulk", suffixes: Sequence[str] = TEXT_SUFFIXES,
+                 max_bytes: int = MAX_BYTES, stdin: Optional[TextIO] = None) -> Iterator[Record | Invalid]:
+    """Yield records (or ``Invalid`` markers) in a stable order, so resumes line up."""
+    allowed = tuple(s.lower() for s in suffixes) + (".jsonl",)
+    for item in inputs:
+        if item == "-":
+            yield from _read_jsonl(stdin or sys.stdin, "<stdin>", default_source)
+        elif os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(files):
+                    if name.lower().endswith(allowed):
+                        yield from _read_file(os.path.join(root, name), default_source, max_bytes)
+        elif os.path.isfile(item):
+            yield from _read_file(item, default_source, max_bytes)
+        else:
+            yield Invalid(f"{item}: no such file or directory")
+
+
+def default_state_path(inputs: Sequence[str]) -> str:
+    """One state file per distinct set of inputs, under the data directory."""
+    root = os.environ.get("EKUPKARAN_DATA_DIR") or os.path.join(os.path.expanduser("~"), ".ekupkaran")
+    name = hashlib.sha1("\0".join(sorted(i if i == "-" else os.path.abspath(i) for i in inputs)).encode()).hexdigest()
+    return os.path.join(root, "bulk", f"{name[:16]}.state")
+
+
+class State:
+    """Append-only log of acknowledged record keys."""
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if restart and os.path.exists(path):
+            os.unlink(path)
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                self.done.update(line.strip() for line in fh if line.strip())
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def mark(self, key: str) -> None:
+        self.done.add(key)
+        self._fh.write(key + "\n")
+
+    def flush(self) -> None:
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class _Progress:
+    def __init__(self, stream: Optional[TextIO], interval: float):
+        self.stream = stream
+        self.interval = interval
+        self.started = time.monotonic()
+        self._last = 0.0
+
+    def rate(self, count: int) -> float:
+        elapsed = time.monotonic() - self.started
+        return count / elapsed if elapsed > 0 else 0.0
+
+    def show(self, counts: Dict[str, int], final: bool = False) -> None:
+        if self.stream is None:
+            return
+        now = time.monotonic()
+        if not final and now - self._last < self.interval:
+            return
+        self._last = now
+        self.stream.write(f"\rindexed {counts['indexed']}  skipped {counts['skipped']}  failed {counts['failed']}  "
+                          f"{self.rate(counts['indexed']):.1f} docs/s" + ("\n" if final else ""))
+        self.stream.flush()
+
+
+def run_bulk(stub: Any, records: Iterable[Record | Invalid], state: State, *, in_flight: int = 16,
+             user_id: str = "cli", request_prefix: str = "bulk", timeout: Optional[float] = 60.0, retries: int = 3,
+             backoff: float = 0.5, progress: Optional[TextIO] = None, interval: float = 1.0,
+             flush_every: int = 100) -> Dict[str, Any]:
+    """Send ``records`` with at most ``in_flight`` outstanding calls and return a summary."""
+    in_flight = max(1, in_flight)
+    flush_every = max(1, flush_every)
+    counts = {"indexed": 0, "skipped": 0, "failed": 0, "invalid": 0, "retried": 0}
+    errors: List[str] = []
+    done: "queue.Queue[Tuple[Record, int, grpc.Future]]" = queue.Queue()
+    # Retries waiting out their backoff: (due, tiebreak, record, attempt).
+    delayed: List[Tuple[float, int, Record, int]] = []
+    order = itertools.count()
+    pending = 0
+    seq = 0
+    meter = _Progress(progress, interval)
+
+    def submit(record: Record, attempt: int) -> None:
+        nonlocal pending, seq
+        seq += 1
+        request = pb.IndexRequest(id=f"{request_prefix}-{seq}", user_id=user_id, text=record.text,
+                                  source=record.source, ts=0)
+        future = stub.IndexText.future(request, timeout=timeout)
+        pending += 1
+        future.add_done_callback(lambda f, r=record, a=attempt: done.put((r, a, f)))
+
+    def settle() -> None:
+        nonlocal pending
+        while delayed and delayed[0][0] <= time.monotonic():
+            _, _, record, attempt = heapq.heappop(delayed)
+            pending -= 1
+            submit(record, attempt)
+        try:
+            wait = max(0.0, delayed[0][0] - time.monotonic()) if delayed else None
+            record, attempt, future = done.get(timeout=wait)
+        except queue.Empty:
+            return
+        pending -= 1
+        exc = future.exception()
+        if exc is None:
+            state.mark(record.key)
+            counts["indexed"] += 1
+            if counts["indexed"] % flush_every == 0:
+                state.flush()
+        elif isinstance(exc, grpc.Call) and exc.code() in RETRYABLE and attempt < retries:
+            counts["retried"] += 1
+            heapq.heappush(delayed, (time.monotonic() + backoff * (2 ** attempt), next(order), record, attempt + 1))
+            pending += 1
+        else:
+            counts["failed"] += 1
+            detail = exc.details() if isinstance(exc, grpc.Call) else str(exc)
+            if len(errors) < 20:
+                errors.append(f"{record.origin}: {detail}")
+        meter.show(counts)
+
+    interrupted = False
+    seen: Set[str] = set()
+    try:
+        for item in records:
+            if isinstance(item, Invalid):
+                counts["invalid"] += 1
+                if len(errors) < 20:
+                    errors.append(str(item))
+                continue
+            key = item.key
+            if key in state.done or key in seen:
+                counts["skipped"] += 1
+                continue
+            seen.add(key)
+            while pending >= in_flight:
+                settle()
+            submit(item, 0)
+        while pending:
+            settle()
+    except KeyboardInterrupt:
+        # Let what is already on the wire land so it is recorded, then stop. Retries
+        # still waiting are dropped; they are not in the state file, so a rerun sends them.
+        interrupted = True
+        pending -= len(delayed)
+        delayed.clear()
+        while pending:
+            settle()
+    finally:
+        state.flush()
+    meter.show(counts, final=True)
+    elapsed = time.monotonic() - meter.started
+    return {**counts, "seconds": round(elapsed, 3), "docs_per_s": round(meter.rate(counts["indexed"]), 2),
+            "in_flight": in_flight, "state": state.path, "interrupted": interrupted, "errors": errors}
+
+
+__all__ = ["Invalid", "Record", "State", "default_state_path", "iter_records", "run_bulk"]
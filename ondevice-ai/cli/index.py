@@ -3,10 +3,13 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
 from typing import Any, Sequence, cast
 
 import grpc
 
+from cli.bulk import TEXT_SUFFIXES, State, default_state_path, iter_records, run_bulk
+from cli.loadtest import LoadGenerator, load_corpus, parse_mix
 from core import assistant_pb2 as pb_module
 from core import assistant_pb2_grpc as rpc
 
@@ -64,6 +67,82 @@ def _plan(args: argparse.Namespace) -> None:
         }))
 
 
+def _snapshot(args: argparse.Namespace) -> None:
+    from core.vector_store import VectorStore
+
+    store = VectorStore(args.store)
+    try:
+        header = store.snapshot(args.path)
+    finally:
+        store.close()
+    print(json.dumps({"path": args.path, "documents": header["docs"], "embeddings": header["rows"],
+                      "dim": header["dim"], "generation": header["generation"]}))
+
+
+def _restore(args: argparse.Namespace) -> None:
+    from core.vector_store import VectorStore
+
+    store = VectorStore(args.store)
+    try:
+        result = store.restore(args.path, replace=args.replace, verify=not args.no_verify)
+    finally:
+        store.close()
+    print(json.dumps({"store": store.path, **result}))
+
+
+def _bulk(args: argparse.Namespace) -> None:
+    channel = grpc.insecure_channel(args.target)
+    grpc.channel_ready_future(channel).result(timeout=args.connect_timeout)
+    stub = rpc.AssistantStub(channel)
+    suffixes = [s if s.startswith(".") else f".{s}" for s in args.ext.split(",") if s]
+    state = State(args.state or default_state_path(args.inputs), restart=args.restart)
+    try:
+        summary = run_bulk(
+            stub,
+            iter_records(args.inputs, default_source=args.source, suffixes=suffixes),
+            state,
+            in_flight=args.in_flight,
+            user_id=args.user_id,
+            request_prefix=args.request_id,
+            timeout=args.timeout,
+            retries=args.retries,
+            flush_every=args.flush_every,
+            progress=None if args.quiet else sys.stderr,
+        )
+    finally:
+        state.close()
+        channel.close()
+    print(json.dumps(summary))
+    if summary["interrupted"]:
+        raise SystemExit(130)
+    if summary["failed"]:
+        raise SystemExit(1)
+
+
+def _loadtest(args: argparse.Namespace) -> None:
+    if (args.rate is None) == (args.concurrency is None):
+        raise SystemExit("loadtest: give exactly one of --rate (open loop) or --concurrency (closed loop)")
+    if args.duration is None and args.requests is None:
+        args.duration = 10.0
+    channel = grpc.insecure_channel(args.target)
+    grpc.channel_ready_future(channel).result(timeout=args.connect_timeout)
+    generator = LoadGenerator(rpc.AssistantStub(channel), load_corpus(args.corpus), parse_mix(args.mix),
+                              user_id=args.user_id, k=args.limit, timeout=args.timeout, seed=args.seed)
+    try:
+        if args.rate is not None:
+            report = generator.open_loop(args.rate, args.duration, args.requests, warmup=args.warmup,
+                                         max_outstanding=args.max_outstanding)
+        else:
+            report = generator.closed_loop(args.concurrency, args.duration, args.requests, warmup=args.warmup)
+        report["target"] = args.target
+        report["mix"] = parse_mix(args.mix)
+        if "index" in report["mix"] and not args.keep:
+            report["cleaned_up"] = generator.cleanup()
+    finally:
+        channel.close()
+    print(json.dumps(report, indent=2 if args.pretty else None))
+
+
 def _add_common_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument("--target", default="localhost:50051", help="gRPC host:port")
     parser.add_argument("--user-id", default="cli", help="User identifier")
@@ -91,6 +170,55 @@ def build_parser() -> argparse.ArgumentParser:
     plan_cmd.add_argument("goal", help="Natural language goal")
     plan_cmd.set_defaults(func=_plan)
 
+    bulk_cmd = sub.add_parser("bulk", help="Index files, directories or JSONL from stdin over one channel")
+    _add_common_arguments(bulk_cmd)
+    bulk_cmd.add_argument("inputs", nargs="+", help="Files, directories, *.jsonl, or - for JSONL on stdin")
+    bulk_cmd.add_argument("--source", default="bulk", help="Source tag for JSONL records without one")
+    bulk_cmd.add_argument("--ext", default=",".join(s.lstrip(".") for s in TEXT_SUFFIXES),
+                          help="Comma-separated file extensions to pick up in directories")
+    bulk_cmd.add_argument("--in-flight", type=int, default=16, help="Maximum outstanding IndexText calls")
+    bulk_cmd.add_argument("--timeout", type=float, default=60.0, help="Per-call deadline in seconds")
+    bulk_cmd.add_argument("--connect-timeout", type=float, default=10.0, help="Seconds to wait for the service")
+    bulk_cmd.add_argument("--retries", type=int, default=3, help="Retries for unavailable or overloaded calls")
+    bulk_cmd.add_argument("--state", default=None, help="Resume file (default: one per input set in the data dir)")
+    bulk_cmd.add_argument("--flush-every", type=int, default=100, help="Flush the resume file every N acknowledgements")
+    bulk_cmd.add_argument("--restart", action="store_true", help="Forget earlier progress and send everything")
+    bulk_cmd.add_argument("--quiet", action="store_true", help="No progress line on stderr")
+    bulk_cmd.set_defaults(func=_bulk)
+
+    load_cmd = sub.add_parser("loadtest", help="Drive Query/IndexText/Plan and report throughput and latency")
+    _add_common_arguments(load_cmd)
+    load_cmd.add_argument("corpus", help="Text file (one query per line) or JSONL with query/text/goal fields")
+    load_cmd.add_argument("--rate", type=float, default=None, help="Open loop: requests started per second")
+    load_cmd.add_argument("--concurrency", type=int, default=None, help="Closed loop: requests kept outstanding")
+    load_cmd.add_argument("--duration", type=float, default=None, help="Seconds to measure (default 10)")
+    load_cmd.add_argument("--requests", type=int, default=None, help="Stop after this many measured requests")
+    load_cmd.add_argument("--warmup", type=float, default=0.0, help="Seconds of unmeasured traffic first")
+    load_cmd.add_argument("--mix", default="query=1", help="Weights, e.g. query=8,index=1,plan=1")
+    load_cmd.add_argument("--limit", type=int, default=5, help="k for Query calls")
+    load_cmd.add_argument("--timeout", type=float, default=30.0, help="Per-call deadline in seconds")
+    load_cmd.add_argument("--connect-timeout", type=float, default=10.0, help="Seconds to wait for the service")
+    load_cmd.add_argument("--max-outstanding", type=int, default=10000,
+                          help="Open loop: beyond this many outstanding calls, skip and count instead of sending")
+    load_cmd.add_argument("--seed", type=int, default=0, help="Seed for the operation mix")
+    load_cmd.add_argument("--keep", action="store_true", help="Keep the documents indexed by the run")
+    load_cmd.add_argument("--pretty", action="store_true", help="Indent the JSON report")
+    load_cmd.set_defaults(func=_loadtest)
+
+    from core.vector_store import default_store_path
+
+    snapshot_cmd = sub.add_parser("snapshot", help="Write a binary snapshot of the local store")
+    snapshot_cmd.add_argument("path", help="Snapshot file to write")
+    snapshot_cmd.add_argument("--store", default=default_store_path(), help="Store database to read")
+    snapshot_cmd.set_defaults(func=_snapshot)
+
+    restore_cmd = sub.add_parser("restore", help="Load a snapshot into an empty local store")
+    restore_cmd.add_argument("path", help="Snapshot file to load")
+    restore_cmd.add_argument("--store", default=default_store_path(), help="Store database to fill")
+    restore_cmd.add_argument("--replace", action="store_true", help="Discard the store's current contents")
+    restore_cmd.add_argument("--no-verify", action="store_true", help="Skip the section checksums")
+    restore_cmd.set_defaults(func=_restore)
+
     return parser
 
 
@@ -0,0 +1,250 @@
+"""Load generator for ``cli.index loadtest``.
+
+Two ways to drive the service:
+
+- open loop (``rate``): a request is started every ``1 / rate`` seconds
+  whether or not earlier ones have finished. Latency is measured from the
+  time the request was *scheduled*, so a server that falls behind shows
+  up in the tail instead of silently slowing the generator down.
+- closed loop (``concurrency``): a fixed number of requests is kept
+  outstanding, and each completion starts the next one. This gives the
+  throughput the service sustains at that concurrency.
+
+Each request is a Query, IndexText or Plan, drawn by weight from ``mix``. Its
+text is taken round-robin from the corpus. Indexed texts get a run-specific
+suffix and source, so every index call is a real insert rather than a dedup
+hit. By default they are deleted again at the end.
+"""
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, cast
+
+import grpc
+import numpy as np
+
+from core import assistant_pb2 as pb_module
+
+pb = cast(Any, pb_module)
+
+OPS = ("query", "index", "plan")
+PERCENTILES = (("p50", 50.0), ("p90", 90.0), ("p99", 99.0), ("p999", 99.9))
+
+
+def load_corpus(path: str) -> List[str]:
+    """One text per line. JSONL lines use their ``query``, ``text`` or ``goal`` field."""
+    texts: List[str] = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    obj = None
+                if isinstance(obj, dict):
+                    line = str(obj.get("query") or obj.get("text") or obj.get("goal") or "").strip()
+            if line:
+                texts.append(line)
+    if not texts:
+        raise ValueError(f"{path} has no usable lines")
+    return texts
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """``"query=8,index=1,plan=1"`` -> normalised weights."""
+    weights: Dict[str, float] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip().lower()
+        if name not in OPS:
+            raise ValueError(f"Unknown operation {name!r}; expected one of {', '.join(OPS)}")
+        weights[name] = float(value or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Operation mix has no positive weights")
+    return {name: w / total for name, w in weights.items() if w > 0}
+
+
+def _summarise(latencies: Sequence[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    ms = np.asarray(latencies, dtype=np.float64) * 1000.0
+    out = {name: round(float(np.percentile(ms, q)), 3) for name, q in PERCENTILES}
+    out["mean"] = round(float(ms.mean()), 3)
+    out["max"] = round(float(ms.max()), 3)
+    return out
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {op: [] for op in OPS}
+        self.errors: Dict[str, Dict[str, int]] = {op: {} for op in OPS}
+        self.last_done = 0.0
+
+    def record(self, op: str, latency: float, code: Optional[grpc.StatusCode], measured: bool) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self.last_done = now
+            if not measured:
+                return
+            if code is None:
+                self.latencies[op].append(latency)
+            else:
+                errors = self.errors[op]
+                errors[code.name] = errors.get(code.name, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        with self._lock:
+            every = [x for op in OPS for x in self.latencies[op]]
+            errors: Dict[str, int] = {}
+            per_op: Dict[str, Any] = {}
+            for op in OPS:
+                failed = sum(self.errors[op].values())
+                if not self.latencies[op] and not failed:
+                    continue
+                for code, n in self.errors[op].items():
+                    errors[code] = errors.get(code, 0) + n
+                per_op[op] = {"ok": len(self.latencies[op]), "errors": dict(self.errors[op]),
+                              "latency_ms": _summarise(self.latencies[op])}
+        return {
+            "requests": len(every) + sum(errors.values()),
+            "ok": len(every),
+            "errors": errors,
+            "error_count": sum(errors.values()),
+            "throughput_rps": round(len(every) / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": _summarise(every),
+            "per_op": per_op,
+        }
+
+
+class _Inflight:
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self.count = 0
+
+    def acquire(self, limit: int, block: bool = True) -> bool:
+        with self._cond:
+            while self.count >= limit:
+                if not block:
+                    return False
+                self._cond.wait()
+            self.count += 1
+            return True
+
+    def release(self) -> None:
+        with self._cond:
+            self.count -= 1
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout: float) -> None:
+        with self._cond:
+            self._cond.wait_for(lambda: self.count == 0, timeout=timeout)
+
+
+class LoadGenerator:
+    def __init__(self, stub: Any, corpus: Sequence[str], mix: Dict[str, float], *, user_id: str = "loadtest",
+                 k: int = 5, timeout: float = 30.0, seed: int = 0):
+        self.stub = stub
+        self.corpus = list(corpus)
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.user_id = user_id
+        self.k = k
+        self.timeout = timeout
+        self.run_id = uuid.uuid4().hex[:8]
+        self.source = f"loadtest-{self.run_id}"
+        self._rng = random.Random(seed)
+        self._seq = 0
+        self.recorder = _Recorder()
+
+    def _next(self) -> Tuple[str, Callable[..., Any], Any]:
+        self._seq += 1
+        op = self._rng.choices(self.ops, self.weights)[0]
+        text = self.corpus[self._seq % len(self.corpus)]
+        rid = f"{self.source}-{self._seq}"
+        if op == "query":
+            return op, self.stub.Query.future, pb.QueryRequest(id=rid, user_id=self.user_id, query=text, k=self.k)
+        if op == "index":
+            return op, self.stub.IndexText.future, pb.IndexRequest(
+                id=rid, user_id=self.user_id, text=f"{text} [{rid}]", source=self.source, ts=0)
+        return op, self.stub.Plan.future, pb.PlanRequest(id=rid, user_id=self.user_id, goal=text)
+
+    def _start(self, scheduled: float, measured: bool, done: Optional[Callable[[], None]] = None) -> None:
+        op, call, request = self._next()
+
+        def finished(future: grpc.Future) -> None:
+            exc = future.exception()
+            code = None if exc is None else (exc.code() if isinstance(exc, grpc.Call) else grpc.StatusCode.UNKNOWN)
+            self.recorder.record(op, time.perf_counter() - scheduled, code, measured)
+            if done is not None:
+                done()
+
+        call(request, timeout=self.timeout).add_done_callback(finished)
+
+    def open_loop(self, rate: float, duration: Optional[float], requests: Optional[int], warmup: float = 0.0,
+                  max_outstanding: int = 10000) -> Dict[str, Any]:
+        interval = 1.0 / rate
+        inflight = _Inflight()
+        skipped = sent = n = 0
+        started = time.perf_counter()
+        measure_from = started + warmup
+        stop_at = measure_from + duration if duration else None
+        while True:
+            scheduled = started + n * interval
+            measured = scheduled >= measure_from
+            if (stop_at is not None and scheduled >= stop_at) or (requests is not None and sent >= requests):
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            n += 1
+            sent += measured
+            if not inflight.acquire(max_outstanding, block=False):
+                # The client, not the server, would be the bottleneck; count it rather than queue it.
+                skipped += measured
+                continue
+            self._start(scheduled, measured, inflight.release)
+        end = time.perf_counter()
+        inflight.wait_idle(self.timeout + 5.0)
+        report = self.recorder.report(max(end, self.recorder.last_done) - measure_from)
+        report.update({"mode": "open", "rate": rate, "client_skipped": skipped})
+        return report
+
+    def closed_loop(self, concurrency: int, duration: Optional[float], requests: Optional[int],
+                    warmup: float = 0.0) -> Dict[str, Any]:
+        inflight = _Inflight()
+        sent = 0
+        started = time.perf_counter()
+        measure_from = started + warmup
+        stop_at = measure_from + duration if duration else None
+        while True:
+            inflight.acquire(concurrency)
+            now = time.perf_counter()
+            measured = now >= measure_from
+            if (stop_at is not None and now >= stop_at) or (requests is not None and sent >= requests):
+                inflight.release()
+                break
+            sent += measured
+            self._start(now, measured, inflight.release)
+        inflight.wait_idle(self.timeout + 5.0)
+        report = self.recorder.report(self.recorder.last_done - measure_from)
+        report.update({"mode": "closed", "concurrency": concurrency})
+        return report
+
+    def cleanup(self, timeout: float = 30.0) -> int:
+        response = self.stub.DeleteDocuments(pb.DeleteRequest(id=f"{self.source}-cleanup", user_id=self.user_id,
+                                                              source_prefix=self.source), timeout=timeout)
+        return int(response.deleted)
+
+
+__all__ = ["LoadGenerator", "OPS", "load_corpus", "parse_mix"]
@@ -0,0 +1,314 @@
+"""Async, pooled execution of plugin action scripts.
+
+``ActionExecutor`` collects scripts submitted within a short window into
+batches, runs each batch as a single interpreter invocation on a pluggable
+``ActionBackend`` and caps how many invocations run at once. Nothing here
+blocks the event loop: backends drive asyncio subprocesses and kill them
+when they overrun their timeout.
+"""
+from __future__ import annotations
+
+import abc
+import asyncio
+import json
+import platform
+import sys
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+BatchResult = List[Union[str, BaseException]]
+
+_RECORD_SEP = "\x1e"
+_FIELD_SEP = "\x1f"
+
+
+class ActionTimeoutError(RuntimeError):
+    pass
+
+
+async def _communicate(argv: Sequence[str], stdin: Optional[bytes], timeout: float) -> Tuple[int, str, str]:
+    proc = await asyncio.create_subprocess_exec(
+        *argv,
+        stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(stdin), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise ActionTimeoutError(f"{argv[0]} timed out after {timeout:.1f}s")
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
+    return proc.returncode or 0, out.decode("utf-8", "replace"), err.decode("utf-8", "replace")
+
+
+class ActionBackend(abc.ABC):
+    """Runs a batch of scripts in one interpreter invocation.
+
+    ``run_batch`` returns one entry per script: its output, or the exception
+    that script raised. Raising from ``run_batch`` fails the whole batch.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def run_batch(self, scripts: Sequence[str], timeout: float) -> BatchResult:
+        ...
+
+
+class NoopBackend(ActionBackend):
+    """Used off macOS, where there is nothing to script."""
+
+    name = "noop"
+
+    async def run_batch(self, scripts: Sequence[str], timeout: float) -> BatchResult:
+        return ["noop" for _ in scripts]
+
+
+class OsascriptBackend(ActionBackend):
+    """Runs AppleScript through ``osascript``.
+
+    A batch is compiled into one script in which every action is a handler
+    called inside its own ``try`` block, so one failing action does not stop
+    the rest and each result is reported separately.
+    """
+
+    name = "osascript"
+
+    def __init__(self, executable: str = "osascript"):
+        self.executable = executable
+
+    @staticmethod
+    def combine(scripts: Sequence[str]) -> str:
+        lines: List[str] = []
+        for index, script in enumerate(scripts):
+            lines.append(f"on action{index}()")
+            lines.append(script)
+            lines.append(f"end action{index}")
+        lines.append('set _out to ""')
+        for index in range(len(scripts)):
+            lines.extend([
+                "try",
+                '  set _v to ""',
+                f"  set _v to action{index}()",
+                "  try",
+                "    set _v to _v as text",
+                "  on error",
+                '    set _v to ""',
+                "  end try",
+                '  set _out to _out & "ok" & (character id 31) & _v & (character id 30)',
+                "on error _msg",
+                '  set _out to _out & "err" & (character id 31) & _msg & (character id 30)',
+                "end try",
+            ])
+        lines.append("return _out")
+        return "\n".join(lines)
+
+    @staticmethod
+    def split(output: str, count: int) -> BatchResult:
+        records = output.rstrip("\n").split(_RECORD_SEP)[:count]
+        results: BatchResult = []
+        for record in records:
+            status, _, value = record.partition(_FIELD_SEP)
+            results.append(value.strip() if status == "ok" else RuntimeError(value.strip() or "osascript failed"))
+        while len(results) < count:
+            results.append(RuntimeError("osascript returned no result"))
+        return results
+
+    async def _run_one(self, script: str, timeout: float) -> str:
+        code, out, err = await _communicate([self.executable, "-e", script], None, timeout)
+        if code != 0:
+            raise RuntimeError(err.strip() or "osascript failed")
+        return out.strip()
+
+    async def run_batch(self, scripts: Sequence[str], timeout: float) -> BatchResult:
+        if len(scripts) == 1:
+            try:
+                return [await self._run_one(scripts[0], timeout)]
+            except ActionTimeoutError:
+                raise
+            except RuntimeError as exc:
+                return [exc]
+        code, out, err = await _communicate([self.executable, "-e", self.combine(scripts)], None, timeout)
+        if code != 0:
+            if "syntax error" in err.lower():
+                # Nothing ran; isolate the script that does not compile.
+                results: BatchResult = []
+                for script in scripts:
+                    try:
+                        results.append(await self._run_one(script, timeout / len(scripts)))
+                    except RuntimeError as exc:
+                        results.append(exc)
+                return results
+            raise RuntimeError(err.strip() or "osascript failed")
+        return self.split(out, len(scripts))
+
+
+_FAKE_INTERPRETER = """
+import json, sys, time
+delay, marker = float(sys.argv[1]), sys.argv[2]
+time.sleep(delay)
+scripts = json.load(sys.stdin)
+json.dump([[marker not in s, "ran %d chars" % len(s) if marker not in s else "fake failure"] for s in scripts], sys.stdout)
+"""
+
+
+class FakeBackend(ActionBackend):
+    """Local stand-in for ``osascript`` that works on any OS.
+
+    Each batch starts one Python subprocess that sleeps ``startup_delay``
+    (modelling interpreter start-up) and reports every script as run, except
+    those containing ``fail_marker``. Used by tests and
+    ``tools/bench_actions.py``.
+    """
+
+    name = "fake"
+
+    def __init__(self, startup_delay: float = 0.05, fail_marker: str = "FAIL"):
+        self.startup_delay = startup_delay
+        self.fail_marker = fail_marker
+        self.invocations = 0
+
+    async def run_batch(self, scripts: Sequence[str], timeout: float) -> BatchResult:
+        self.invocations += 1
+        argv = [sys.executable, "-c", _FAKE_INTERPRETER, str(self.startup_delay), self.fail_marker]
+        code, out, err = await _communicate(argv, json.dumps(list(scripts)).encode("utf-8"), timeout)
+        if code != 0:
+            raise RuntimeError(err.strip() or "fake interpreter failed")
+        return [text if ok else RuntimeError(text) for ok, text in json.loads(out)]
+
+
+def default_backend() -> ActionBackend:
+    return OsascriptBackend() if platform.system() == "Darwin" else NoopBackend()
+
+
+class _LoopState:
+    """Batching state of one event loop; asyncio primitives cannot be shared between loops."""
+
+    def __init__(self, max_concurrency: int):
+        self.pending: List[Tuple[str, asyncio.Future]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.tasks: "set[asyncio.Task]" = set()
+
+
+class ActionExecutor:
+    """Batches and bounds script execution on an ``ActionBackend``.
+
+    Scripts submitted within ``batch_window`` seconds of each other share an
+    invocation (up to ``max_batch``); at most ``max_concurrency`` invocations
+    run at once. ``timeout`` is per action, so a batch of N gets N times as
+    long before its interpreter is killed. Batches and the concurrency cap
+    are per event loop.
+    """
+
+    def __init__(self, backend: Optional[ActionBackend] = None, max_concurrency: int = 2, max_batch: int = 8,
+                 batch_window: float = 0.005, timeout: float = 15.0):
+        self.backend = backend or default_backend()
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_batch = max(1, int(max_batch))
+        self.batch_window = max(0.0, float(batch_window))
+        self.timeout = float(timeout)
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.invocations = 0
+        self.failures = 0
+        self.timeouts = 0
+        self._run_ms: List[float] = []
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None:
+                state = self._loops[loop] = _LoopState(self.max_concurrency)
+            return state
+
+    async def run(self, script: str) -> str:
+        state = self._state()
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+        state.pending.append((script, fut))
+        self.submitted += 1
+        if len(state.pending) >= self.max_batch:
+            self._flush(state)
+        elif state.flush_handle is None:
+            state.flush_handle = loop.call_later(self.batch_window, self._flush, state)
+        return await fut
+
+    def _flush(self, state: _LoopState) -> None:
+        if state.flush_handle is not None:
+            state.flush_handle.cancel()
+            state.flush_handle = None
+        while state.pending:
+            batch, state.pending = state.pending[:self.max_batch], state.pending[self.max_batch:]
+            task = asyncio.get_running_loop().create_task(self._dispatch(state, batch))
+            state.tasks.add(task)
+            task.add_done_callback(state.tasks.discard)
+
+    async def _dispatch(self, state: _LoopState, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        live = [(script, fut) for script, fut in batch if not fut.done()]
+        if not live:
+            return
+        async with state.slots:
+            self.invocations += 1
+            started = time.perf_counter()
+            try:
+                results = await self.backend.run_batch([script for script, _ in live], self.timeout * len(live))
+                if len(results) != len(live):
+                    raise RuntimeError(f"{self.backend.name} returned {len(results)} results for {len(live)} actions")
+            except Exception as exc:
+                if isinstance(exc, ActionTimeoutError):
+                    self.timeouts += 1
+                results = [exc] * len(live)
+            finally:
+                self._run_ms.append((time.perf_counter() - started) * 1000.0)
+                if len(self._run_ms) > 512:
+                    del self._run_ms[:256]
+        for (_, fut), result in zip(live, results):
+            if fut.done():
+                continue
+            if isinstance(result, BaseException):
+                self.failures += 1
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+    def metrics(self) -> Dict[str, Any]:
+        ordered = sorted(self._run_ms)
+        return {
+            "backend": self.backend.name,
+            "submitted": self.submitted,
+            "invocations": self.invocations,
+            "pending": sum(len(state.pending) for state in list(self._loops.values())),
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "run_ms_p50": round(ordered[len(ordered) // 2], 3) if ordered else 0.0,
+            "run_ms_max": round(ordered[-1], 3) if ordered else 0.0,
+        }
+
+    async def aclose(self) -> None:
+        """Run what this loop has queued and wait for its batches to finish."""
+        state = self._state()
+        if state.pending:
+            self._flush(state)
+        if state.tasks:
+            await asyncio.gather(*list(state.tasks), return_exceptions=True)
+
+
+__all__ = [
+    "ActionBackend",
+    "ActionExecutor",
+    "ActionTimeoutError",
+    "FakeBackend",
+    "NoopBackend",
+    "OsascriptBackend",
+    "default_backend",
+]
@@ -0,0 +1,68 @@
+"""Incremental parser for a streamed JSON array of plan actions.
+
+Planner output arrives as text chunks of a JSON array of objects. The parser
+keeps a small scanner state (nesting depth, string/escape flags) and returns
+each top-level object as soon as its closing brace arrives. The first action
+can therefore be shown before generation finishes.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List
+
+
+class ActionStreamParser:
+    def __init__(self) -> None:
+        self._buffer: List[str] = []
+        self._text: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._collecting = False
+        self.emitted = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume ``chunk`` and return any actions it completed."""
+        out: List[Dict[str, Any]] = []
+        self._text.append(chunk)
+        for ch in chunk:
+            if self._collecting:
+                self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+                if ch == "{" and self._depth == 2 and not self._collecting:
+                    self._collecting = True
+                    self._buffer = ["{"]
+            elif ch in "]}":
+                self._depth -= 1
+                if ch == "}" and self._depth == 1 and self._collecting:
+                    self._collecting = False
+                    action = self._decode("".join(self._buffer))
+                    if action is not None:
+                        out.append(action)
+        self.emitted += len(out)
+        return out
+
+    def _decode(self, raw: str) -> Dict[str, Any] | None:
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return None
+        return value if isinstance(value, dict) else None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text)
+
+
+__all__ = ["ActionStreamParser"]
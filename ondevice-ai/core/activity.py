@@ -0,0 +1,45 @@
+"""Live request-rate meter shared by the gRPC and HTTP front ends.
+
+Background work (see ``core.scheduler``) consults it to find idle periods.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Deque, List
+
+
+class RequestRateMeter:
+    """Requests per second over a sliding window of one-second buckets."""
+
+    def __init__(self, window_seconds: int = 10) -> None:
+        self.window_seconds = max(1, int(window_seconds))
+        self._buckets: Deque[List[int]] = deque()
+        self._lock = threading.Lock()
+
+    def mark(self, count: int = 1) -> None:
+        second = int(time.monotonic())
+        with self._lock:
+            if self._buckets and self._buckets[-1][0] == second:
+                self._buckets[-1][1] += count
+            else:
+                self._buckets.append([second, count])
+            self._trim(second)
+
+    def _trim(self, second: int) -> None:
+        horizon = second - self.window_seconds
+        while self._buckets and self._buckets[0][0] <= horizon:
+            self._buckets.popleft()
+
+    def rate(self) -> float:
+        with self._lock:
+            self._trim(int(time.monotonic()))
+            total = sum(count for _, count in self._buckets)
+        return total / float(self.window_seconds)
+
+
+REQUEST_METER = RequestRateMeter()
+
+
+__all__ = ["REQUEST_METER", "RequestRateMeter"]
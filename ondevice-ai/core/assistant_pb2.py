@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x61ssistant.proto\x12\tassistant\"\x07\n\x05\x45mpty\"\x10\n\x02ID\x12\n\n\x02id\x18\x01 \x01(\t\"U\n\x0cIndexRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x0e\n\x06source\x18\x04 \x01(\t\x12\n\n\x02ts\x18\x05 \x01(\x03\";\n\rIndexResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0e\n\x06\x64oc_id\x18\x02 \x01(\t\x12\x0e\n\x06status\x18\x03 \x01(\x05\"E\n\x0cQueryRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\r\n\x05query\x18\x03 \x01(\t\x12\t\n\x01k\x18\x04 \x01(\x05\"7\n\x08QueryHit\x12\x0e\n\x06\x64oc_id\x18\x01 \x01(\t\x12\r\n\x05score\x18\x02 \x01(\x02\x12\x0c\n\x04text\x18\x03 \x01(\t\">\n\rQueryResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12!\n\x04hits\x18\x02 \x03(\x0b\x32\x13.assistant.QueryHit\"T\n\x06\x41\x63tion\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0f\n\x07payload\x18\x02 \x01(\t\x12\x11\n\tsensitive\x18\x03 \x01(\x08\x12\x18\n\x10preview_required\x18\x04 \x01(\x08\"8\n\x0bPlanRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x0c\n\x04goal\x18\x03 \x01(\t\">\n\x0cPlanResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\"\n\x07\x61\x63tions\x18\x02 \x03(\x0b\x32\x11.assistant.Action2\xfe\x01\n\tAssistant\x12>\n\tIndexText\x12\x17.assistant.IndexRequest\x1a\x18.assistant.IndexResponse\x12:\n\x05Query\x12\x17.assistant.QueryRequest\x1a\x18.assistant.QueryResponse\x12\x37\n\x04Plan\x12\x16.assistant.PlanRequest\x1a\x17.assistant.PlanResponse\x12<\n\rExecuteAction\x12\x11.assistant.Action\x1a\x18.assistant.IndexResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x61ssistant.proto\x12\tassistant\"\x07\n\x05\x45mpty\"\x10\n\x02ID\x12\n\n\x02id\x18\x01 \x01(\t\"U\n\x0cIndexRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x0e\n\x06source\x18\x04 \x01(\t\x12\n\n\x02ts\x18\x05 \x01(\x03\";\n\rIndexResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0e\n\x06\x64oc_id\x18\x02 \x01(\t\x12\x0e\n\x06status\x18\x03 \x01(\x05\"E\n\x0cQueryRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\r\n\x05query\x18\x03 \x01(\t\x12\t\n\x01k\x18\x04 \x01(\x05\"7\n\x08QueryHit\x12\x0e\n\x06\x64oc_id\x18\x01 \x01(\t\x12\r\n\x05score\x18\x02 \x01(\x02\x12\x0c\n\x04text\x18\x03 \x01(\t\">\n\rQueryResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12!\n\x04hits\x18\x02 \x03(\x0b\x32\x13.assistant.QueryHit\"T\n\rDeleteRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x0f\n\x07\x64oc_ids\x18\x03 \x03(\t\x12\x15\n\rsource_prefix\x18\x04 \x01(\t\">\n\x0e\x44\x65leteResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07\x64\x65leted\x18\x02 \x01(\x05\x12\x0f\n\x07\x64oc_ids\x18\x03 \x03(\t\"T\n\x06\x41\x63tion\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0f\n\x07payload\x18\x02 \x01(\t\x12\x11\n\tsensitive\x18\x03 \x01(\x08\x12\x18\n\x10preview_required\x18\x04 \x01(\x08\"8\n\x0bPlanRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x0c\n\x04goal\x18\x03 \x01(\t\">\n\x0cPlanResponse\x12\n\n\x02id\x18\x01 \x01(\t\x12\"\n\x07\x61\x63tions\x18\x02 \x03(\x0b\x32\x11.assistant.Action2\x81\x03\n\tAssistant\x12>\n\tIndexText\x12\x17.assistant.IndexRequest\x1a\x18.assistant.IndexResponse\x12:\n\x05Query\x12\x17.assistant.QueryRequest\x1a\x18.assistant.QueryResponse\x12\x46\n\x0f\x44\x65leteDocuments\x12\x18.assistant.DeleteRequest\x1a\x19.assistant.DeleteResponse\x12\x37\n\x04Plan\x12\x16.assistant.PlanRequest\x1a\x17.assistant.PlanResponse\x12\x39\n\nPlanStream\x12\x16.assistant.PlanRequest\x1a\x11.assistant.Action0\x01\x12<\n\rExecuteAction\x12\x11.assistant.Action\x1a\x18.assistant.IndexResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -45,12 +45,16 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_QUERYHIT']._serialized_end=331
   _globals['_QUERYRESPONSE']._serialized_start=333
   _globals['_QUERYRESPONSE']._serialized_end=395
-  _globals['_ACTION']._serialized_start=397
-  _globals['_ACTION']._serialized_end=481
-  _globals['_PLANREQUEST']._serialized_start=483
-  _globals['_PLANREQUEST']._serialized_end=539
-  _globals['_PLANRESPONSE']._serialized_start=541
-  _globals['_PLANRESPONSE']._serialized_end=603
-  _globals['_ASSISTANT']._serialized_start=606
-  _globals['_ASSISTANT']._serialized_end=860
+  _globals['_DELETEREQUEST']._serialized_start=397
+  _globals['_DELETEREQUEST']._serialized_end=481
+  _globals['_DELETERESPONSE']._serialized_start=483
+  _globals['_DELETERESPONSE']._serialized_end=545
+  _globals['_ACTION']._serialized_start=547
+  _globals['_ACTION']._serialized_end=631
+  _globals['_PLANREQUEST']._serialized_start=633
+  _globals['_PLANREQUEST']._serialized_end=689
+  _globals['_PLANRESPONSE']._serialized_start=691
+  _globals['_PLANRESPONSE']._serialized_end=753
+  _globals['_ASSISTANT']._serialized_start=756
+  _globals['_ASSISTANT']._serialized_end=1141
 # @@protoc_insertion_point(module_scope)
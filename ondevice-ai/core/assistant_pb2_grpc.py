@@ -48,11 +48,21 @@ class AssistantStub(object):
                 request_serializer=assistant__pb2.QueryRequest.SerializeToString,
                 response_deserializer=assistant__pb2.QueryResponse.FromString,
                 _registered_method=True)
+        self.DeleteDocuments = channel.unary_unary(
+                '/assistant.Assistant/DeleteDocuments',
+                request_serializer=assistant__pb2.DeleteRequest.SerializeToString,
+                response_deserializer=assistant__pb2.DeleteResponse.FromString,
+                _registered_method=True)
         self.Plan = channel.unary_unary(
                 '/assistant.Assistant/Plan',
                 request_serializer=assistant__pb2.PlanRequest.SerializeToString,
                 response_deserializer=assistant__pb2.PlanResponse.FromString,
                 _registered_method=True)
+        self.PlanStream = channel.unary_stream(
+                '/assistant.Assistant/PlanStream',
+                request_serializer=assistant__pb2.PlanRequest.SerializeToString,
+                response_deserializer=assistant__pb2.Action.FromString,
+                _registered_method=True)
         self.ExecuteAction = channel.unary_unary(
                 '/assistant.Assistant/ExecuteAction',
                 request_serializer=assistant__pb2.Action.SerializeToString,
@@ -75,12 +85,26 @@ class AssistantServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def DeleteDocuments(self, request, context):
+        """by id and/or source prefix
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def Plan(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def PlanStream(self, request, context):
+        """actions as they are generated
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def ExecuteAction(self, request, context):
         """Execute or simulate
         """
@@ -101,11 +125,21 @@ def add_AssistantServicer_to_server(servicer, server):
                     request_deserializer=assistant__pb2.QueryRequest.FromString,
                     response_serializer=assistant__pb2.QueryResponse.SerializeToString,
             ),
+            'DeleteDocuments': grpc.unary_unary_rpc_method_handler(
+                    servicer.DeleteDocuments,
+                    request_deserializer=assistant__pb2.DeleteRequest.FromString,
+                    response_serializer=assistant__pb2.DeleteResponse.SerializeToString,
+            ),
             'Plan': grpc.unary_unary_rpc_method_handler(
                     servicer.Plan,
                     request_deserializer=assistant__pb2.PlanRequest.FromString,
                     response_serializer=assistant__pb2.PlanResponse.SerializeToString,
             ),
+            'PlanStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.PlanStream,
+                    request_deserializer=assistant__pb2.PlanRequest.FromString,
+                    response_serializer=assistant__pb2.Action.SerializeToString,
+            ),
             'ExecuteAction': grpc.unary_unary_rpc_method_handler(
                     servicer.ExecuteAction,
                     request_deserializer=assistant__pb2.Action.FromString,
@@ -176,6 +210,33 @@ class Assistant(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def DeleteDocuments(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/assistant.Assistant/DeleteDocuments',
+            assistant__pb2.DeleteRequest.SerializeToString,
+            assistant__pb2.DeleteResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def Plan(request,
             target,
@@ -203,6 +264,33 @@ class Assistant(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def PlanStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/assistant.Assistant/PlanStream',
+            assistant__pb2.PlanRequest.SerializeToString,
+            assistant__pb2.Action.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ExecuteAction(request,
             target,
@@ -0,0 +1,97 @@
+"""Awaitable front for ``VectorStore`` that keeps SQLite and scans off the event loop.
+
+``Orchestrator`` coroutines all share one loop (``core.server.get_loop``). A
+synchronous store call on that loop stalls every other in-flight RPC,
+including the embed HTTP calls the other requests are waiting on.
+``AsyncVectorStore`` runs each call on a worker thread. Point reads and writes
+use the ``io`` pool. Similarity scans use a separate ``scan`` pool, so a long
+scan cannot hold up the lookups.
+
+Each pool admits at most ``max_pending`` calls (running plus waiting).
+Further callers wait on the loop for a slot instead of growing an unbounded
+executor queue. The tracing context is copied into the worker, so store spans
+nest under the caller's spans.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.vector_store import DEFAULT_PARTITION, VectorStore
+
+
+class _Lane:
+    def __init__(self, name: str, workers: int, max_pending: int):
+        self.name = name
+        self.max_pending = max(workers, max_pending)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"store-{name}")
+        self._slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.waited = 0
+        self.pending = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            sem = self._slots.get(loop)
+            if sem is None:
+                sem = self._slots[loop] = asyncio.Semaphore(self.max_pending)
+            return sem
+
+    async def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        sem = self._semaphore()
+        if sem.locked():
+            self.waited += 1
+        async with sem:
+            self.calls += 1
+            self.pending += 1
+            try:
+                ctx = contextvars.copy_context()
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.executor, functools.partial(ctx.run, fn, *args, **kwargs))
+            finally:
+                self.pending -= 1
+
+    def metrics(self) -> Dict[str, int]:
+        return {"calls": self.calls, "waited": self.waited, "pending": self.pending, "max_pending": self.max_pending}
+
+
+class AsyncVectorStore:
+    """The ``VectorStore`` methods the orchestrator needs, as coroutines."""
+
+    def __init__(self, store: VectorStore, io_workers: int = 4, scan_workers: int = 2, max_pending: int = 64):
+        self.store = store
+        self._io = _Lane("io", io_workers, max_pending)
+        self._scan = _Lane("scan", scan_workers, max_pending)
+
+    async def ingest(self, text: str, source: str = "cli", user_id: str = DEFAULT_PARTITION, policy: str = "link",
+                     embed: Optional[Callable[[str], np.ndarray]] = None) -> Tuple[str, str, bool]:
+        return await self._io.call(self.store.ingest, text, source, user_id, policy, embed=embed)
+
+    async def delete(self, ids: Optional[Sequence[str]] = None, source_prefix: Optional[str] = None,
+                     user_id: Optional[str] = None) -> List[str]:
+        return await self._io.call(self.store.delete, ids=ids, source_prefix=source_prefix, user_id=user_id)
+
+    async def get_documents(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        return await self._io.call(self.store.get_documents, ids)
+
+    async def search(self, query: np.ndarray, k: int = 5, user_id: str = DEFAULT_PARTITION) -> List[Tuple[float, str]]:
+        return await self._scan.call(self.store.search, query, k, user_id)
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        return {"io": self._io.metrics(), "scan": self._scan.metrics()}
+
+    def close(self) -> None:
+        self._io.executor.shutdown(wait=False)
+        self._scan.executor.shutdown(wait=False)
+
+
+__all__ = ["AsyncVectorStore"]
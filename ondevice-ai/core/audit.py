@@ -7,6 +7,8 @@ import time
 from pathlib import Path
 from typing import Any, Dict, Iterable, Iterator
 
+from core import events
+
 
 def _default_log_path() -> Path:
     root = os.environ.get("ONDEVICE_AUDIT_DIR")
@@ -43,6 +45,22 @@ def write_event(event: Dict[str, Any], path: str | None = None) -> None:
     target = _resolve_path(path)
     with target.open("a", encoding="utf-8") as handle:
         handle.write(json.dumps(evt, ensure_ascii=False) + "\n")
+    events.publish("audit", evt)
+
+
+def rotate(path: str | None = None, max_bytes: int = 5 * 1024 * 1024, keep: int = 3) -> bool:
+    """Roll ``audit.jsonl`` to ``audit.jsonl.1`` (…``.keep``) once it exceeds ``max_bytes``."""
+    target = _resolve_path(path)
+    if not target.exists() or target.stat().st_size < max_bytes:
+        return False
+    for index in range(keep, 0, -1):
+        older = target.with_name(f"{target.name}.{index}")
+        if index == keep:
+            older.unlink(missing_ok=True)
+        elif older.exists():
+            older.rename(target.with_name(f"{target.name}.{index + 1}"))
+    target.rename(target.with_name(f"{target.name}.1"))
+    return True
 
 
 def read_events(path: str | None = None) -> Iterable[Dict[str, Any]]:
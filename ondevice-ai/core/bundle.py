@@ -6,9 +6,18 @@ Bundle layout (zip):
   - config.json
   - adapters/*.lora
   - manifest.json { version, sha256, ed25519_signature }
+
+``sha256`` is a mapping of member name to digest that must cover every member
+except ``manifest.json``. A single digest is accepted for bundles whose only
+member besides the manifest is the model file.
 """
-import base64, hashlib, json
-from typing import Dict
+import base64, hashlib, json, mmap, os, struct, threading, zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_BUFFER = 1 << 20
 
 def _parse_sig(sig: str) -> bytes:
     if not isinstance(sig, str) or not sig.startswith("ed25519:"):
@@ -40,7 +49,176 @@ def verify_manifest_signature(manifest: Dict, pubkey_b64: str) -> bool:
 
 def sha256_file(path: str) -> str:
     h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+    buf = bytearray(_BUFFER)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def _stored_span(fh, info: zipfile.ZipInfo) -> Tuple[int, int]:
+    """Offset and length of an uncompressed member's bytes inside the archive."""
+    fh.seek(info.header_offset)
+    header = fh.read(30)
+    if header[:4] != b"PK\x03\x04":
+        raise ValueError(f"Bad local header for {info.filename}")
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    return info.header_offset + 30 + name_len + extra_len, info.file_size
+
+
+def _hash_member(bundle_path: str, info: zipfile.ZipInfo) -> str:
+    h = hashlib.sha256()
+    if info.compress_type == zipfile.ZIP_STORED and info.file_size:
+        # Hash straight out of the mapped archive: no copy, no extraction.
+        with open(bundle_path, "rb") as fh:
+            start, length = _stored_span(fh, info)
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for offset in range(start, start + length, 16 * _BUFFER):
+                        h.update(view[offset:min(offset + 16 * _BUFFER, start + length)])
+                finally:
+                    view.release()
+        return h.hexdigest()
+    with zipfile.ZipFile(bundle_path) as zf, zf.open(info) as member:
+        for chunk in iter(lambda: member.read(_BUFFER), b""):
             h.update(chunk)
     return h.hexdigest()
+
+
+def hash_bundle_members(bundle_path: str, names: Optional[Iterable[str]] = None,
+                        workers: Optional[int] = None) -> Dict[str, str]:
+    """SHA-256 of each zip member (all files by default), hashed in parallel.
+
+    hashlib and zlib release the GIL on large buffers, so threads scale with cores.
+    """
+    with zipfile.ZipFile(bundle_path) as zf:
+        infos = [i for i in zf.infolist() if not i.is_dir()]
+    if names is not None:
+        wanted = set(names)
+        infos = [i for i in infos if i.filename in wanted]
+        missing = wanted - {i.filename for i in infos}
+        if missing:
+            raise KeyError(f"Bundle is missing: {', '.join(sorted(missing))}")
+    # Largest first so one big model file does not start last.
+    infos.sort(key=lambda i: i.file_size, reverse=True)
+    workers = workers or min(len(infos), os.cpu_count() or 1) or 1
+    if workers == 1:
+        return {i.filename: _hash_member(bundle_path, i) for i in infos}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bundle-hash") as pool:
+        digests = pool.map(lambda i: _hash_member(bundle_path, i), infos)
+        return dict(zip((i.filename for i in infos), digests))
+
+
+def _expected_digests(manifest: Dict, names: List[str]) -> Dict[str, str]:
+    expected = manifest.get("sha256")
+    if isinstance(expected, dict):
+        digests = {str(k): str(v).lower() for k, v in expected.items()}
+    elif isinstance(expected, str):
+        models = [n for n in names if n.startswith("model.")]
+        if len(models) != 1:
+            raise ValueError("Manifest sha256 is a single digest but the bundle has no unique model file")
+        digests = {models[0]: expected.lower()}
+    else:
+        raise ValueError("Manifest has no sha256 field")
+    # The signature only covers the manifest, so a member without a digest is unverified.
+    missing = sorted(set(names) - set(digests))
+    if missing:
+        raise ValueError(f"Manifest has no sha256 for: {', '.join(missing)}")
+    return digests
+
+
+@dataclass
+class BundleVerification:
+    ok: bool
+    digests: Dict[str, str] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+    cached: bool = False
+
+
+class VerificationCache:
+    """Remembers bundles that verified, keyed by (path, size, mtime, inode).
+
+    Persisted as JSON so an unchanged bundle verifies instantly after a restart.
+    Only successful verifications are stored.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            root = os.environ.get("EKUPKARAN_DATA_DIR") or str(Path.home() / ".ekupkaran")
+            path = os.path.join(root, "cache", "bundle-verify.json")
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+
+    @staticmethod
+    def key(bundle_path: str, pubkey_b64: Optional[str]) -> str:
+        st = os.stat(bundle_path)
+        return json.dumps([os.path.abspath(bundle_path), st.st_size, st.st_mtime_ns, st.st_ino, pubkey_b64 or ""])
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            return self._load().get(key)
+
+    def put(self, key: str, digests: Dict[str, str]) -> None:
+        with self._lock:
+            entries = self._load()
+            bundle = json.loads(key)[0]
+            for stale in [k for k in entries if json.loads(k)[0] == bundle]:
+                del entries[stale]
+            entries[key] = digests
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+
+
+def verify_bundle(bundle_path: str, pubkey_b64: Optional[str] = None, cache: Optional[VerificationCache] = None,
+                  workers: Optional[int] = None, allow_unsigned: bool = False) -> BundleVerification:
+    """Check bundle members against manifest.json and its signature.
+
+    Without ``pubkey_b64`` the bundle is refused unless ``allow_unsigned`` is
+    set, in which case only the digests are checked.
+    """
+    if pubkey_b64 is None and not allow_unsigned:
+        return BundleVerification(ok=False, errors=["No public key to verify the manifest signature against "
+                                                     "(pass one, or allow unsigned bundles explicitly)"])
+    key = None
+    if cache is not None:
+        key = cache.key(bundle_path, pubkey_b64)
+        hit = cache.get(key)
+        if hit is not None:
+            return BundleVerification(ok=True, digests=hit, cached=True)
+    try:
+        with zipfile.ZipFile(bundle_path) as zf:
+            manifest = json.loads(zf.read("manifest.json"))
+            names = [n for n in zf.namelist() if n != "manifest.json" and not n.endswith("/")]
+        expected = _expected_digests(manifest, names)
+    except (KeyError, ValueError, zipfile.BadZipFile) as exc:
+        return BundleVerification(ok=False, errors=[str(exc)])
+    errors: List[str] = []
+    if pubkey_b64 is not None and not verify_manifest_signature(manifest, pubkey_b64):
+        errors.append("Manifest signature did not verify")
+    try:
+        digests = hash_bundle_members(bundle_path, expected.keys(), workers=workers)
+    except KeyError as exc:
+        return BundleVerification(ok=False, errors=errors + [str(exc.args[0])])
+    errors.extend(f"Digest mismatch: {name}" for name in sorted(expected) if digests[name] != expected[name])
+    result = BundleVerification(ok=not errors, digests=digests, errors=errors)
+    if result.ok and cache is not None and key is not None:
+        cache.put(key, digests)
+    return result
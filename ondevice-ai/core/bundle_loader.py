@@ -0,0 +1,201 @@
+"""Load model bundles through a shared, content-addressed extraction cache.
+
+Every bundle member is extracted once into ``objects/<sha256>`` under the
+cache root and hard-linked into ``bundles/<key>/``, which has the same layout
+as the zip. Unchanged bundles are reused without touching the archive. The
+backend loads the model from the extracted directory by path, so the daemon
+and the CLI read the same files and share page-cache pages. ``weights()`` and
+``adapter(name)`` memory-map those cached files read-only on first use, so a
+LoRA adapter costs nothing until a request asks for it.
+
+Member names are checked before anything is written: an absolute name, or one
+that leaves the bundle directory, fails the load. With verification on, only
+``manifest.json`` (covered by the signature) and members whose digest was
+checked are extracted; any other member fails the load.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+import uuid
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core.bundle import VerificationCache, _stored_span, verify_bundle
+
+_BUFFER = 1 << 20
+_COMPLETE = ".complete"
+
+
+class BundleError(RuntimeError):
+    pass
+
+
+def default_cache_root() -> Path:
+    root = os.environ.get("EKUPKARAN_DATA_DIR") or str(Path.home() / ".ekupkaran")
+    return Path(os.environ.get("ONDEVICE_BUNDLE_CACHE", os.path.join(root, "cache", "bundles")))
+
+
+def _bundle_key(zf: zipfile.ZipFile) -> str:
+    """Identify a bundle by its manifest and member table, not by its path."""
+    h = hashlib.sha256(zf.read("manifest.json"))
+    for info in sorted(zf.infolist(), key=lambda i: i.filename):
+        h.update(f"\0{info.filename}\0{info.file_size}\0{info.CRC}".encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+def _member_path(staging: Path, name: str) -> Path:
+    """Where member ``name`` goes under ``staging``; refuses names that would land outside it."""
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".")]
+    if not parts or name.startswith(("/", "\\")) or os.path.isabs(name) or ":" in parts[0] or ".." in parts:
+        raise BundleError(f"Unsafe member name in bundle: {name!r}")
+    path = staging.joinpath(*parts)
+    if os.path.commonpath([os.path.abspath(staging), os.path.abspath(path)]) != os.path.abspath(staging):
+        raise BundleError(f"Unsafe member name in bundle: {name!r}")
+    return path
+
+
+def _link(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class LoadedBundle:
+    """An extracted bundle. Weights and adapters are mapped lazily from the cache."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._lock = threading.Lock()
+        with open(root / "manifest.json", "r", encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        models = sorted(p for p in root.glob("model.*") if p.suffix in (".mlxq", ".onnx"))
+        if not models:
+            raise BundleError(f"No model.mlxq or model.onnx in {root}")
+        self.model_path = models[0]
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        path = self.root / "config.json"
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def tokenizer_path(self) -> Optional[Path]:
+        path = self.root / "tokenizer.json"
+        return path if path.exists() else None
+
+    def adapters(self) -> Dict[str, Path]:
+        return {p.stem: p for p in sorted((self.root / "adapters").glob("*.lora"))}
+
+    def _map(self, path: Path) -> mmap.mmap:
+        key = str(path)
+        with self._lock:
+            mapped = self._maps.get(key)
+            if mapped is None:
+                with open(path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[key] = mapped
+            return mapped
+
+    def weights(self) -> mmap.mmap:
+        return self._map(self.model_path)
+
+    def adapter(self, name: str) -> mmap.mmap:
+        path = self.adapters().get(name)
+        if path is None:
+            raise KeyError(f"Unknown adapter: {name}")
+        return self._map(path)
+
+    def close(self) -> None:
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+
+def _extract_member(bundle_path: str, zf: zipfile.ZipFile, info: zipfile.ZipInfo, objects: Path,
+                    digest: Optional[str]) -> Path:
+    if digest and (objects / digest[:2] / digest).exists():
+        return objects / digest[:2] / digest
+    objects.mkdir(parents=True, exist_ok=True)
+    tmp = objects / f".tmp-{uuid.uuid4().hex}"
+    h = hashlib.sha256()
+    try:
+        with open(tmp, "wb") as out:
+            if info.compress_type == zipfile.ZIP_STORED and info.file_size:
+                with open(bundle_path, "rb") as fh:
+                    start, length = _stored_span(fh, info)
+                    with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        view = memoryview(mm)
+                        try:
+                            for offset in range(start, start + length, 16 * _BUFFER):
+                                with view[offset:min(offset + 16 * _BUFFER, start + length)] as chunk:
+                                    h.update(chunk)
+                                    out.write(chunk)
+                        finally:
+                            view.release()
+            else:
+                with zf.open(info) as member:
+                    for chunk in iter(lambda: member.read(_BUFFER), b""):
+                        h.update(chunk)
+                        out.write(chunk)
+        actual = h.hexdigest()
+        if digest and actual != digest:
+            raise BundleError(f"Digest mismatch while extracting {info.filename}")
+        target = objects / actual[:2] / actual
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, target)
+        return target
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def open_bundle(bundle_path: str, pubkey_b64: Optional[str] = None, cache_root: Optional[str] = None,
+                verify: bool = True, allow_unsigned: bool = False) -> LoadedBundle:
+    """Verify ``bundle_path`` (see ``core.bundle.verify_bundle``) and return it extracted into the cache."""
+    root = Path(cache_root) if cache_root else default_cache_root()
+    digests: Dict[str, str] = {}
+    if verify:
+        result = verify_bundle(bundle_path, pubkey_b64, cache=VerificationCache(str(root / "verified.json")),
+                               allow_unsigned=allow_unsigned)
+        if not result.ok:
+            raise BundleError("; ".join(result.errors) or "Bundle verification failed")
+        digests = result.digests
+    with zipfile.ZipFile(bundle_path) as zf:
+        target = root / "bundles" / _bundle_key(zf)
+        if (target / _COMPLETE).exists():
+            return LoadedBundle(target)
+        staging = root / "bundles" / f".tmp-{uuid.uuid4().hex}"
+        try:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                dst = _member_path(staging, info.filename)
+                digest = digests.get(info.filename)
+                if verify and digest is None and info.filename != "manifest.json":
+                    raise BundleError(f"Bundle member {info.filename} is not covered by the manifest")
+                _link(_extract_member(bundle_path, zf, info, root / "objects", digest), dst)
+            (staging / _COMPLETE).touch()
+            try:
+                os.rename(staging, target)
+            except OSError:
+                # Another process finished the same bundle first.
+                if not (target / _COMPLETE).exists():
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    return LoadedBundle(target)
+
+
+__all__ = ["BundleError", "LoadedBundle", "default_cache_root", "open_bundle"]
@@ -0,0 +1,78 @@
+"""Request deadlines carried from the gRPC front end down to inference.
+
+The gRPC servicer opens a ``scope`` with the call's remaining time. Like the
+tracing context, the deadline lives in a ``contextvars`` variable, so it
+follows the request into the orchestrator coroutine on the shared loop.
+``ModelAdapter`` shortens its HTTP timeouts with ``timeout()`` and forwards
+what is left in an ``X-Request-Timeout`` header. The MLX runtime reads the
+header and stops waiting for, or running, generations nobody will receive.
+"""
+from __future__ import annotations
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Mapping, Optional
+
+
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("ondevice_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's deadline passed before the work finished."""
+
+
+@contextmanager
+def scope(seconds: Optional[float]) -> Iterator[None]:
+    """Run the block with a deadline ``seconds`` from now; an outer, earlier deadline wins."""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + max(0.0, float(seconds))
+    outer = _DEADLINE.get()
+    token = _DEADLINE.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or ``None`` without a deadline."""
+    deadline = _DEADLINE.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def timeout(default: float) -> float:
+    """``default`` capped at the time left; raises ``DeadlineExceeded`` once it has run out."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return min(default, left)
+
+
+def inject_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Return ``headers`` extended with the time left, if the request has a deadline."""
+    out = dict(headers or {})
+    left = remaining()
+    if left is not None:
+        out[TIMEOUT_HEADER] = f"{max(0.0, left):.3f}"
+    return out
+
+
+def from_headers(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds the caller is still willing to wait, from ``X-Request-Timeout``."""
+    raw = headers.get(TIMEOUT_HEADER)
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return None
+
+
+__all__ = ["DeadlineExceeded", "TIMEOUT_HEADER", "from_headers", "inject_headers", "remaining", "scope", "timeout"]
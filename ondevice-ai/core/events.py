@@ -0,0 +1,86 @@
+"""In-process change feed behind the runtime's ``/events`` stream.
+
+Every change worth showing in a client (documents indexed or deleted, audit
+entries, warmup progress) is published here with a sequence number. The
+last ``capacity`` events are kept so that a client which reconnects with the
+last sequence it saw gets what it missed instead of reloading everything.
+``read`` reports a gap when those events have already been dropped; the
+client then has to resync.
+
+``epoch`` changes on every process start, so a sequence number from a
+previous run is never mistaken for one of this run.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Event:
+    seq: int
+    kind: str
+    data: Dict[str, Any] = field(default_factory=dict)
+    ts: float = 0.0
+
+
+class EventFeed:
+    """Bounded, sequence-numbered event log with blocking reads."""
+
+    def __init__(self, capacity: int = 1024):
+        self.epoch = uuid.uuid4().hex[:12]
+        self._events: Deque[Event] = deque(maxlen=max(1, capacity))
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._dropped = 0
+        self.published = 0
+
+    @property
+    def last_seq(self) -> int:
+        with self._cond:
+            return self._seq
+
+    def publish(self, kind: str, data: Optional[Dict[str, Any]] = None) -> int:
+        """Append an event and wake the readers; returns its sequence number."""
+        with self._cond:
+            self._seq += 1
+            if len(self._events) == self._events.maxlen:
+                self._dropped = self._events[0].seq
+            self._events.append(Event(self._seq, kind, dict(data or {}), time.time()))
+            self.published += 1
+            self._cond.notify_all()
+            return self._seq
+
+    def read(self, after: int, timeout: Optional[float] = None) -> Tuple[List[Event], bool]:
+        """Events newer than ``after``, waiting up to ``timeout`` for one to arrive.
+
+        The flag is true when events after ``after`` were already dropped (or
+        ``after`` is from the future), i.e. the reader missed something.
+        """
+        with self._cond:
+            if after > self._seq or after < self._dropped:
+                return [], True
+            if after == self._seq and timeout:
+                self._cond.wait_for(lambda: self._seq > after, timeout=timeout)
+            if after < self._dropped:
+                return [], True
+            return [event for event in self._events if event.seq > after], False
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"epoch": self.epoch, "seq": self._seq, "buffered": len(self._events), "published": self.published}
+
+
+FEED = EventFeed()
+
+
+def publish(kind: str, data: Optional[Dict[str, Any]] = None) -> int:
+    """Publish on the process-wide feed."""
+    return FEED.publish(kind, data)
+
+
+__all__ = ["Event", "EventFeed", "FEED", "publish"]
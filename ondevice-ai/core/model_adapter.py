@@ -1,18 +1,86 @@
 # core/model_adapter.py
-import httpx, asyncio
+import httpx, asyncio, json
+from contextlib import contextmanager
+from core import deadline
+from core.deadline import DeadlineExceeded
+from core.tracing import inject_headers, span
+
+class ModelBusyError(RuntimeError):
+    """The runtime's inference queue is full (HTTP 429)."""
+
+
+def _headers():
+    return deadline.inject_headers(inject_headers())
+
+
+@contextmanager
+def _deadline_errors():
+    """Report an HTTP timeout caused by the request deadline as ``DeadlineExceeded``."""
+    try:
+        yield
+    except httpx.TimeoutException as exc:
+        left = deadline.remaining()
+        if left is not None and left <= 0.05:
+            raise DeadlineExceeded("request deadline exceeded") from exc
+        raise
+
+
+def _check_deadline(r):
+    if r.status_code == 504:
+        raise DeadlineExceeded(r.json().get("detail", "request deadline exceeded"))
+
 
 class ModelAdapter:
-    def __init__(self, url="http://127.0.0.1:9000"):
+    def __init__(self, url="http://127.0.0.1:9000", model_id=None):
         self.url = url
+        # Namespaces the orchestrator's plan cache; defaults to the runtime URL.
+        self.model_id = model_id or url
 
     async def embed(self, texts):
-        async with httpx.AsyncClient() as c:
-            r = await c.post(self.url + "/embed", json={"texts": texts}, timeout=60)
-            r.raise_for_status()
-            return r.json()["vectors"]
+        with span("model.embed", texts=len(texts)):
+            async with httpx.AsyncClient() as c:
+                with _deadline_errors():
+                    r = await c.post(self.url + "/embed", json={"texts": texts}, headers=_headers(),
+                                     timeout=deadline.timeout(60))
+                _check_deadline(r)
+                r.raise_for_status()
+                return r.json()["vectors"]
 
     async def predict(self, prompt, params=None):
+        with span("model.predict", prompt_chars=len(prompt)):
+            async with httpx.AsyncClient() as c:
+                with _deadline_errors():
+                    r = await c.post(self.url + "/predict", json={"prompt": prompt, "params": params or {}},
+                                     headers=_headers(), timeout=deadline.timeout(120))
+                _check_deadline(r)
+                if r.status_code == 429:
+                    raise ModelBusyError(r.json().get("detail", "inference queue full"))
+                r.raise_for_status()
+                return r.json()["text"]
+
+    async def predict_stream(self, prompt, params=None):
+        """Yield generated text chunks from the runtime's SSE ``/predict`` stream."""
+        # No span here: it would stay current in the consumer across yields.
+        body = {"prompt": prompt, "params": params or {}, "stream": True}
         async with httpx.AsyncClient() as c:
-            r = await c.post(self.url + "/predict", json={"prompt": prompt, "params": params or {}}, timeout=120)
-            r.raise_for_status()
-            return r.json()["text"]
+            with _deadline_errors():
+                async with c.stream("POST", self.url + "/predict", json=body, headers=_headers(),
+                                    timeout=deadline.timeout(120)) as r:
+                    if r.status_code == 429:
+                        await r.aread()
+                        raise ModelBusyError(r.json().get("detail", "inference queue full"))
+                    r.raise_for_status()
+                    event = "message"
+                    async for line in r.aiter_lines():
+                        if line.startswith("event:"):
+                            event = line[6:].strip()
+                        elif line.startswith("data:"):
+                            data = json.loads(line[5:].strip() or "{}")
+                            if event == "token":
+                                yield data.get("text", "")
+                            elif event == "error":
+                                if data.get("code") == "deadline_exceeded":
+                                    raise DeadlineExceeded(data.get("error", "request deadline exceeded"))
+                                raise RuntimeError(data.get("error", "generation failed"))
+                            elif event == "done":
+                                return
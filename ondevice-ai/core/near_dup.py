@@ -0,0 +1,103 @@
+"""SimHash fingerprints and a banded LSH index for near-duplicate text."""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+_BITS = 64
+
+
+def simhash(text: str, shingle: int = 3, min_tokens: int = 5) -> Optional[int]:
+    """64-bit SimHash over word shingles; ``None`` when the text is too short to judge."""
+    tokens = _TOKEN.findall(text.casefold())
+    if len(tokens) < min_tokens:
+        return None
+    grams: Dict[str, int] = defaultdict(int)
+    for i in range(max(1, len(tokens) - shingle + 1)):
+        grams[" ".join(tokens[i:i + shingle])] += 1
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest() for g in grams), dtype="<u8")
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little").astype(np.int64)
+    weights = np.fromiter(grams.values(), dtype=np.int64, count=len(grams))
+    totals = (bits * 2 - 1).T @ weights
+    return int(sum(1 << i for i in range(_BITS) if totals[i] > 0))
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def to_signed(value: int) -> int:
+    """SQLite INTEGER is signed 64-bit."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class NearDuplicateIndex:
+    """Finds a fingerprint within ``max_distance`` bits of a known one.
+
+    Fingerprints are split into ``max_distance + 1`` bands; by pigeonhole a
+    match within the distance shares at least one band exactly, so lookups
+    only compare against that band's bucket and recall is exact.
+    """
+
+    def __init__(self, max_distance: int = 5):
+        self.max_distance = max(0, int(max_distance))
+        self.bands = self.max_distance + 1
+        self._width = _BITS // self.bands
+        self._buckets: List[Dict[int, Set[str]]] = [defaultdict(set) for _ in range(self.bands)]
+        self._prints: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._prints)
+
+    def _keys(self, fp: int) -> Iterable[Tuple[int, int]]:
+        mask = (1 << self._width) - 1
+        for band in range(self.bands):
+            yield band, (fp >> (band * self._width)) & mask
+
+    def add(self, doc_id: str, fp: int) -> None:
+        with self._lock:
+            self._prints[doc_id] = fp
+            for band, key in self._keys(fp):
+                self._buckets[band][key].add(doc_id)
+
+    def remove(self, doc_id: str) -> None:
+        with self._lock:
+            fp = self._prints.pop(doc_id, None)
+            if fp is None:
+                return
+            for band, key in self._keys(fp):
+                bucket = self._buckets[band].get(key)
+                if bucket is not None:
+                    bucket.discard(doc_id)
+                    if not bucket:
+                        del self._buckets[band][key]
+
+    def find(self, fp: int) -> Optional[str]:
+        """Closest known document within the distance, if any."""
+        best: Optional[Tuple[int, str]] = None
+        with self._lock:
+            seen: Set[str] = set()
+            for band, key in self._keys(fp):
+                for doc_id in self._buckets[band].get(key, ()):
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    distance = hamming(fp, self._prints[doc_id])
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, doc_id)
+        return best[1] if best else None
+
+
+__all__ = ["NearDuplicateIndex", "hamming", "simhash", "to_signed", "to_unsigned"]
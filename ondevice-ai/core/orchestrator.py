@@ -1,14 +1,35 @@
 # core/orchestrator.py
 import numpy as np
-from core.vector_store import VectorStore
+from core.vector_store import DEDUP_POLICIES, DEFAULT_PARTITION, VectorStore
+from core.async_store import AsyncVectorStore
+from core.action_stream import ActionStreamParser
 from core.model_adapter import ModelAdapter
-import asyncio, json
-from typing import Optional, Any
+from core.plan_cache import PlanCache, plan_key
+from core.tracing import span, traced
+import asyncio, json, os
+from concurrent import futures
+from typing import Dict, Optional, Any, Set
+
+# Constant part of the plan prompt. It is sent as a declared prefix so the
+# runtime can reuse its processed state instead of re-reading it per request.
+PLAN_PROMPT_PREFIX = (
+    "You are a local assistant. Create a step-by-step plan of actions to achieve: "
+)
+PLAN_PROMPT_SUFFIX = "\nReturn JSON array of actions: {name, payload, sensitive, preview_required}"
+PLAN_DEFAULT_PARAMS = {"max_tokens": 256}
 
 class Orchestrator:
-    def __init__(self, store: Optional[VectorStore]=None, model: Optional[Any]=None):
+    def __init__(self, store: Optional[VectorStore]=None, model: Optional[Any]=None, plan_cache: Optional[PlanCache]=None,
+                 dedup_policy: Optional[str]=None):
+        self._owns_store = store is None
         self.store = store or VectorStore()
+        # Coroutines go through this so SQLite and scans never run on the event loop.
+        self.astore = AsyncVectorStore(self.store)
         self.model = model or ModelAdapter()
+        self.plan_cache = plan_cache if plan_cache is not None else PlanCache()
+        self.dedup_policy = dedup_policy or os.environ.get("ONDEVICE_DEDUP", "link")
+        if self.dedup_policy not in DEDUP_POLICIES:
+            raise ValueError(f"Unknown dedup policy: {self.dedup_policy}")
 
     @staticmethod
     def cosine(a,b):
@@ -16,35 +37,126 @@ class Orchestrator:
         if an==0 or bn==0: return 0.0
         return float(np.dot(a,b)/(an*bn))
 
-    async def index_text(self, text, source="cli"):
-        doc_id = self.store.add(text, source)
-        vec = (await self.model.embed([text]))[0]
-        import numpy as np
-        self.store.insert_embedding(doc_id, np.array(vec, dtype=np.float32))
-        return doc_id
-
-    async def query(self, q, k=5):
-        qv = (await self.model.embed([q]))[0]
-        rows = self.store.all_embeddings()
-        scored=[]
-        for _, v, doc_id in rows:
-            scored.append((self.cosine(np.array(qv), v), doc_id))
-        scored.sort(reverse=True, key=lambda x:x[0])
-        hits=[]
-        for score, doc_id in scored[:k]:
-            hits.append({"doc_id": doc_id, "score": score, "text": self.store.get_doc(doc_id)})
-        return hits
-
-    async def plan(self, goal):
+    async def index_text(self, text, source="cli", user_id=DEFAULT_PARTITION):
+        """Store and embed ``text`` in the ``user_id`` partition; returns the document id.
+
+        The store serialises identical ingests (here and over HTTP) and calls
+        back into the model on this loop while it holds the text's lock.
+        """
+        loop = asyncio.get_running_loop()
+        calls: Set["futures.Future[Any]"] = set()
+        cancelled = False
+
+        def embed(text):
+            # Runs on a store worker thread; the model call itself runs on the loop.
+            if cancelled:
+                raise futures.CancelledError()
+            call = asyncio.run_coroutine_threadsafe(self.model.embed([text]), loop)
+            calls.add(call)
+            try:
+                return np.array(call.result()[0], dtype=np.float32)
+            finally:
+                calls.discard(call)
+
+        with span("orchestrator.index_text", source=source, chars=len(text)) as sp:
+            try:
+                doc_id, outcome, _ = await self.astore.ingest(text, source, user_id, self.dedup_policy, embed=embed)
+            except asyncio.CancelledError:
+                # Stop the model request of a call that ended early.
+                cancelled = True
+                for call in list(calls):
+                    call.cancel()
+                raise
+            if outcome != "new":
+                sp.set("dedup", outcome)
+            return doc_id
+
+    def close(self):
+        """Stop the store worker threads, and close the store if this orchestrator opened it."""
+        self.astore.close()
+        if self._owns_store:
+            self.store.close()
+
+    def dedup_stats(self) -> Dict[str, Any]:
+        """The store's ingest counts (gRPC and HTTP together) and this orchestrator's policy."""
+        return dict(self.store.dedup_stats(), policy=self.dedup_policy)
+
+    async def delete_documents(self, doc_ids=None, source_prefix=None, user_id=None):
+        with span("orchestrator.delete_documents", ids=len(doc_ids or []), source_prefix=source_prefix or ""):
+            return await self.astore.delete(ids=doc_ids, source_prefix=source_prefix, user_id=user_id)
+
+    async def query(self, q, k=5, user_id=DEFAULT_PARTITION):
+        """Top-``k`` hits from the caller's partition only."""
+        with span("orchestrator.query", k=k):
+            qv = (await self.model.embed([q]))[0]
+            with span("orchestrator.score"):
+                scored = await self.astore.search(np.asarray(qv, dtype=np.float32), k, user_id)
+            with span("orchestrator.hydrate", hits=min(k, len(scored))):
+                docs = await self.astore.get_documents([doc_id for _, doc_id in scored[:k]])
+                hits=[]
+                for score, doc_id in scored[:k]:
+                    doc = docs.get(doc_id)
+                    hits.append({"doc_id": doc_id, "score": score, "text": doc["text"] if doc else None})
+            return hits
+
+    @property
+    def model_id(self) -> str:
+        return str(getattr(self.model, "model_id", None) or type(self.model).__name__)
+
+    @staticmethod
+    def _note_action(txt):
+        return {"name":"note","payload":json.dumps({"text":txt}), "sensitive":False, "preview_required":False}
+
+    def _plan_request(self, goal, params, user_id=DEFAULT_PARTITION):
+        params = {**PLAN_DEFAULT_PARAMS, **(params or {})}
+        # Each partition gets its own cache entries; one user's goals never answer another's.
+        namespace = self.model_id if user_id == DEFAULT_PARTITION else f"{self.model_id}#{user_id}"
+        key = plan_key(namespace, goal, params)
         # deterministic prompt recipe
-        prompt = (
-            "You are a local assistant. Create a step-by-step plan of actions to achieve: "
-            f"{goal}\nReturn JSON array of actions: {{name, payload, sensitive, preview_required}}"
-        )
-        txt = await self.model.predict(prompt, params={"max_tokens":256})
+        prompt = PLAN_PROMPT_PREFIX + f"{goal}" + PLAN_PROMPT_SUFFIX
+        return key, prompt, {**params, "prefix_chars": len(PLAN_PROMPT_PREFIX)}
+
+    @traced("orchestrator.plan")
+    async def plan(self, goal, params=None, user_id=DEFAULT_PARTITION):
+        key, prompt, model_params = self._plan_request(goal, params, user_id)
+        cached = self.plan_cache.get(key)
+        if cached is not None:
+            return cached
+        txt = await self.model.predict(prompt, params=model_params)
         # expect txt to be JSON. Fallback: try parse, else simple action
         try:
             actions = json.loads(txt)
         except Exception:
-            actions = [{"name":"note","payload":json.dumps({"text":txt}), "sensitive":False, "preview_required":False}]
+            return [self._note_action(txt)]
+        if isinstance(actions, list):
+            self.plan_cache.put(key, actions)
         return actions
+
+    async def plan_stream(self, goal, params=None, user_id=DEFAULT_PARTITION):
+        """Yield plan actions as soon as each one is fully generated."""
+        key, prompt, model_params = self._plan_request(goal, params, user_id)
+        cached = self.plan_cache.get(key)
+        if cached is not None:
+            for action in cached:
+                yield action
+            return
+        stream = getattr(self.model, "predict_stream", None)
+
+        async def _chunks():
+            if stream is None:
+                # Models without streaming still go through the parser.
+                yield await self.model.predict(prompt, params=model_params)
+            else:
+                async for chunk in stream(prompt, params=model_params):
+                    yield chunk
+
+        parser = ActionStreamParser()
+        actions = []
+        async for chunk in _chunks():
+            for action in parser.feed(chunk):
+                actions.append(action)
+                yield action
+        if actions:
+            self.plan_cache.put(key, actions)
+        else:
+            yield self._note_action(parser.text)
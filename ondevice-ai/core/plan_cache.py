@@ -0,0 +1,83 @@
+"""TTL- and size-bounded cache of generated plans."""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("ONDEVICE_PLAN_CACHE_SIZE", "256"))
+DEFAULT_TTL_SECONDS = float(os.environ.get("ONDEVICE_PLAN_CACHE_TTL", "900"))
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_goal(goal: str) -> str:
+    """Fold case, whitespace and trailing punctuation so near-identical goals share an entry."""
+    return _WS.sub(" ", goal.casefold()).strip().rstrip(".!?;:")
+
+
+def plan_key(model_id: str, goal: str, params: Optional[Dict[str, Any]] = None) -> Tuple[str, str, str]:
+    goal_hash = hashlib.sha256(normalize_goal(goal).encode("utf-8")).hexdigest()
+    return (model_id, goal_hash, json.dumps(params or {}, sort_keys=True, default=str))
+
+
+class PlanCache:
+    """LRU of parsed action lists with per-entry expiry.
+
+    Entries are deep-copied in and out so callers can mutate returned plans.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS) -> None:
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, key: Tuple[str, str, str], actions: List[Dict[str, Any]]) -> None:
+        if self.max_entries == 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(actions))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            stale = [key for key, (expires, _) in self._entries.items() if expires < now]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+__all__ = ["PlanCache", "normalize_goal", "plan_key"]
@@ -1,6 +1,7 @@
-import platform, subprocess, json, os, sys
-from typing import Dict, Any, Optional
-from core.plugins import PluginManifest
+import json, os, sys
+from typing import Dict, Any, Optional, Set
+from core.action_executor import ActionExecutor
+from core.plugins import MANIFESTS, ManifestRegistry, PluginManifest
 
 
 class CapabilityError(Exception):
@@ -11,38 +12,47 @@ class PluginRuntime:
     """Executes a minimal set of safe, whitelisted AppleScript-based actions.
 
     Capabilities are loaded from plugins/plugin-manifest.yaml and enforced per action.
+    Scripts run on an ``ActionExecutor``; concurrent actions are batched into
+    one ``osascript`` call.
     """
 
-    def __init__(self, manifest_path: 'str | None' = None):
+    def __init__(self, manifest_path: 'str | None' = None, executor: Optional[ActionExecutor] = None,
+                 registry: Optional[ManifestRegistry] = None):
+        self.executor = executor or ActionExecutor()
+        self._handlers = {
+            "open_finder": ("finder", self._open_finder),
+            "create_note": ("notes", self._create_note),
+            "create_calendar_event": ("calendar", self._create_calendar_event),
+            "compose_mail": ("mail", self._compose_mail),
+        }
         base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
         if getattr(sys, "_MEIPASS", None):
             base_dir = sys._MEIPASS  # type: ignore[attr-defined]
         default_manifest = os.path.join(base_dir, "plugins", "plugin-manifest.yaml")
-        path = manifest_path or default_manifest
-        if os.path.isfile(path):
-            try:
-                self.manifest: Optional[PluginManifest] = PluginManifest.load(path)
-                self.capabilities = set(self.manifest.capabilities)
-                self.enabled = True
-            except Exception:
-                self.manifest = None
-                self.capabilities = set()
-                self.enabled = False
-        else:
-            self.manifest = None
-            self.capabilities = set()
-            self.enabled = False
+        self.manifest_path = manifest_path or default_manifest
+        self.registry = registry or MANIFESTS
+        self.manifest: Optional[PluginManifest] = None
+        self.capabilities: Set[str] = set()
+        self.enabled = False
+        self.reload()
+
+    def reload(self) -> None:
+        """Pick up manifest edits; cheap when the file is unchanged."""
+        try:
+            manifest = self.registry.get(self.manifest_path)
+        except Exception:
+            manifest = None
+        if manifest is not self.manifest:
+            self.manifest = manifest
+            self.capabilities = set(manifest.capabilities) if manifest else set()
+        self.enabled = manifest is not None
 
     async def execute(self, name: str, payload: Dict[str, Any]):
-        handlers = {
-            "open_finder": ("finder", self._open_finder),
-            "create_note": ("notes", self._create_note),
-            "create_calendar_event": ("calendar", self._create_calendar_event),
-            "compose_mail": ("mail", self._compose_mail),
-        }
-        if name not in handlers:
+        handler = self._handlers.get(name)
+        if handler is None:
             raise CapabilityError(f"Unknown action: {name}")
-        cap, fn = handlers[name]
+        cap, fn = handler
+        self.reload()
         if not self.enabled:
             raise CapabilityError("Plugin runtime disabled; missing or invalid manifest")
         if self.capabilities and cap not in self.capabilities:
@@ -50,13 +60,8 @@ class PluginRuntime:
         return await fn(payload)
 
     async def _run_osascript(self, script: str) -> str:
-        if platform.system() != "Darwin":
-            # No-op on non-macOS systems
-            return "noop"
-        res = subprocess.run(["osascript", "-e", script], capture_output=True, text=True)
-        if res.returncode != 0:
-            raise RuntimeError(res.stderr.strip() or "osascript failed")
-        return (res.stdout or "").strip()
+        # Off macOS the default executor backend is a no-op returning "noop".
+        return await self.executor.run(script)
 
     async def _open_finder(self, payload: Dict[str, Any]):
         path = payload.get("path", "~/")
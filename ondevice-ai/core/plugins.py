@@ -1,7 +1,9 @@
 # core/plugins.py
+import os
+import threading
 import yaml
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Optional, Tuple, Union
 
 @dataclass
 class PluginManifest:
@@ -30,3 +32,53 @@ class PluginManifest:
             id=data["id"], name=data["name"], version=data["version"],
             scopes=list(data["scopes"]), api=data["api"], signature=sig,
             min_core_version=data["min_core_version"], capabilities=list(data["capabilities"]) )
+
+
+class ManifestRegistry:
+    """Parsed manifests keyed by path, revalidated with a stat per lookup.
+
+    A manifest is re-parsed only when its mtime, size or inode changes, or
+    after ``invalidate`` (for callers that watch the plugins directory).
+    Parse failures are cached the same way and re-raised until the file changes.
+    Returned manifests are shared; treat them as read-only.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple[int, int, int], Union[PluginManifest, Exception]]] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, path: str) -> Optional[PluginManifest]:
+        """Return the manifest at ``path``, ``None`` if it does not exist; raise if it is invalid."""
+        key = os.path.abspath(path)
+        try:
+            st = os.stat(key)
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is None or cached[0] != stamp:
+            try:
+                value: Union[PluginManifest, Exception] = PluginManifest.load(key)
+            except Exception as exc:
+                value = exc
+            with self._lock:
+                self.loads += 1
+                self._entries[key] = (stamp, value)
+            cached = (stamp, value)
+        if isinstance(cached[1], Exception):
+            raise cached[1]
+        return cached[1]
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+
+MANIFESTS = ManifestRegistry()
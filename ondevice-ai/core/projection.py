@@ -0,0 +1,207 @@
+"""Reduced-dimension search: candidates come from projected vectors and are re-ranked on full ones.
+
+A ``Projection`` maps normalised embeddings to ``dim_out`` dimensions. It is
+either fitted PCA (the top right-singular vectors of the uncentred vectors, so
+dot products in the reduced space approximate the full cosine) or a
+Matryoshka-style prefix of the first ``dim_out`` components. Prefix
+projections only make sense for models trained to front-load information.
+
+``RerankIndex`` has the same interface as ``LocalIndex``/``ShardedIndex``.
+Its scan runs over the projected rows. It over-fetches ``oversample`` times
+``k`` candidates and re-scores them exactly against the full vectors. Those
+are kept in process unless a ``full`` reader is given; ``VectorStore`` passes
+one reading them from SQLite when the candidate scan is sharded, so the main
+process does not hold every full vector next to the shards.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.shards import Hit, LocalIndex, ShardedIndex, _normalise, _top_k
+
+KINDS = ("pca", "prefix")
+
+# Reads the full vectors of those ids still present, in the given order.
+VectorReader = Callable[[Sequence[str]], Tuple[List[str], np.ndarray]]
+
+
+@dataclass
+class Projection:
+    kind: str
+    dim_in: int
+    dim_out: int
+    components: Optional[np.ndarray] = None
+    explained: float = 0.0
+
+    def apply(self, vecs: np.ndarray) -> np.ndarray:
+        vecs = _normalise(np.atleast_2d(vecs))
+        if vecs.shape[1] != self.dim_in:
+            raise ValueError(f"Embedding has {vecs.shape[1]} dimensions, projection expects {self.dim_in}")
+        if self.kind == "prefix":
+            return np.ascontiguousarray(vecs[:, :self.dim_out])
+        assert self.components is not None
+        return vecs @ self.components
+
+    def save(self, path: str) -> None:
+        """Write atomically, so a refit never leaves a half-written file for a starting store."""
+        tmp = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(tmp, kind=np.array(self.kind), dim_in=self.dim_in, dim_out=self.dim_out,
+                 components=self.components if self.components is not None else np.zeros((0, 0), np.float32),
+                 explained=self.explained)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Projection":
+        with np.load(path) as data:
+            components = data["components"]
+            return cls(kind=str(data["kind"]), dim_in=int(data["dim_in"]), dim_out=int(data["dim_out"]),
+                       components=components.astype(np.float32) if components.size else None,
+                       explained=float(data["explained"]))
+
+
+def fit(vecs: np.ndarray, dim: int, kind: str = "pca", sample: int = 50_000, seed: int = 0) -> Projection:
+    """Fit a projection to ``dim`` dimensions on (a sample of) ``vecs``."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown projection kind {kind!r}; expected one of {KINDS}")
+    vecs = np.atleast_2d(np.asarray(vecs, dtype=np.float32))
+    dim_in = vecs.shape[1]
+    if not 0 < dim < dim_in:
+        raise ValueError(f"Reduced dimension must be between 1 and {dim_in - 1}, got {dim}")
+    if len(vecs) > sample:
+        vecs = vecs[np.random.default_rng(seed).choice(len(vecs), sample, replace=False)]
+    x = _normalise(vecs)
+    if kind == "prefix":
+        # Share of each vector's energy kept by the prefix, averaged.
+        return Projection("prefix", dim_in, dim, explained=float(np.mean(np.sum(x[:, :dim] ** 2, axis=1))))
+    if len(x) < dim:
+        raise ValueError(f"PCA to {dim} dimensions needs at least {dim} vectors, got {len(x)}")
+    _, s, vt = np.linalg.svd(x, full_matrices=False)
+    energy = s ** 2
+    return Projection("pca", dim_in, dim, components=np.ascontiguousarray(vt[:dim].T, dtype=np.float32),
+                      explained=float(energy[:dim].sum() / energy.sum()) if energy.sum() else 0.0)
+
+
+class RerankIndex:
+    """Scan projected vectors for ``k * oversample`` candidates, then re-score them on full vectors."""
+
+    def __init__(self, projection: Projection, candidates: Union[LocalIndex, ShardedIndex], oversample: int = 8,
+                 full: Optional[VectorReader] = None):
+        self.projection = projection
+        self.oversample = max(1, int(oversample))
+        self.dim = projection.dim_in
+        self._full = LocalIndex(projection.dim_in) if full is None else None
+        self._read = full
+        self._reduced = candidates
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._reduced)
+
+    @property
+    def tombstones(self) -> int:
+        return self._reduced.tombstones
+
+    def add(self, ids: Sequence[str], vecs: np.ndarray) -> None:
+        vecs = np.atleast_2d(np.asarray(vecs, dtype=np.float32))
+        reduced = self.projection.apply(vecs)
+        with self._lock:
+            if self._full is not None:
+                self._full.add(ids, vecs)
+            self._reduced.add(ids, reduced)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        ids = list(ids)
+        with self._lock:
+            if self._full is not None:
+                self._full.remove(ids)
+            return self._reduced.remove(ids)
+
+    def search(self, query: np.ndarray, k: int) -> List[Hit]:
+        if k <= 0:
+            return []
+        hits = self._reduced.search(self.projection.apply(query)[0], k * self.oversample)
+        if not hits:
+            return []
+        ids = [doc_id for _, doc_id in hits]
+        if self._full is None:
+            assert self._read is not None
+            ids, full = self._read(ids)
+        else:
+            with self._lock:
+                ids, full = self._full.vectors(ids)
+        if not ids:
+            return []
+        scores = _normalise(full) @ _normalise(np.asarray(query, dtype=np.float32))
+        return [(float(scores[i]), ids[i]) for i in _top_k(scores, min(k, len(ids)))]
+
+    def compact(self) -> int:
+        with self._lock:
+            if self._full is not None:
+                self._full.compact()
+            return self._reduced.compact()
+
+    def close(self) -> None:
+        self._reduced.close()
+
+
+def recall_report(vecs: np.ndarray, projection: Projection, k: int = 10, oversample: int = 8,
+                  queries: int = 200, seed: int = 0) -> Dict[str, float]:
+    """Compare reduced search against an exact full-dimension scan over ``vecs``.
+
+    Queries are stored vectors with a little noise added. ``candidate_recall``
+    is the share of the true top-``k`` found in the projected top-``k`` before
+    re-ranking. ``recall`` is the same share after re-ranking the oversampled
+    candidates, which is what ``VectorStore.search`` returns.
+    """
+    vecs = np.atleast_2d(np.asarray(vecs, dtype=np.float32))
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vecs), min(queries, len(vecs)), replace=False)
+    noise = rng.standard_normal((len(picks), vecs.shape[1])).astype(np.float32)
+    qs = _normalise(_normalise(vecs[picks]) + 0.1 * _normalise(noise))
+    ids = [str(i) for i in range(len(vecs))]
+    full = LocalIndex()
+    full.add(ids, vecs)
+    reduced = LocalIndex()
+    reduced.add(ids, projection.apply(vecs))
+    rerank = RerankIndex(projection, LocalIndex(), oversample)
+    rerank.add(ids, vecs)
+    kk = min(k, len(vecs))
+
+    def timed(index, q):
+        started = time.perf_counter()
+        hits = index.search(q, kk)
+        return {doc_id for _, doc_id in hits}, time.perf_counter() - started
+
+    candidate_hits = rerank_hits = 0
+    full_time = rerank_time = 0.0
+    for q in qs:
+        truth, elapsed = timed(full, q)
+        full_time += elapsed
+        candidates = {doc_id for _, doc_id in reduced.search(projection.apply(q)[0], kk)}
+        found, elapsed = timed(rerank, q)
+        rerank_time += elapsed
+        candidate_hits += len(truth & candidates)
+        rerank_hits += len(truth & found)
+    total = max(1, kk * len(qs))
+    return {
+        "rows": len(vecs),
+        "dim_in": projection.dim_in,
+        "dim_out": projection.dim_out,
+        "explained": projection.explained,
+        "k": kk,
+        "oversample": oversample,
+        "queries": len(qs),
+        "candidate_recall": candidate_hits / total,
+        "recall": rerank_hits / total,
+        "full_ms": 1000 * full_time / max(1, len(qs)),
+        "reduced_ms": 1000 * rerank_time / max(1, len(qs)),
+    }
+
+
+__all__ = ["KINDS", "Projection", "RerankIndex", "VectorReader", "fit", "recall_report"]
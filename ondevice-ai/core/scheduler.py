@@ -1,32 +1,212 @@
 import asyncio
-from typing import Callable, Awaitable, Dict
+import heapq
+import itertools
+import random
+import time
+from typing import Any, Callable, Awaitable, Dict, List, Optional, Tuple
+
+from core.activity import REQUEST_METER, RequestRateMeter
+
+
+class _PrioritySlots:
+    """Counting semaphore that wakes the highest-priority waiter first."""
+
+    def __init__(self, slots: int):
+        self._free = max(1, int(slots))
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # We were handed a slot just as we got cancelled; pass it on.
+                self.release()
+            else:
+                self._waiters = [w for w in self._waiters if w[2] is not fut]
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._free += 1
+
+
+class _Job:
+    def __init__(self, name: str, fn: Callable[[], Awaitable[None]], seconds: float, priority: int,
+                 jitter: float, when_idle: bool, max_delay: Optional[float], timeout: Optional[float]):
+        self.name = name
+        self.fn = fn
+        self.interval = max(0.01, float(seconds))
+        self.priority = int(priority)
+        self.jitter = max(0.0, float(jitter))
+        self.when_idle = when_idle
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.failures = 0
+        self.missed = 0
+        self.idle_waits = 0
+        self.last_error: Optional[str] = None
+        self.last_run_ms = 0.0
+        self.total_run_ms = 0.0
+        self.max_run_ms = 0.0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.next_due: Optional[float] = None
+
+    def metrics(self, now: float) -> Dict[str, Any]:
+        return {
+            "priority": self.priority,
+            "interval_s": self.interval,
+            "when_idle": self.when_idle,
+            "runs": self.runs,
+            "failures": self.failures,
+            "missed": self.missed,
+            "idle_waits": self.idle_waits,
+            "last_error": self.last_error,
+            "last_run_ms": round(self.last_run_ms, 3),
+            "avg_run_ms": round(self.total_run_ms / self.runs, 3) if self.runs else 0.0,
+            "max_run_ms": round(self.max_run_ms, 3),
+            "last_lag_ms": round(self.last_lag_ms, 3),
+            "max_lag_ms": round(self.max_lag_ms, 3),
+            "next_run_in_s": round(max(0.0, self.next_due - now), 3) if self.next_due is not None else None,
+        }
 
 
 class Scheduler:
-    """Very small asyncio interval scheduler."""
+    """Asyncio interval scheduler with priorities, a concurrency cap and idle-time work.
+
+    Jobs run at a fixed rate. A run that overruns its interval causes the
+    missed ticks to be skipped and counted, not queued up. At most
+    ``max_parallel`` jobs run at once, and when they contend for a slot the
+    higher ``priority`` goes first. ``jitter`` (seconds) spreads out jobs
+    that share an interval. ``when_idle`` jobs wait until the live request
+    rate drops to ``idle_rps``, but never longer than their ``max_delay``.
+    A job that raises is recorded in ``metrics()`` and keeps its schedule.
+
+    Pass ``loop`` to drive the scheduler from a thread that is not running
+    that loop (e.g. the daemon's main thread).
+    """
 
-    def __init__(self):
-        self._tasks: Dict[str, asyncio.Task] = {}
+    def __init__(self, max_parallel: int = 2, meter: Optional[RequestRateMeter] = None, idle_rps: float = 0.5,
+                 idle_poll: float = 0.5, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._jobs: Dict[str, _Job] = {}
+        self._max_parallel = max_parallel
+        self._slots: Optional[_PrioritySlots] = None
+        self._meter = meter or REQUEST_METER
+        self._idle_rps = idle_rps
+        self._idle_poll = idle_poll
+        self._loop = loop
+        self._running = 0
 
-    def add_interval_job(self, name: str, fn: Callable[[], Awaitable[None]], seconds: int) -> None:
-        if name in self._tasks:
+    def add_interval_job(self, name: str, fn: Callable[[], Awaitable[None]], seconds: float, *, priority: int = 0,
+                         jitter: float = 0.0, when_idle: bool = False, max_delay: Optional[float] = None,
+                         timeout: Optional[float] = None, initial_delay: float = 0.0) -> None:
+        if name in self._jobs:
             raise ValueError(f"Job already exists: {name}")
+        job = _Job(name, fn, seconds, priority, jitter, when_idle, max_delay, timeout)
+        self._jobs[name] = job
+        self._call(lambda: self._spawn(job, initial_delay))
 
-        async def runner():
-            try:
-                while True:
-                    await fn()
-                    await asyncio.sleep(max(1, int(seconds)))
-            except asyncio.CancelledError:
-                return
+    def _call(self, callback: Callable[[], None]) -> None:
+        if self._loop is not None and not self._on_loop_thread():
+            self._loop.call_soon_threadsafe(callback)
+        else:
+            callback()
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _spawn(self, job: _Job, initial_delay: float) -> None:
+        if self._jobs.get(job.name) is job:
+            job.task = asyncio.create_task(self._runner(job, initial_delay), name=f"job:{job.name}")
+
+    def _idle(self) -> bool:
+        return self._meter.rate() <= self._idle_rps
+
+    async def _runner(self, job: _Job, initial_delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = _PrioritySlots(self._max_parallel)
+        job.next_due = loop.time() + max(0.0, initial_delay)
+        try:
+            while True:
+                wake = job.next_due + (random.uniform(0.0, job.jitter) if job.jitter else 0.0)
+                await asyncio.sleep(max(0.0, wake - loop.time()))
+                if job.when_idle and not self._idle():
+                    job.idle_waits += 1
+                    deadline = job.next_due + job.max_delay if job.max_delay is not None else None
+                    while not self._idle() and (deadline is None or loop.time() < deadline):
+                        await asyncio.sleep(self._idle_poll)
+                await self._slots.acquire(job.priority)
+                try:
+                    await self._run_once(job, loop)
+                finally:
+                    self._slots.release()
+                job.next_due += job.interval
+                now = loop.time()
+                if now > job.next_due:
+                    skipped = int((now - job.next_due) // job.interval) + 1
+                    job.missed += skipped
+                    job.next_due += skipped * job.interval
+        except asyncio.CancelledError:
+            return
+
+    async def _run_once(self, job: _Job, loop: asyncio.AbstractEventLoop) -> None:
+        started = loop.time()
+        lag = (started - job.next_due) * 1000.0 if job.next_due is not None else 0.0
+        job.last_lag_ms = lag
+        job.max_lag_ms = max(job.max_lag_ms, lag)
+        perf = time.perf_counter()
+        self._running += 1
+        try:
+            if job.timeout:
+                await asyncio.wait_for(job.fn(), job.timeout)
+            else:
+                await job.fn()
+            job.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            job.failures += 1
+            job.last_error = f"{type(exc).__name__}: {exc}"
+        finally:
+            self._running -= 1
+            elapsed = (time.perf_counter() - perf) * 1000.0
+            job.runs += 1
+            job.last_run_ms = elapsed
+            job.total_run_ms += elapsed
+            job.max_run_ms = max(job.max_run_ms, elapsed)
 
-        self._tasks[name] = asyncio.create_task(runner(), name=f"job:{name}")
+    def metrics(self) -> Dict[str, Any]:
+        now = self._loop.time() if self._loop is not None else time.monotonic()
+        return {
+            "max_parallel": self._max_parallel,
+            "running": self._running,
+            "request_rate": round(self._meter.rate(), 3),
+            "jobs": {name: job.metrics(now) for name, job in self._jobs.items()},
+        }
 
     def cancel(self, name: str) -> None:
-        t = self._tasks.pop(name, None)
-        if t:
-            t.cancel()
+        job = self._jobs.pop(name, None)
+        if job and job.task:
+            self._call(job.task.cancel)
 
     def cancel_all(self) -> None:
-        for name in list(self._tasks.keys()):
+        for name in list(self._jobs.keys()):
             self.cancel(name)
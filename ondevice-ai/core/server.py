@@ -5,54 +5,200 @@ import asyncio
 import json
 import threading
 from concurrent import futures
-from typing import Any, Coroutine, Iterable
+from typing import Any, AsyncIterator, Coroutine, Dict, Iterable, Iterator, Optional
 
 import grpc
 
 from core import assistant_pb2 as pb
 from core import assistant_pb2_grpc as rpc
+from core import deadline
+from core.activity import REQUEST_METER
 from core.audit import write_event
+from core.deadline import DeadlineExceeded
+from core.model_adapter import ModelBusyError
 from core.orchestrator import Orchestrator
+from core.tracing import span
+from core.vector_store import QuotaExceeded
 
 
-_LOOP = asyncio.new_event_loop()
-_THREAD = threading.Thread(target=_LOOP.run_forever, name="grpc-worker-loop", daemon=True)
-_THREAD.start()
+_LOOP: asyncio.AbstractEventLoop | None = None
+_LOOP_LOCK = threading.Lock()
 
 
-def _run(coro: Coroutine[Any, Any, Any]) -> Any:
-    """Run the orchestrator coroutine on the shared background loop."""
-    return asyncio.run_coroutine_threadsafe(coro, _LOOP).result()
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Start the shared background loop on first use rather than at import."""
+    global _LOOP
+    if _LOOP is None:
+        with _LOOP_LOCK:
+            if _LOOP is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="grpc-worker-loop", daemon=True).start()
+                _LOOP = loop
+    return _LOOP
+
+
+_NO_DEADLINE = 365 * 24 * 3600.0
+_OUTCOMES: Dict[str, Dict[str, int]] = {}
+_OUTCOMES_LOCK = threading.Lock()
+
+
+def rpc_metrics() -> Dict[str, Any]:
+    """Calls given up on because of their deadline or a client cancel, for ``/metrics``."""
+    with _OUTCOMES_LOCK:
+        by_method = {method: dict(codes) for method, codes in _OUTCOMES.items()}
+    totals = {code: sum(codes.get(code, 0) for codes in by_method.values()) for code in ("DEADLINE_EXCEEDED", "CANCELLED")}
+    return {"deadline_exceeded": totals["DEADLINE_EXCEEDED"], "cancelled": totals["CANCELLED"], "by_method": by_method}
+
+
+def _time_remaining(context: Any) -> Optional[float]:
+    # grpc reports a call without a deadline as one far in the future.
+    left = context.time_remaining() if context is not None else None
+    return None if left is None or left > _NO_DEADLINE else max(0.0, left)
+
+
+def _abandon(context: Any, method: str, exc: BaseException) -> None:
+    """Count and end a call whose deadline passed or whose client went away.
+
+    The code follows what stopped the call: a wait that timed out (or a model
+    call that ran out of the propagated deadline) is DEADLINE_EXCEEDED; a
+    cancelled future, i.e. the RPC ended under us, is CANCELLED.
+    """
+    timed_out = isinstance(exc, (futures.TimeoutError, TimeoutError, DeadlineExceeded))
+    code = grpc.StatusCode.DEADLINE_EXCEEDED if timed_out else grpc.StatusCode.CANCELLED
+    with _OUTCOMES_LOCK:
+        codes = _OUTCOMES.setdefault(method, {})
+        codes[code.name] = codes.get(code.name, 0) + 1
+    context.abort(code, "deadline exceeded" if code is grpc.StatusCode.DEADLINE_EXCEEDED else "cancelled")
+
+
+def _submit(coro: Coroutine[Any, Any, Any], context: Any) -> "futures.Future[Any]":
+    # The deadline is set here so the task's copied context carries it.
+    with deadline.scope(_time_remaining(context)):
+        return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def _run(coro: Coroutine[Any, Any, Any], context: Any = None, method: str = "") -> Any:
+    """Run the orchestrator coroutine on the shared background loop.
+
+    With a gRPC ``context``, the coroutine gets the call's deadline and is
+    cancelled as soon as the call ends early, so its model requests stop too.
+    """
+    future = _submit(coro, context)
+    if context is None:
+        return future.result()
+    context.add_callback(future.cancel)
+    try:
+        return future.result(timeout=_time_remaining(context))
+    except (futures.TimeoutError, futures.CancelledError, DeadlineExceeded) as exc:
+        future.cancel()
+        _abandon(context, method, exc)
+
+
+def _iterate(agen: AsyncIterator[Any], context: Any = None, method: str = "") -> Iterator[Any]:
+    """Drive an async generator on the shared loop from a blocking gRPC thread."""
+    loop = get_loop()
+    current: "futures.Future[Any] | None" = None
+    abandoned = False
+    if context is not None:
+        context.add_callback(lambda: current is not None and current.cancel())
+    try:
+        while True:
+            current = _submit(agen.__anext__(), context)
+            try:
+                item = current.result(timeout=_time_remaining(context))
+            except StopAsyncIteration:
+                return
+            except (futures.TimeoutError, futures.CancelledError, DeadlineExceeded) as exc:
+                if context is None:
+                    raise
+                abandoned = True
+                current.cancel()
+                _abandon(context, method, exc)
+            yield item
+    finally:
+        aclose = getattr(agen, "aclose", None)
+        # A cancelled step already unwound the generator.
+        if aclose is not None and not abandoned:
+            asyncio.run_coroutine_threadsafe(aclose(), loop).result()
 
 
 class AssistantServicer(rpc.AssistantServicer):
     """Blocking gRPC façade over the async orchestrator."""
 
-    def __init__(self, orchestrator: Orchestrator | None = None) -> None:
+    def __init__(self, orchestrator: "Orchestrator | futures.Future[Orchestrator] | None" = None) -> None:
+        # The daemon passes a future so it can bind before the store is opened, restored or migrated.
         self._orchestrator = orchestrator or Orchestrator()
 
+    def _ready(self, context: Any, method: str) -> Orchestrator:
+        """The orchestrator, waiting (within the call's deadline) for one that is still being set up."""
+        if isinstance(self._orchestrator, Orchestrator):
+            return self._orchestrator
+        try:
+            return self._orchestrator.result(timeout=_time_remaining(context))
+        except futures.TimeoutError as exc:
+            _abandon(context, method, exc)
+        except Exception as exc:
+            context.abort(grpc.StatusCode.UNAVAILABLE, f"assistant failed to start: {exc}")
+
     def IndexText(self, request, context):
-        doc_id = _run(self._orchestrator.index_text(request.text, request.source or "grpc"))
+        REQUEST_METER.mark()
+        with span("rpc.IndexText", request_id=request.id, user_id=request.user_id):
+            orchestrator = self._ready(context, "IndexText")
+            try:
+                doc_id = _run(orchestrator.index_text(request.text, request.source or "grpc", request.user_id),
+                              context, "IndexText")
+            except QuotaExceeded as exc:
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(exc))
         return pb.IndexResponse(id=request.id, doc_id=doc_id, status=0)
 
     def Query(self, request, context):
-        hits = _run(self._orchestrator.query(request.query, request.k or 5))
+        REQUEST_METER.mark()
+        with span("rpc.Query", request_id=request.id, user_id=request.user_id):
+            orchestrator = self._ready(context, "Query")
+            hits = _run(orchestrator.query(request.query, request.k or 5, request.user_id), context, "Query")
         response = pb.QueryResponse(id=request.id)
         for hit in hits:
             response.hits.add(doc_id=str(hit["doc_id"]), score=float(hit["score"] or 0.0), text=hit.get("text", ""))
         return response
 
+    def DeleteDocuments(self, request, context):
+        REQUEST_METER.mark()
+        doc_ids = list(request.doc_ids)
+        if not doc_ids and not request.source_prefix:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "doc_ids or source_prefix is required")
+        with span("rpc.DeleteDocuments", request_id=request.id, user_id=request.user_id):
+            orchestrator = self._ready(context, "DeleteDocuments")
+            deleted = _run(orchestrator.delete_documents(doc_ids, request.source_prefix or None, request.user_id),
+                           context, "DeleteDocuments")
+        write_event({"type": "documents_deleted", "count": len(deleted), "source_prefix": request.source_prefix,
+                     "user_id": request.user_id})
+        return pb.DeleteResponse(id=request.id, deleted=len(deleted), doc_ids=deleted)
+
     def Plan(self, request, context):
-        actions = _run(self._orchestrator.plan(request.goal))
+        REQUEST_METER.mark()
+        with span("rpc.Plan", request_id=request.id, user_id=request.user_id):
+            orchestrator = self._ready(context, "Plan")
+            try:
+                actions = _run(orchestrator.plan(request.goal, user_id=request.user_id), context, "Plan")
+            except ModelBusyError as exc:
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(exc))
         response = pb.PlanResponse(id=request.id)
         for action in _normalize_actions(actions):
-            target = response.actions.add()
-            target.name = action.get("name", "")
-            target.payload = action.get("payload", "")
-            target.sensitive = bool(action.get("sensitive", False))
-            target.preview_required = bool(action.get("preview_required", False))
+            _fill_action(response.actions.add(), action)
         return response
 
+    def PlanStream(self, request, context):
+        REQUEST_METER.mark()
+        with span("rpc.PlanStream", request_id=request.id, user_id=request.user_id):
+            orchestrator = self._ready(context, "PlanStream")
+            try:
+                for item in _iterate(orchestrator.plan_stream(request.goal, user_id=request.user_id), context,
+                                     "PlanStream"):
+                    for action in _normalize_actions([item]):
+                        yield _fill_action(pb.Action(), action)
+            except ModelBusyError as exc:
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(exc))
+
     def ExecuteAction(self, request, context):
         payload = _safe_parse_json(request.payload)
         write_event(
@@ -77,6 +223,15 @@ def _normalize_actions(actions: Iterable[Any]) -> list[dict[str, Any]]:
     return normalized
 
 
+def _fill_action(target: Any, action: dict[str, Any]) -> Any:
+    target.name = action.get("name", "")
+    payload = action.get("payload", "")
+    target.payload = payload if isinstance(payload, str) else json.dumps(payload)
+    target.sensitive = bool(action.get("sensitive", False))
+    target.preview_required = bool(action.get("preview_required", False))
+    return target
+
+
 def _safe_parse_json(raw: str) -> Any:
     if not raw:
         return {}
@@ -86,7 +241,8 @@ def _safe_parse_json(raw: str) -> Any:
         return {"raw": raw}
 
 
-def create_server(host: str = "[::]", port: int = 50051, orchestrator: Orchestrator | None = None) -> grpc.Server:
+def create_server(host: str = "[::]", port: int = 50051,
+                  orchestrator: "Orchestrator | futures.Future[Orchestrator] | None" = None) -> grpc.Server:
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
     rpc.add_AssistantServicer_to_server(AssistantServicer(orchestrator=orchestrator), server)
     address = f"{host}:{port}"
@@ -105,7 +261,7 @@ def serve(host: str = "[::]", port: int = 50051) -> None:
         server.stop(grace=None)
 
 
-__all__ = ["create_server", "serve"]
+__all__ = ["create_server", "get_loop", "rpc_metrics", "serve"]
 
 
 if __name__ == "__main__":
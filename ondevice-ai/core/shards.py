@@ -0,0 +1,522 @@
+"""In-memory similarity indexes over the vectors in ``VectorStore``.
+
+``LocalIndex`` scans a single normalised matrix in-process. ``ShardedIndex``
+splits the rows across worker processes. Each worker scores its shard out of a
+``multiprocessing.shared_memory`` segment written by the parent, and the
+parent merges the per-shard top-k. Both expose the same ``add``/``remove``/
+``search``/``compact`` interface, so ``VectorStore`` can switch between them
+with one setting.
+
+Removing a row leaves a tombstone: the row is zeroed and its id cleared, and
+searches skip it. ``compact`` rewrites the matrices without the tombstones.
+
+A worker that dies, or does not answer within ``timeout`` seconds
+(``ONDEVICE_SHARD_TIMEOUT``, default 30), is replaced by a fresh worker on
+the same rows. The search it failed returns the other shards' hits, and is
+counted in ``shard_metrics``; only a search that no shard answered raises
+``ShardError``.
+"""
+from __future__ import annotations
+
+import heapq
+import multiprocessing as mp
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Hit = Tuple[float, str]
+
+# How often a wait for a worker's answer checks that the worker is still alive.
+_POLL_INTERVAL = 0.5
+
+_DEGRADED = {"searches": 0, "shards": 0}
+_DEGRADED_LOCK = threading.Lock()
+
+
+def shard_metrics() -> Dict[str, int]:
+    """Searches answered without some shards (and how many shard answers were missing), for ``/metrics``."""
+    with _DEGRADED_LOCK:
+        return {"degraded_searches": _DEGRADED["searches"], "failed_shards": _DEGRADED["shards"]}
+
+
+class ShardError(RuntimeError):
+    """A shard worker died or stopped answering."""
+
+
+def _normalise(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vecs / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= scores.shape[0]:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+class LocalIndex:
+    """Single-process scan: one growing matrix, doubled in place when full."""
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim
+        self._matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        self._ids: List[Optional[str]] = []
+        self._pos: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_normalised(cls, ids: Sequence[str], matrix: np.ndarray) -> "LocalIndex":
+        """Adopt already-normalised rows as they are, e.g. a memory-mapped snapshot block."""
+        index = cls(matrix.shape[1] if matrix.ndim == 2 and len(matrix) else None)
+        if not len(ids):
+            return index
+        index._matrix = matrix
+        index._ids = list(ids)
+        index._pos = {doc_id: n for n, doc_id in enumerate(index._ids)}
+        index._alive = np.ones(len(ids), dtype=bool)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    @property
+    def tombstones(self) -> int:
+        return len(self._ids) - len(self._pos)
+
+    @property
+    def mapped(self) -> bool:
+        """Whether the rows are a memory-mapped block (e.g. a restored snapshot) rather than a copy."""
+        return isinstance(self._matrix, np.memmap)
+
+    def add(self, ids: Sequence[str], vecs: np.ndarray) -> None:
+        vecs = _normalise(np.atleast_2d(vecs))
+        with self._lock:
+            if self.dim is None:
+                self.dim = vecs.shape[1]
+                self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            if vecs.shape[1] != self.dim:
+                raise ValueError(f"Embedding has {vecs.shape[1]} dimensions, index expects {self.dim}")
+            self._remove(ids)
+            count = len(self._ids)
+            if count + len(vecs) > self._matrix.shape[0]:
+                capacity = max(64, 2 * (count + len(vecs)))
+                grown = np.zeros((capacity, self.dim), dtype=np.float32)
+                grown[:count] = self._matrix[:count]
+                alive = np.zeros(capacity, dtype=bool)
+                alive[:count] = self._alive[:count]
+                self._matrix, self._alive = grown, alive
+            self._matrix[count:count + len(vecs)] = vecs
+            self._alive[count:count + len(vecs)] = True
+            for offset, doc_id in enumerate(ids):
+                self._pos[doc_id] = count + offset
+            self._ids.extend(ids)
+
+    def _remove(self, ids: Iterable[str]) -> int:
+        removed = 0
+        for doc_id in ids:
+            pos = self._pos.pop(doc_id, None)
+            if pos is not None:
+                self._ids[pos] = None
+                self._matrix[pos] = 0.0
+                self._alive[pos] = False
+                removed += 1
+        return removed
+
+    def remove(self, ids: Iterable[str]) -> int:
+        with self._lock:
+            return self._remove(ids)
+
+    def search(self, query: np.ndarray, k: int) -> List[Hit]:
+        with self._lock:
+            count = len(self._ids)
+            if not self._pos or k <= 0:
+                return []
+            scores = self._matrix[:count] @ _normalise(query)
+            if len(self._pos) < count:
+                scores[~self._alive[:count]] = -np.inf
+            top = _top_k(scores, min(k, len(self._pos)))
+            return [(float(scores[i]), self._ids[i]) for i in top]  # type: ignore[misc]
+
+    def vectors(self, ids: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        """The normalised rows for those ``ids`` still present, in the given order."""
+        with self._lock:
+            found = [doc_id for doc_id in ids if doc_id in self._pos]
+            rows = self._matrix[[self._pos[doc_id] for doc_id in found]] if found else np.zeros((0, self.dim or 0), np.float32)
+            return found, rows
+
+    def compact(self) -> int:
+        """Drop tombstoned rows; returns how many were reclaimed."""
+        with self._lock:
+            dead = self.tombstones
+            if not dead:
+                return 0
+            keep = np.flatnonzero(self._alive[:len(self._ids)])
+            self._matrix = self._matrix[keep].copy()
+            self._alive = np.ones(len(keep), dtype=bool)
+            self._ids = [self._ids[i] for i in keep]
+            self._pos = {doc_id: n for n, doc_id in enumerate(self._ids)}  # type: ignore[misc]
+            return dead
+
+    def close(self) -> None:
+        pass
+
+
+_BLAS_THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS")
+_SPAWN_LOCK = threading.Lock()
+
+
+def _shard_worker(conn) -> None:  # pragma: no cover - runs in a child process
+    segment: Optional[shared_memory.SharedMemory] = None
+    matrix: Optional[np.ndarray] = None
+    while True:
+        msg = conn.recv()
+        op = msg[0]
+        if op == "attach":
+            _, name, capacity, dim = msg
+            if segment is not None:
+                matrix = None
+                segment.close()
+            segment = shared_memory.SharedMemory(name=name)
+            matrix = np.ndarray((capacity, dim), dtype=np.float32, buffer=segment.buf)
+            conn.send(True)
+        elif op == "search":
+            _, query, count, k = msg
+            if matrix is None or count == 0:
+                conn.send((np.zeros(0, np.float32), np.zeros(0, np.int64)))
+                continue
+            scores = matrix[:count] @ query
+            idx = _top_k(scores, k)
+            conn.send((scores[idx], idx))
+        elif op == "close":
+            matrix = None
+            if segment is not None:
+                segment.close()
+            conn.send(True)
+            return
+
+
+class _Shard:
+    def __init__(self, ctx, dim: int, capacity: int, threads: int, timeout: float):
+        self.dim = dim
+        self.ids: List[Optional[str]] = []
+        self.dead = 0
+        # Held for each request and its reply, so concurrent searches do not interleave on the pipe.
+        self.lock = threading.Lock()
+        self.closed = False
+        self.segment: Optional[shared_memory.SharedMemory] = None
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self._ctx = ctx
+        self.threads = threads
+        self.timeout = timeout
+        self._start_worker()
+        self._allocate(capacity)
+
+    def _start_worker(self) -> None:
+        self.conn, child = self._ctx.Pipe()
+        self.process = self._ctx.Process(target=_shard_worker, args=(child,), daemon=True)
+        # BLAS reads its thread count at import, so it has to be in the child's
+        # environment from the start; one thread per worker keeps shards from
+        # oversubscribing the cores.
+        with _SPAWN_LOCK:
+            saved = {var: os.environ.get(var) for var in _BLAS_THREAD_VARS}
+            os.environ.update({var: str(self.threads) for var in _BLAS_THREAD_VARS})
+            try:
+                self.process.start()
+            finally:
+                for var, value in saved.items():
+                    if value is None:
+                        os.environ.pop(var, None)
+                    else:
+                        os.environ[var] = value
+        child.close()
+
+    def reply(self) -> Any:
+        """The worker's answer to the last request sent; ``ShardError`` if it died or took over ``timeout``."""
+        deadline = time.monotonic() + self.timeout
+        while not self.conn.poll(max(0.0, min(_POLL_INTERVAL, deadline - time.monotonic()))):
+            if not self.process.is_alive():
+                raise ShardError(f"shard worker {self.process.pid} exited with code {self.process.exitcode}")
+            if time.monotonic() >= deadline:
+                raise ShardError(f"shard worker {self.process.pid} did not answer within {self.timeout:g}s")
+        try:
+            return self.conn.recv()
+        except (OSError, EOFError) as exc:
+            raise ShardError(f"shard worker {self.process.pid} closed its pipe") from exc
+
+    def restart(self) -> None:
+        """Replace the worker process and attach the new one to this shard's rows. Holds ``lock``."""
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+        self._start_worker()
+        assert self.segment is not None
+        self.conn.send(("attach", self.segment.name, self.matrix.shape[0], self.dim))
+        self.reply()
+
+    def _allocate(self, capacity: int) -> None:
+        segment = shared_memory.SharedMemory(create=True, size=max(1, capacity * self.dim * 4))
+        matrix = np.ndarray((capacity, self.dim), dtype=np.float32, buffer=segment.buf)
+        count = len(self.ids)
+        matrix[:count] = self.matrix[:count]
+        with self.lock:
+            self.conn.send(("attach", segment.name, capacity, self.dim))
+            self.reply()
+            old = self.segment
+            self.segment, self.matrix = segment, matrix
+        if old is not None:
+            old.close()
+            old.unlink()
+
+    def append(self, ids: Sequence[str], vecs: np.ndarray) -> None:
+        count = len(self.ids)
+        if count + len(vecs) > self.matrix.shape[0]:
+            self._allocate(max(1024, 2 * (count + len(vecs))))
+        self.matrix[count:count + len(vecs)] = vecs
+        self.ids.extend(ids)
+
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+            try:
+                self.conn.send(("close",))
+                self.reply()
+            except (OSError, ShardError):
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+
+class ShardedIndex:
+    """Rows spread over worker processes that score their shard in parallel.
+
+    New rows go to the smallest shard. Once the average shard holds more than
+    ``rows_per_shard`` rows, another shard is added (up to ``max_shards``)
+    and the rows are redistributed evenly. The new workers are started on a
+    background thread, since ``add`` is called under the store's lock; the
+    old shards keep serving until the rows are moved over. Removed rows stay as tombstones
+    (each shard over-fetches by its tombstone count) until ``compact``.
+    """
+
+    def __init__(self, shards: int = 2, dim: Optional[int] = None, max_shards: Optional[int] = None,
+                 rows_per_shard: int = 250_000, worker_threads: int = 1, timeout: Optional[float] = None):
+        self.initial_shards = max(1, int(shards))
+        self.max_shards = max(self.initial_shards, int(max_shards or os.cpu_count() or 1))
+        self.rows_per_shard = max(1, int(rows_per_shard))
+        self.worker_threads = worker_threads
+        self.timeout = float(os.environ.get("ONDEVICE_SHARD_TIMEOUT", "30")) if timeout is None else timeout
+        self.dim = dim
+        self.rebalances = 0
+        self._ctx = mp.get_context("spawn")
+        self._shards: List[_Shard] = []
+        self._where: Dict[str, Tuple[_Shard, int]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._grower: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    @property
+    def tombstones(self) -> int:
+        return sum(s.dead for s in self._shards)
+
+    @property
+    def shard_sizes(self) -> List[int]:
+        return [len(s.ids) - s.dead for s in self._shards]
+
+    def _append(self, shard: _Shard, ids: List[str], vecs: np.ndarray) -> None:
+        start = len(shard.ids)
+        shard.append(ids, vecs)
+        for offset, doc_id in enumerate(ids):
+            self._where[doc_id] = (shard, start + offset)
+
+    def _remove(self, ids: Iterable[str]) -> int:
+        removed = 0
+        for doc_id in ids:
+            found = self._where.pop(doc_id, None)
+            if found is not None:
+                shard, pos = found
+                shard.ids[pos] = None
+                shard.matrix[pos] = 0.0
+                shard.dead += 1
+                removed += 1
+        return removed
+
+    def remove(self, ids: Iterable[str]) -> int:
+        with self._lock:
+            return self._remove(ids)
+
+    def compact(self) -> int:
+        with self._lock:
+            dead = self.tombstones
+            stale = self._rebalance(len(self._shards)) if dead else []
+        for shard in stale:
+            shard.close()
+        return dead
+
+    def _spawn(self, count: int) -> List[_Shard]:
+        assert self.dim is not None
+        return [_Shard(self._ctx, self.dim, 1024, self.worker_threads, self.timeout) for _ in range(count)]
+
+    def _start(self, count: int) -> None:
+        self._shards = self._spawn(count)
+
+    def add(self, ids: Sequence[str], vecs: np.ndarray) -> None:
+        vecs = _normalise(np.atleast_2d(vecs))
+        with self._lock:
+            if self.dim is None:
+                self.dim = vecs.shape[1]
+            if vecs.shape[1] != self.dim:
+                raise ValueError(f"Embedding has {vecs.shape[1]} dimensions, index expects {self.dim}")
+            if not self._shards:
+                self._start(self.initial_shards)
+            self._remove(ids)
+            # Deal rows out starting with the emptiest shard to keep sizes even.
+            order = sorted(self._shards, key=lambda s: len(s.ids) - s.dead)
+            for n, shard in enumerate(order):
+                if n < len(ids):
+                    self._append(shard, list(ids[n::len(order)]), vecs[n::len(order)])
+            total = len(self)
+            if (self._grower is None and len(self._shards) < self.max_shards
+                    and total > self.rows_per_shard * len(self._shards)):
+                target = min(self.max_shards, -(-total // self.rows_per_shard))
+                self._grower = threading.Thread(target=self._grow, args=(target,), name="shard-rebalance",
+                                                daemon=True)
+                self._grower.start()
+
+    def _grow(self, shards: int) -> None:
+        stale: List[_Shard] = []
+        try:
+            stale = fresh = self._spawn(shards)
+            with self._lock:
+                if not self._closed:
+                    stale = self._rebalance(shards, fresh)
+        finally:
+            with self._lock:
+                self._grower = None
+            for shard in stale:
+                shard.close()
+
+    def wait_for_rebalance(self, timeout: Optional[float] = None) -> None:
+        """Block until a rebalance started by ``add`` has finished."""
+        grower = self._grower
+        if grower is not None:
+            grower.join(timeout)
+
+    def rebalance(self, shards: int) -> None:
+        with self._lock:
+            stale = self._rebalance(max(1, int(shards)))
+        for shard in stale:
+            shard.close()
+
+    def _rebalance(self, shards: int, fresh: Optional[List[_Shard]] = None) -> List[_Shard]:
+        """Move the live rows onto ``fresh`` workers (or ``shards`` new ones), spread evenly.
+
+        Returns the old workers for the caller to close once it has released the lock.
+        """
+        ids: List[str] = []
+        parts: List[np.ndarray] = []
+        for shard in self._shards:
+            keep = [i for i, doc_id in enumerate(shard.ids) if doc_id is not None]
+            ids.extend(shard.ids[i] for i in keep)  # type: ignore[misc]
+            parts.append(shard.matrix[keep])
+        matrix = np.concatenate(parts) if parts else None
+        stale = self._shards
+        self._where = {}
+        self._shards = fresh if fresh is not None else self._spawn(shards)
+        shards = len(self._shards)
+        if matrix is not None and ids:
+            for n, shard in enumerate(self._shards):
+                self._append(shard, ids[n::shards], matrix[n::shards])
+        self.rebalances += 1
+        return stale
+
+    def search(self, query: np.ndarray, k: int) -> List[Hit]:
+        """Merged top-``k`` of the shards that answer; a failed worker is restarted and its rows skipped."""
+        q = _normalise(query).astype(np.float32)
+        while True:
+            # The index lock only guards the worker list; the fan-out runs without it.
+            with self._lock:
+                shards = list(self._shards)
+            if not shards or k <= 0:
+                return []
+            hits, failed, stale = self._fan_out(shards, q, k)
+            if not stale:
+                break
+            # A rebalance retired some of these workers meanwhile; ask the new ones.
+        if failed:
+            with _DEGRADED_LOCK:
+                _DEGRADED["searches"] += 1
+                _DEGRADED["shards"] += len(failed)
+            if len(failed) == len(shards):
+                raise failed[0]
+        return heapq.nlargest(k, hits, key=lambda h: h[0])
+
+    def _fan_out(self, shards: List[_Shard], q: np.ndarray, k: int) -> Tuple[List[Hit], List[ShardError], bool]:
+        hits: List[Hit] = []
+        failed: List[ShardError] = []
+        held: List[_Shard] = []
+        asked: List[_Shard] = []
+        stale = False
+        try:
+            # Shard locks are taken in list order, so two searches cannot deadlock.
+            for shard in shards:
+                shard.lock.acquire()
+                held.append(shard)
+                if shard.closed:
+                    stale = True
+                    continue
+                try:
+                    shard.conn.send(("search", q, len(shard.ids), k + shard.dead))
+                except OSError as exc:
+                    failed.append(ShardError(f"shard worker {shard.process.pid} is gone: {exc}"))
+                    self._recover(shard)
+                    continue
+                asked.append(shard)
+            for shard in asked:
+                # Every answer is collected, so none is left in a pipe for the next search.
+                try:
+                    scores, idx = shard.reply()
+                except ShardError as exc:
+                    failed.append(exc)
+                    self._recover(shard)
+                    continue
+                hits.extend((float(score), shard.ids[i]) for score, i in zip(scores, idx)
+                            if shard.ids[i] is not None)  # type: ignore[misc]
+        finally:
+            for shard in held:
+                shard.lock.release()
+        return hits, failed, stale
+
+    @staticmethod
+    def _recover(shard: _Shard) -> None:
+        try:
+            shard.restart()
+        except (OSError, ShardError):
+            # Still down; the next search that reaches it tries again.
+            pass
+
+    def close(self) -> None:
+        with self._lock:
+            # A rebalance still starting its workers closes them itself.
+            self._closed = True
+            stale, self._shards, self._where = self._shards, [], {}
+        for shard in stale:
+            shard.close()
+
+
+__all__ = ["LocalIndex", "ShardError", "ShardedIndex", "shard_metrics"]
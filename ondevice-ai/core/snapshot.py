@@ -0,0 +1,203 @@
+"""Versioned binary snapshots of a ``VectorStore`` for fast restore and cold start.
+
+Layout, every section 64-byte aligned so it can be memory-mapped in place::
+
+    MAGIC | section ... | header JSON | u64 header length | MAGIC
+
+The header (written last, so sections can be streamed) records the format
+version, the store generation the snapshot was taken at, and for each
+section its offset, length, sha256 and, for arrays, dtype and shape.
+Sections:
+
+- ``vectors``: float32 ``(rows, dim)``, L2-normalised, ready to be used as a
+  search index without copying.
+- ``norms``: float32 ``(rows,)``. ``vectors * norms`` gives the stored
+  embeddings back.
+- ``vector_ids``: msgpack list of the document id of each vector row.
+- ``docs``: msgpack stream of document rows; ``header["doc_columns"]`` names the fields.
+- ``projection``: float32 components of a PCA projection, if the store has
+  one. Its kind and dimensions are in ``header["projection"]``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import time
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import msgpack
+import numpy as np
+
+from core.projection import Projection
+
+MAGIC = b"ODSNAP\x00\x01"
+VERSION = 1
+_ALIGN = 64
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+class _Writer:
+    def __init__(self, fh: BinaryIO):
+        self.fh = fh
+        self.sections: Dict[str, Dict[str, Any]] = {}
+        fh.write(MAGIC)
+
+    def _pad(self) -> None:
+        pad = -self.fh.tell() % _ALIGN
+        if pad:
+            self.fh.write(b"\0" * pad)
+
+    def section(self, name: str, chunks: Iterable[bytes], **info: Any) -> None:
+        self._pad()
+        offset = self.fh.tell()
+        h = hashlib.sha256()
+        for chunk in chunks:
+            h.update(chunk)
+            self.fh.write(chunk)
+        self.sections[name] = {"offset": offset, "length": self.fh.tell() - offset, "sha256": h.hexdigest(), **info}
+
+    def array(self, name: str, arr: np.ndarray, rows_per_chunk: int = 65536) -> None:
+        arr = np.ascontiguousarray(arr, dtype=np.float32)
+        chunks = (arr[i:i + rows_per_chunk].tobytes() for i in range(0, max(1, len(arr)), rows_per_chunk))
+        self.section(name, chunks, dtype="<f4", shape=list(arr.shape))
+
+    def finish(self, header: Dict[str, Any]) -> str:
+        self._pad()
+        raw = json.dumps({**header, "sections": self.sections}, sort_keys=True).encode("utf-8")
+        self.fh.write(raw)
+        self.fh.write(struct.pack("<Q", len(raw)))
+        self.fh.write(MAGIC)
+        return hashlib.sha256(raw).hexdigest()
+
+
+def write_snapshot(path: str, *, vector_ids: Sequence[str], vectors: np.ndarray, doc_columns: Sequence[str],
+                   docs: Iterable[Sequence[Any]], generation: int, projection: Optional[Projection] = None) -> Dict[str, Any]:
+    """Write a snapshot atomically; returns its header (plus ``digest``)."""
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vector_ids), -1)
+    norms = np.linalg.norm(vectors, axis=1).astype(np.float32) if len(vectors) else np.zeros(0, np.float32)
+    safe = np.where(norms == 0, 1.0, norms).astype(np.float32)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    count = 0
+
+    def doc_chunks() -> Iterator[bytes]:
+        nonlocal count
+        packer = msgpack.Packer()
+        for row in docs:
+            count += 1
+            yield packer.pack(list(row))
+
+    header: Dict[str, Any] = {"version": VERSION, "created": int(time.time()), "generation": int(generation),
+                              "rows": len(vector_ids), "dim": int(vectors.shape[1]) if len(vectors) else 0,
+                              "doc_columns": list(doc_columns)}
+    try:
+        with open(tmp, "wb") as fh:
+            w = _Writer(fh)
+            w.array("vectors", vectors / safe[:, None] if len(vectors) else vectors)
+            w.array("norms", norms)
+            w.section("vector_ids", [msgpack.packb(list(vector_ids))])
+            w.section("docs", doc_chunks())
+            header["docs"] = count
+            if projection is not None:
+                header["projection"] = {"kind": projection.kind, "dim_in": projection.dim_in,
+                                        "dim_out": projection.dim_out, "explained": projection.explained}
+                if projection.components is not None:
+                    w.array("projection", projection.components)
+            digest = w.finish(header)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return {**header, "digest": digest}
+
+
+class Snapshot:
+    """Read side: arrays come back as copy-on-write memory maps of the file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        size = os.path.getsize(path)
+        with open(path, "rb") as fh:
+            if fh.read(len(MAGIC)) != MAGIC or size < 2 * len(MAGIC) + 8:
+                raise SnapshotError(f"{path} is not a store snapshot")
+            fh.seek(size - len(MAGIC) - 8)
+            (length,) = struct.unpack("<Q", fh.read(8))
+            if fh.read(len(MAGIC)) != MAGIC or length > size:
+                raise SnapshotError(f"{path} is truncated")
+            fh.seek(size - len(MAGIC) - 8 - length)
+            raw = fh.read(length)
+        self.digest = hashlib.sha256(raw).hexdigest()
+        self.header: Dict[str, Any] = json.loads(raw)
+        if self.header.get("version") != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {self.header.get('version')}")
+
+    @property
+    def generation(self) -> int:
+        return int(self.header["generation"])
+
+    def _array(self, name: str) -> np.ndarray:
+        info = self.header["sections"][name]
+        shape = tuple(info["shape"])
+        if not info["length"]:
+            return np.zeros(shape, dtype=info["dtype"])
+        return np.memmap(self.path, dtype=info["dtype"], mode="c", offset=info["offset"], shape=shape)
+
+    def _bytes(self, name: str) -> bytes:
+        info = self.header["sections"][name]
+        with open(self.path, "rb") as fh:
+            fh.seek(info["offset"])
+            return fh.read(info["length"])
+
+    def vectors(self) -> np.ndarray:
+        """Normalised rows, mapped rather than read."""
+        return self._array("vectors")
+
+    def norms(self) -> np.ndarray:
+        return self._array("norms")
+
+    def vector_ids(self) -> List[str]:
+        return msgpack.unpackb(self._bytes("vector_ids"))
+
+    def docs(self) -> Iterator[List[Any]]:
+        info = self.header["sections"]["docs"]
+        with open(self.path, "rb") as fh:
+            fh.seek(info["offset"])
+            unpacker = msgpack.Unpacker(max_buffer_size=max(1 << 20, info["length"]))
+            remaining = info["length"]
+            while remaining:
+                chunk = fh.read(min(1 << 20, remaining))
+                remaining -= len(chunk)
+                unpacker.feed(chunk)
+                yield from unpacker
+
+    def projection(self) -> Optional[Projection]:
+        meta = self.header.get("projection")
+        if not meta:
+            return None
+        components = np.array(self._array("projection")) if "projection" in self.header["sections"] else None
+        return Projection(meta["kind"], meta["dim_in"], meta["dim_out"], components, meta.get("explained", 0.0))
+
+    def verify(self) -> None:
+        """Check every section against its recorded sha256."""
+        with open(self.path, "rb") as fh:
+            for name, info in self.header["sections"].items():
+                fh.seek(info["offset"])
+                h = hashlib.sha256()
+                remaining = info["length"]
+                while remaining:
+                    chunk = fh.read(min(1 << 20, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    h.update(chunk)
+                if h.hexdigest() != info["sha256"]:
+                    raise SnapshotError(f"Section {name} of {self.path} is corrupt")
+
+
+__all__ = ["MAGIC", "Snapshot", "SnapshotError", "VERSION", "write_snapshot"]
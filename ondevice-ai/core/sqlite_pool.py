@@ -0,0 +1,217 @@
+"""SQLite connections for ``VectorStore``: pooled readers and one batching writer.
+
+In WAL mode SQLite lets readers run next to a writer, but only on separate
+connections. ``ConnectionPool`` lends each caller its own read connection,
+so gRPC and HTTP threads no longer queue behind one shared handle.
+
+Writes go through ``WriteBatcher``, a single thread that owns the write
+connection. It drains the jobs waiting in its queue into one transaction,
+with a savepoint per job so a failing job is rolled back alone. It commits
+once and only then resolves the callers' futures. Under load, many small
+writes therefore share one commit, and a lone write never waits for a batch
+to fill.
+"""
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# synchronous=NORMAL is safe with WAL: a crash of the app loses nothing, and
+# a power loss loses at most the last commits, never the database.
+PRAGMAS: Dict[str, str] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": str(-64 * 1024),  # KiB, so 64 MiB of page cache per connection
+    "mmap_size": str(256 << 20),
+    "temp_store": "MEMORY",
+    "busy_timeout": "5000",
+}
+
+
+def connect(path: str, read_only: bool = False, cached_statements: int = 256) -> sqlite3.Connection:
+    """Autocommit connection with the tuned pragmas; transactions are begun explicitly."""
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=cached_statements)
+    for key, value in PRAGMAS.items():
+        if read_only and key == "journal_mode":
+            continue
+        conn.execute(f"PRAGMA {key}={value}")
+    if read_only:
+        conn.execute("PRAGMA query_only=1")
+    return conn
+
+
+class ConnectionPool:
+    """Read connections lent out one caller at a time and reused LIFO, so hot ones keep their cache."""
+
+    def __init__(self, path: str, max_idle: int = 16):
+        self.path = path
+        self.max_idle = max_idle
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.opened = 0
+        self.in_use = 0
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed")
+            conn = self._idle.pop() if self._idle else None
+            self.in_use += 1
+        if conn is None:
+            conn = connect(self.path, read_only=True)
+            with self._lock:
+                self.opened += 1
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self.in_use -= 1
+                if self._closed or len(self._idle) >= self.max_idle:
+                    conn.close()
+                else:
+                    self._idle.append(conn)
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {"opened": self.opened, "idle": len(self._idle), "in_use": self.in_use}
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_Job = Tuple[Callable[[sqlite3.Cursor], Any], bool, Future]
+
+
+class WriteBatcher:
+    """The store's only writer. ``run(fn)`` executes ``fn(cursor)`` on it and returns the result.
+
+    Transactional jobs are grouped into one transaction (up to ``max_batch``).
+    A job with ``transactional=False`` runs alone, outside any transaction,
+    for statements such as ``VACUUM`` or ``ATTACH``. It must commit its own
+    work.
+    """
+
+    def __init__(self, path: str, max_batch: int = 256):
+        self.max_batch = max(1, max_batch)
+        self._conn = connect(path)
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._stats = {"jobs": 0, "batches": 0, "failed": 0, "largest_batch": 0}
+        self._thread = threading.Thread(target=self._loop, name="store-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[[sqlite3.Cursor], Any], transactional: bool = True) -> "Future[Any]":
+        future: "Future[Any]" = Future()
+        if threading.current_thread() is self._thread:
+            # Called from inside a job: run in the current transaction.
+            try:
+                future.set_result(fn(self._conn.cursor()))
+            except BaseException as exc:
+                future.set_exception(exc)
+            return future
+        self._queue.put((fn, transactional, future))
+        return future
+
+    def run(self, fn: Callable[[sqlite3.Cursor], Any], transactional: bool = True) -> Any:
+        return self.submit(fn, transactional).result()
+
+    def _loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            batch = [job]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            group: List[_Job] = []
+            for item in batch:
+                if item[1]:
+                    group.append(item)
+                    continue
+                self._commit_group(group)
+                group = []
+                self._run_alone(item)
+            self._commit_group(group)
+            if stop:
+                return
+
+    def _run_alone(self, job: _Job) -> None:
+        fn, _, future = job
+        self._stats["jobs"] += 1
+        self._stats["batches"] += 1
+        try:
+            result = fn(self._conn.cursor())
+        except BaseException as exc:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+            self._stats["failed"] += 1
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    def _commit_group(self, group: List[_Job]) -> None:
+        if not group:
+            return
+        cur = self._conn.cursor()
+        outcomes: List[Tuple[Future, bool, Any]] = []
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            for n, (fn, _, future) in enumerate(group):
+                cur.execute(f"SAVEPOINT job{n}")
+                try:
+                    result = fn(cur)
+                except BaseException as exc:
+                    cur.execute(f"ROLLBACK TO job{n}")
+                    cur.execute(f"RELEASE job{n}")
+                    outcomes.append((future, False, exc))
+                else:
+                    cur.execute(f"RELEASE job{n}")
+                    outcomes.append((future, True, result))
+            cur.execute("COMMIT")
+        except BaseException as exc:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+            outcomes = [(future, False, exc) for _, _, future in group]
+        self._stats["jobs"] += len(group)
+        self._stats["batches"] += 1
+        self._stats["largest_batch"] = max(self._stats["largest_batch"], len(group))
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                self._stats["failed"] += 1
+                future.set_exception(value)
+
+    def metrics(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        stats["jobs_per_batch"] = round(stats["jobs"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+        self._conn.close()
+
+
+__all__ = ["ConnectionPool", "PRAGMAS", "WriteBatcher", "connect"]
@@ -0,0 +1,247 @@
+"""Opt-in, sampled request tracing written to a local JSONL file.
+
+Spans are carried through ``contextvars`` so they follow a request across
+``await`` points and into coroutines scheduled from another thread. The HTTP
+hop into the MLX runtime propagates the context with a W3C ``traceparent``
+header.
+
+Tracing is disabled unless a sample rate is configured, either through
+``configure()`` or the ``ONDEVICE_TRACE_SAMPLE`` environment variable. The
+output file defaults to ``<data dir>/logs/traces.jsonl`` and can be moved with
+``ONDEVICE_TRACE_LOG``.
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, TypeVar
+
+
+TRACEPARENT_HEADER = "traceparent"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool) -> None:
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+
+_CURRENT: contextvars.ContextVar[Optional[SpanContext]] = contextvars.ContextVar("ondevice_span", default=None)
+
+
+def _env_rate() -> float:
+    try:
+        return min(1.0, max(0.0, float(os.environ.get("ONDEVICE_TRACE_SAMPLE", "0") or 0)))
+    except ValueError:
+        return 0.0
+
+
+_sample_rate = _env_rate()
+_trace_path: Optional[Path] = Path(os.environ["ONDEVICE_TRACE_LOG"]) if os.environ.get("ONDEVICE_TRACE_LOG") else None
+_write_lock = threading.Lock()
+_handle: Any = None
+
+
+def _default_trace_path() -> Path:
+    data_root = os.environ.get("EKUPKARAN_DATA_DIR")
+    base = Path(data_root) / "logs" if data_root else Path.home() / ".ekupkaran" / "logs"
+    return base / "traces.jsonl"
+
+
+def configure(sample_rate: Optional[float] = None, path: Optional[str] = None) -> None:
+    """Set the sampling rate (0.0–1.0) and/or the JSONL output path."""
+    global _sample_rate, _trace_path, _handle
+    with _write_lock:
+        if sample_rate is not None:
+            _sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        if path is not None:
+            _trace_path = Path(path)
+        if _handle is not None:
+            _handle.close()
+            _handle = None
+
+
+def enabled() -> bool:
+    return _sample_rate > 0.0
+
+
+def _new_id(nbytes: int) -> str:
+    return random.getrandbits(nbytes * 8).to_bytes(nbytes, "big").hex()
+
+
+def _write(record: Dict[str, Any]) -> None:
+    global _handle
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _write_lock:
+        if _handle is None:
+            target = _trace_path or _default_trace_path()
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _handle = target.open("a", encoding="utf-8")
+        _handle.write(line)
+        _handle.flush()
+
+
+class Span:
+    """A single timed operation. Unsampled spans only carry context."""
+
+    __slots__ = ("name", "context", "parent_id", "attrs", "_start_wall", "_start", "_token")
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str], attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self._start_wall = time.time()
+        self._start = time.perf_counter()
+        self._token: Optional[contextvars.Token] = None
+
+    def set(self, key: str, value: Any) -> None:
+        if self.context.sampled:
+            self.attrs[key] = value
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self._token is not None:
+            try:
+                _CURRENT.reset(self._token)
+            except ValueError:
+                # Ended from a different context than it was started in.
+                pass
+            self._token = None
+        if not self.context.sampled:
+            return
+        record: Dict[str, Any] = {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self._start_wall,
+            "duration_ms": round((time.perf_counter() - self._start) * 1000.0, 3),
+            "status": "error" if error is not None else "ok",
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        if self.attrs:
+            record["attrs"] = self.attrs
+        _write(record)
+
+
+def start_span(name: str, parent: Optional[SpanContext] = None, **attrs: Any) -> Span:
+    """Start a span as a child of ``parent`` (or the current span) and make it current."""
+    parent = parent or _CURRENT.get()
+    if parent is None:
+        sampled = _sample_rate > 0.0 and (_sample_rate >= 1.0 or random.random() < _sample_rate)
+        ctx = SpanContext(_new_id(16), _new_id(8), sampled)
+        parent_id = None
+    else:
+        ctx = SpanContext(parent.trace_id, _new_id(8) if parent.sampled else parent.span_id, parent.sampled)
+        parent_id = parent.span_id
+    result = Span(name, ctx, parent_id, attrs if ctx.sampled else {})
+    result._token = _CURRENT.set(ctx)
+    return result
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    if _sample_rate <= 0.0 and _CURRENT.get() is None:
+        # Fast path: tracing is off and nothing upstream is sampled.
+        yield _NOOP
+        return
+    current = start_span(name, **attrs)
+    try:
+        yield current
+    except BaseException as exc:
+        current.end(error=exc)
+        raise
+    current.end()
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator wrapping a sync or async callable in a span."""
+
+    def decorator(fn: F) -> F:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def current_context() -> Optional[SpanContext]:
+    return _CURRENT.get()
+
+
+def inject_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Return ``headers`` extended with a ``traceparent`` for the current span."""
+    out = dict(headers or {})
+    ctx = _CURRENT.get()
+    if ctx is not None:
+        out[TRACEPARENT_HEADER] = f"00-{ctx.trace_id}-{ctx.span_id}-{'01' if ctx.sampled else '00'}"
+    return out
+
+
+def extract_context(headers: Mapping[str, str]) -> Optional[SpanContext]:
+    """Parse a ``traceparent`` header into a parent context, if present and valid."""
+    raw = headers.get(TRACEPARENT_HEADER) or headers.get(TRACEPARENT_HEADER.title())
+    if not raw:
+        return None
+    parts = raw.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 0x01)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], sampled)
+
+
+class _NoopSpan(Span):
+    def __init__(self) -> None:
+        super().__init__("noop", SpanContext("", "", False), None, {})
+
+    def set(self, key: str, value: Any) -> None:
+        return None
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+__all__ = [
+    "Span",
+    "SpanContext",
+    "TRACEPARENT_HEADER",
+    "configure",
+    "current_context",
+    "enabled",
+    "extract_context",
+    "inject_headers",
+    "span",
+    "start_span",
+    "traced",
+]
@@ -1,46 +1,1075 @@
 # core/vector_store.py
-import sqlite3, msgpack, uuid, time
+import contextlib, hashlib, json, os, sqlite3, msgpack, threading, uuid, time
+from collections import Counter, OrderedDict
 import numpy as np
-from typing import List, Tuple, Optional
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Optional, Sequence, Union
+from core.near_dup import NearDuplicateIndex, simhash, to_signed, to_unsigned
+from core.projection import Projection, RerankIndex
+from core.shards import LocalIndex, ShardedIndex
+from core.snapshot import Snapshot, SnapshotError, write_snapshot
+from core.sqlite_pool import ConnectionPool, WriteBatcher
+from core.tracing import span, traced
+
+# Document fields carried by snapshots, in column order.
+DOC_COLUMNS = ("id", "source", "ts", "text", "content_hash", "simhash", "dup_of", "user_id")
+
+# Near-duplicate handling at ingest: "link" stores the document but reuses the
+# existing document's embedding, "drop" returns the existing document's id
+# without storing anything, and "off" embeds every distinct text.
+DEDUP_POLICIES = ("link", "drop", "off")
+
+# Partition of documents stored without a user (the HTTP runtime, older data).
+DEFAULT_PARTITION = ""
+
+_SECONDARY_INDEXES = {
+    "docs_user_source_hash": "docs(user_id, source, content_hash)",
+    # Newest-first paging of a partition (``page_documents``).
+    "docs_user_ts": "docs(user_id, ts, id)",
+    "docs_dup_of": "docs(dup_of)",
+    "embeddings_doc": "embeddings(doc_id)",
+}
+
+
+class _PendingIndex:
+    """A partition index being built outside ``_index_lock``, and the changes made to the partition meanwhile."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.changes: List[Tuple[str, List[str], Optional[np.ndarray]]] = []
+
+    def add(self, ids: List[str], vecs: np.ndarray) -> None:
+        self.changes.append(("add", list(ids), vecs))
+
+    def replay(self, index: Union[LocalIndex, ShardedIndex, RerankIndex]) -> None:
+        for op, ids, vecs in self.changes:
+            if op == "add":
+                index.add(ids, vecs)
+            else:
+                index.remove(ids)
+
+
+class _PendingNears:
+    """A near-duplicate index being built outside ``_index_lock``, and the fingerprints added or removed meanwhile."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.changes: List[Tuple[str, str, Optional[int]]] = []
+
+    def replay(self, near: NearDuplicateIndex) -> None:
+        for op, doc_id, fp in self.changes:
+            if op == "add":
+                near.add(doc_id, fp)
+            else:
+                near.remove(doc_id)
+
+
+class QuotaExceeded(RuntimeError):
+    """A partition already holds its maximum number of documents."""
+
+
+def pack_vector(vec: np.ndarray) -> bytes:
+    """Embedding blob: raw little-endian float32 wrapped as msgpack bin."""
+    return msgpack.packb(np.asarray(vec, dtype="<f4").tobytes())
+
+
+def unpack_vector(blob: bytes) -> np.ndarray:
+    """Reads both the raw format and the older msgpack float lists."""
+    value = msgpack.unpackb(blob)
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype="<f4").copy()
+    return np.array(value, dtype=np.float32)
+
+
+def default_store_path() -> str:
+    """The store shared by the gRPC service and the HTTP runtime."""
+    root = os.environ.get("EKUPKARAN_DATA_DIR") or os.path.join(os.path.expanduser("~"), ".ekupkaran")
+    return os.environ.get("ONDEVICE_STORE_PATH", os.path.join(root, "store.db"))
+
 
 class VectorStore:
-    def __init__(self, path="/tmp/ondevice_store.db"):
-        self.db = sqlite3.connect(path, check_same_thread=False)
-        self._init_db()
-
-    def _init_db(self):
-        cur = self.db.cursor()
-        cur.executescript("""
-        PRAGMA journal_mode=WAL;
-        CREATE TABLE IF NOT EXISTS docs(id TEXT PRIMARY KEY, source TEXT, ts INTEGER, text TEXT);
-        CREATE TABLE IF NOT EXISTS embeddings(id TEXT PRIMARY KEY, doc_id TEXT, vec BLOB);
-        """)
-        self.db.commit()
-
-    def add(self, text: str, source: str="cli") -> str:
+    """SQLite-backed documents and embeddings with an in-memory search index.
+
+    One instance is shared by ``AssistantServicer`` and the HTTP runtime
+    (``/index``, ``/query``, ``/documents``), so both see the same corpus and
+    the vectors are held in memory once. ``import_records`` and
+    ``import_sqlite`` bring in data from the runtime's old ``documents.json``
+    and from older store files.
+
+    The index is built from SQLite on first ``search`` and kept current by
+    ``insert_embedding``. With ``shards`` > 0 (or ``ONDEVICE_STORE_SHARDS``)
+    it is a ``ShardedIndex`` spread over that many worker processes.
+
+    Documents are deduplicated on (source, sha256 of the text) by ``upsert``.
+    ``delete`` removes rows from SQLite at once and leaves tombstones in the
+    index; ``compact`` (run in the background by the daemon) drops those and
+    vacuums the database file.
+
+    Documents may carry a SimHash fingerprint; ``near_duplicate`` finds an
+    existing document within ``dedup_distance`` bits. A document stored with
+    ``dup_of`` shares that document's embedding instead of having its own.
+    ``ingest`` applies both checks under one of the ``DEDUP_POLICIES``; the
+    gRPC and HTTP index paths both go through it.
+
+    With a ``projection`` (by default ``<path>.proj.npz`` if present, or
+    ``ONDEVICE_STORE_PROJECTION``) the scan runs over reduced-dimension
+    copies of the vectors. The top ``k * oversample`` candidates are then
+    re-ranked on the full vectors; see ``core.projection``.
+
+    ``snapshot`` writes a binary snapshot (see ``core.snapshot``); ``restore``
+    loads one into an empty store. After a restore the search index maps the
+    snapshot's vector block directly, until the first vector write. The vector
+    rows are copied into SQLite by a background thread; only what reads or
+    writes the embeddings table waits for it (searches do not).
+
+    Reads use pooled per-caller connections (``core.sqlite_pool``) and run
+    concurrently under WAL. Writes are queued to a single writer thread that
+    commits whatever has queued up as one transaction.
+
+    Documents belong to a partition, the ``user_id`` they were indexed for
+    (``DEFAULT_PARTITION`` if none). Each partition has its own search index
+    and near-duplicate index, built on its first use. The ``max_partitions``
+    most recently used indexes stay loaded. An index is built outside the
+    store-wide lock, and one evicted while searches are still running on it
+    is closed when the last of them finishes. A search scans only the caller's
+    partition, so its cost follows that user's corpus. Deduplication never
+    links documents across partitions. With ``max_docs_per_user`` set, ``add``
+    raises ``QuotaExceeded`` once a partition is full.
+
+    Listeners registered with ``add_listener`` are called after each committed
+    change: ``document.indexed`` (the new row), ``document.deleted`` (the ids
+    removed) and ``store.reloaded`` after a bulk import or restore.
+    """
+
+    def __init__(self, path: Optional[str]=None, shards: Optional[int]=None, dedup_distance: Optional[int]=None,
+                 projection: Optional[Union[str, Projection]]=None, oversample: Optional[int]=None,
+                 max_partitions: Optional[int]=None, max_docs_per_user: Optional[int]=None):
+        path = path or default_store_path()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._writer = WriteBatcher(path)
+        self._pool = ConnectionPool(path)
+        self.shards = int(os.environ.get("ONDEVICE_STORE_SHARDS", "0")) if shards is None else shards
+        self.dedup_distance = (int(os.environ.get("ONDEVICE_DEDUP_DISTANCE", "5"))
+                               if dedup_distance is None else dedup_distance)
+        self.oversample = int(os.environ.get("ONDEVICE_STORE_OVERSAMPLE", "8")) if oversample is None else oversample
+        self.max_partitions = max(1, int(os.environ.get("ONDEVICE_STORE_PARTITIONS", "16"))
+                                  if max_partitions is None else max_partitions)
+        self.max_docs_per_user = (int(os.environ.get("ONDEVICE_PARTITION_MAX_DOCS", "0"))
+                                  if max_docs_per_user is None else max_docs_per_user)
+        self.projection = self._resolve_projection(projection)
+        self._indexes: "OrderedDict[str, Union[LocalIndex, ShardedIndex, RerankIndex]]" = OrderedDict()
+        self._nears: Dict[str, NearDuplicateIndex] = {}
+        self._index_lock = threading.Lock()
+        # Partitions whose index is being built, and searches in flight per index (by id).
+        self._pending: Dict[str, _PendingIndex] = {}
+        self._pending_nears: Dict[str, _PendingNears] = {}
+        self._leases: Counter = Counter()
+        self._retired: Dict[int, Union[LocalIndex, ShardedIndex, RerankIndex]] = {}
+        self._deleted_since_vacuum = 0
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        # Guards the ingest counters and the per-(user_id, source, hash) ingest locks.
+        self._dedup_lock = threading.Lock()
+        self._dedup = {"indexed": 0, "exact": 0, "near": 0, "linked": 0, "dropped": 0}
+        self._ingesting: Dict[Tuple[str, str, str], List[Any]] = {}
+        # Set unless a restore's vectors are still being copied into SQLite.
+        self._vectors_ready = threading.Event()
+        self._vectors_ready.set()
+        self._vector_loader: Optional[threading.Thread] = None
+        self._vector_error: Optional[BaseException] = None
+        self._closing = False
+        self._writer.run(self._init_db)
+        pending = self._meta("vectors_pending")
+        if pending:
+            # An earlier process stopped before the copy finished; resume it.
+            self._load_vectors_in_background(json.loads(pending))
+
+    def _resolve_projection(self, projection: Optional[Union[str, Projection]]) -> Optional[Projection]:
+        if isinstance(projection, Projection):
+            return projection
+        if projection is None:
+            projection = os.environ.get("ONDEVICE_STORE_PROJECTION") or f"{self.path}.proj.npz"
+            if not os.path.exists(projection):
+                return None
+        return Projection.load(projection) if projection else None
+
+    def set_projection(self, projection: Optional[Projection]) -> None:
+        """Switch to (or, with ``None``, away from) reduced-dimension search; the index is rebuilt on next use."""
+        if projection is not None:
+            with self._pool.read() as db:
+                row = db.execute("SELECT vec FROM embeddings LIMIT 1").fetchone()
+            pending = self._meta("vectors_pending")
+            dim = len(unpack_vector(row[0])) if row is not None else json.loads(pending)["dim"] if pending else None
+            if dim is not None and dim != projection.dim_in:
+                raise ValueError(f"Projection expects {projection.dim_in} dimensions, stored embeddings have {dim}")
+        with self._index_lock:
+            self._close_indexes()
+            self.projection = projection
+
+    def _init_db(self, cur):
+        cur.execute("CREATE TABLE IF NOT EXISTS docs(id TEXT PRIMARY KEY, source TEXT, ts INTEGER, text TEXT)")
+        cur.execute("CREATE TABLE IF NOT EXISTS embeddings(id TEXT PRIMARY KEY, doc_id TEXT, vec BLOB)")
+        cur.execute("CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)")
+        columns = {row[1] for row in cur.execute("PRAGMA table_info(docs)")}
+        if "content_hash" not in columns:
+            cur.execute("ALTER TABLE docs ADD COLUMN content_hash TEXT")
+            rows = cur.execute("SELECT id,text FROM docs").fetchall()
+            cur.executemany("UPDATE docs SET content_hash=? WHERE id=?", [(self.content_hash(t or ""), i) for i, t in rows])
+        if "simhash" not in columns:
+            cur.execute("ALTER TABLE docs ADD COLUMN simhash INTEGER")
+        if "dup_of" not in columns:
+            cur.execute("ALTER TABLE docs ADD COLUMN dup_of TEXT")
+        if "user_id" not in columns:
+            cur.execute("ALTER TABLE docs ADD COLUMN user_id TEXT NOT NULL DEFAULT ''")
+            # Superseded by the partition-first docs_user_source_hash.
+            cur.execute("DROP INDEX IF EXISTS docs_source_hash")
+        for name, ddl in _SECONDARY_INDEXES.items():
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {ddl}")
+        cur.execute("INSERT OR IGNORE INTO meta(key,value) VALUES('store_id',?)", (uuid.uuid4().hex[:12],))
+
+    @staticmethod
+    def _bump_version(cur) -> None:
+        """Count document writes (adds included), for ``version``."""
+        cur.execute("INSERT INTO meta(key,value) VALUES('doc_version','1') "
+                    "ON CONFLICT(key) DO UPDATE SET value=CAST(value AS INTEGER)+1")
+
+    @staticmethod
+    def _bump_generation(cur) -> None:
+        """Count vector writes, so a mapped snapshot index is only reused while it is current."""
+        cur.execute("INSERT INTO meta(key,value) VALUES('generation','1') "
+                    "ON CONFLICT(key) DO UPDATE SET value=CAST(value AS INTEGER)+1")
+
+    def _await_vectors(self) -> None:
+        """Wait until a restore's vectors are in SQLite; everything using the embeddings table calls this."""
+        self._vectors_ready.wait()
+        if self._vector_error is not None:
+            raise SnapshotError(f"Restored vectors could not be loaded: {self._vector_error}")
+
+    def _load_vectors_in_background(self, info: Dict[str, Any]) -> None:
+        self._vectors_ready.clear()
+        self._vector_error = None
+        self._vector_loader = threading.Thread(target=self._load_vectors, args=(info,), name="store-vectors",
+                                               daemon=True)
+        self._vector_loader.start()
+
+    def _load_vectors(self, info: Dict[str, Any]) -> None:
+        try:
+            snap = Snapshot(info["path"])
+            if snap.digest != info.get("digest"):
+                raise SnapshotError(f"{info['path']} changed since it was restored")
+            if self._copy_vectors(snap):
+                self._writer.run(lambda cur: cur.execute("DELETE FROM meta WHERE key='vectors_pending'"))
+        except BaseException as exc:
+            self._vector_error = exc
+        finally:
+            self._vectors_ready.set()
+
+    def _copy_vectors(self, snap: Snapshot) -> bool:
+        """Insert the snapshot's vector rows, a block per write; False if the store closed first."""
+        with span("store.load_vectors") as sp:
+            ids, vectors, norms = snap.vector_ids(), snap.vectors(), snap.norms()
+            for start in range(0, len(ids), 65536):
+                if self._closing:
+                    return False
+                block = vectors[start:start + 65536] * norms[start:start + 65536, None]
+                rows = [(f"emb-{doc_id}", doc_id, pack_vector(vec)) for doc_id, vec in zip(ids[start:start + 65536], block)]
+
+                def insert(cur, rows=rows):
+                    # Not a vector write: the generation stays, so the mapped index stays current.
+                    cur.executemany("INSERT OR IGNORE INTO embeddings(id,doc_id,vec) VALUES (?,?,?)", rows)
+
+                self._writer.run(insert)
+            sp.set("rows", len(ids))
+            return True
+
+    def _meta(self, key: str) -> Optional[str]:
+        with self._pool.read() as db:
+            row = db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def generation(self) -> int:
+        return int(self._meta("generation") or 0)
+
+    @property
+    def version(self) -> str:
+        """Changes whenever a document is added, deleted, imported or restored; suitable as an ETag."""
+        with self._pool.read() as db:
+            meta = dict(db.execute("SELECT key,value FROM meta WHERE key IN ('store_id','doc_version')").fetchall())
+        return f"{meta.get('store_id', '')}-{meta.get('doc_version', 0)}"
+
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]) -> None:
+        """Call ``listener(kind, data)`` after every committed change; registering twice is a no-op."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _notify(self, kind: str, data: Dict[str, Any]) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(kind, data)
+            except Exception:
+                pass
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @traced("store.add")
+    def add(self, text: str, source: str="cli", simhash: Optional[int]=None, dup_of: Optional[str]=None,
+            user_id: str=DEFAULT_PARTITION) -> str:
         doc_id = str(uuid.uuid4())
         ts = int(time.time())
-        cur = self.db.cursor()
-        cur.execute("INSERT INTO docs(id,source,ts,text) VALUES (?,?,?,?)", (doc_id, source, ts, text))
-        self.db.commit()
+        row = (doc_id, source, ts, text, self.content_hash(text), to_signed(simhash) if simhash is not None else None,
+               dup_of, user_id)
+
+        def write(cur):
+            if self.max_docs_per_user > 0:
+                count = cur.execute("SELECT COUNT(*) FROM docs WHERE user_id=?", (user_id,)).fetchone()[0]
+                if count >= self.max_docs_per_user:
+                    raise QuotaExceeded(f"partition {user_id!r} is full ({self.max_docs_per_user} documents)")
+            cur.execute("INSERT INTO docs(id,source,ts,text,content_hash,simhash,dup_of,user_id) VALUES (?,?,?,?,?,?,?,?)",
+                        row)
+            self._bump_version(cur)
+
+        self._writer.run(write)
+        if simhash is not None and dup_of is None:
+            with self._index_lock:
+                near = self._nears.get(user_id)
+                if near is not None:
+                    near.add(doc_id, simhash)
+                elif user_id in self._pending_nears:
+                    self._pending_nears[user_id].changes.append(("add", doc_id, simhash))
+        self._notify("document.indexed", {"id": doc_id, "source": source, "ts": ts, "text": text, "dup_of": dup_of,
+                                          "user_id": user_id})
         return doc_id
 
+    def find(self, text: str, source: str="cli", user_id: str=DEFAULT_PARTITION) -> Optional[str]:
+        with self._pool.read() as db:
+            row = db.execute("SELECT id FROM docs WHERE user_id=? AND source=? AND content_hash=? LIMIT 1",
+                             (user_id, source, self.content_hash(text))).fetchone()
+        return row[0] if row else None
+
+    @traced("store.upsert")
+    def upsert(self, text: str, source: str="cli", user_id: str=DEFAULT_PARTITION) -> Tuple[str, bool]:
+        """Return (doc_id, created); the same text from the same source maps to one document per partition."""
+        existing = self.find(text, source, user_id)
+        if existing:
+            return existing, False
+        return self.add(text, source, user_id=user_id), True
+
+    @contextlib.contextmanager
+    def _ingest_lock(self, key: Tuple[str, str, str]):
+        with self._dedup_lock:
+            entry = self._ingesting.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._dedup_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._ingesting[key]
+
+    def _count(self, *outcomes: str) -> None:
+        with self._dedup_lock:
+            for outcome in outcomes:
+                self._dedup[outcome] += 1
+
+    @traced("store.ingest")
+    def ingest(self, text: str, source: str="cli", user_id: str=DEFAULT_PARTITION, policy: str="link",
+               embed: Optional[Callable[[str], np.ndarray]]=None) -> Tuple[str, str, bool]:
+        """Store ``text`` unless it is a duplicate; returns (doc_id, outcome, needs_embedding).
+
+        ``outcome`` is "exact" (same text from the same source), "linked" or
+        "dropped" (a near-duplicate under ``policy``), or "new". With ``embed``
+        the document's vector is computed and stored before the per-text lock
+        is released, so identical concurrent ingests (gRPC or HTTP) embed it
+        once; otherwise the caller embeds it when ``needs_embedding`` is true.
+        """
+        if policy not in DEDUP_POLICIES:
+            raise ValueError(f"Unknown dedup policy: {policy}")
+        with self._ingest_lock((user_id, source, self.content_hash(text))):
+            doc_id, outcome, needs_embedding = self._ingest_locked(text, source, user_id, policy)
+            if needs_embedding and embed is not None:
+                self.insert_embedding(doc_id, np.asarray(embed(text), dtype=np.float32))
+                needs_embedding = False
+            return doc_id, outcome, needs_embedding
+
+    def _ingest_locked(self, text: str, source: str, user_id: str, policy: str) -> Tuple[str, str, bool]:
+        self._count("indexed")
+        doc_id = self.find(text, source, user_id)
+        if doc_id is not None:
+            # Re-indexing unchanged text from the same source reuses its embedding.
+            self._count("exact")
+            return doc_id, "exact", not self.has_embedding(doc_id)
+        fingerprint = simhash(text) if policy != "off" else None
+        twin = self.near_duplicate(fingerprint, user_id) if fingerprint is not None else None
+        if twin is not None:
+            if policy == "drop":
+                self._count("near", "dropped")
+                return twin, "dropped", False
+            self._count("near", "linked")
+            return self.add(text, source, simhash=fingerprint, dup_of=twin, user_id=user_id), "linked", False
+        return self.add(text, source, simhash=fingerprint, user_id=user_id), "new", True
+
+    def dedup_stats(self) -> Dict[str, Any]:
+        """Ingest counts by outcome and the share of ingests that needed no new embedding."""
+        with self._dedup_lock:
+            stats: Dict[str, Any] = dict(self._dedup)
+        skipped = stats["exact"] + stats["near"]
+        stats["embeds_skipped_rate"] = round(skipped / stats["indexed"], 4) if stats["indexed"] else 0.0
+        return stats
+
+    def _near_index(self, user_id: str) -> NearDuplicateIndex:
+        """The partition's fingerprint index, built on first use without ``_index_lock`` (see ``_vector_index``)."""
+        while True:
+            with self._index_lock:
+                near = self._nears.get(user_id)
+                if near is not None:
+                    return near
+                pending = self._pending_nears.get(user_id)
+                building = pending is None
+                if building:
+                    pending = self._pending_nears[user_id] = _PendingNears()
+            if not building:
+                pending.done.wait()
+                continue
+            try:
+                near = NearDuplicateIndex(self.dedup_distance)
+                with self._pool.read() as db:
+                    for doc_id, fp in db.execute("SELECT id,simhash FROM docs WHERE user_id=? AND simhash IS NOT NULL "
+                                                 "AND dup_of IS NULL", (user_id,)):
+                        near.add(doc_id, to_unsigned(fp))
+                with self._index_lock:
+                    current = self._pending_nears.get(user_id) is pending
+                    if current:
+                        del self._pending_nears[user_id]
+                        pending.replay(near)
+                        self._nears[user_id] = near
+            except BaseException:
+                with self._index_lock:
+                    if self._pending_nears.get(user_id) is pending:
+                        del self._pending_nears[user_id]
+                raise
+            finally:
+                pending.done.set()
+            if current:
+                return near
+            # The store was reloaded while building; start over.
+
+    @traced("store.near_duplicate")
+    def near_duplicate(self, simhash: int, user_id: str=DEFAULT_PARTITION) -> Optional[str]:
+        """An embedded document in the partition whose fingerprint is within ``dedup_distance`` bits, if any."""
+        return self._near_index(user_id).find(simhash)
+
+    def has_embedding(self, doc_id: str) -> bool:
+        """True if the document has its own vector or is linked to one."""
+        self._await_vectors()
+        with self._pool.read() as db:
+            return db.execute(
+                "SELECT 1 FROM embeddings WHERE doc_id=? UNION ALL SELECT 1 FROM docs WHERE id=? AND dup_of IS NOT NULL LIMIT 1",
+                (doc_id, doc_id)).fetchone() is not None
+
+    @traced("store.delete")
+    def delete(self, ids: Optional[Sequence[str]]=None, source_prefix: Optional[str]=None,
+               user_id: Optional[str]=None) -> List[str]:
+        """Delete documents by id and/or source prefix, within one partition if ``user_id`` is given.
+
+        Returns the ids removed.
+        """
+        self._await_vectors()
+        doomed, heirs, owners = self._writer.run(
+            lambda cur: self._delete_rows(cur, list(ids or []), source_prefix, user_id))
+        if not doomed:
+            return []
+        with self._index_lock:
+            # Without a partition the ids may come from any of the loaded ones.
+            for index in self._indexes.values():
+                index.remove(doomed)
+            for near in self._nears.values():
+                for doc_id in doomed:
+                    near.remove(doc_id)
+            for pending_near in self._pending_nears.values():
+                pending_near.changes.extend(("remove", doc_id, None) for doc_id in doomed)
+            for pending in self._pending.values():
+                pending.changes.append(("remove", doomed, None))
+            for heir, vec, fp, partition in heirs:
+                index = self._indexes.get(partition)
+                if index is None:
+                    index = self._pending.get(partition)
+                if index is not None and vec is not None:
+                    index.add([heir], vec.reshape(1, -1))
+                near = self._nears.get(partition)
+                if near is not None and fp is not None:
+                    near.add(heir, fp)
+                elif partition in self._pending_nears and fp is not None:
+                    self._pending_nears[partition].changes.append(("add", heir, fp))
+            self._deleted_since_vacuum += len(doomed)
+        # One event per owning partition, so an unpartitioned delete does not announce ids to every feed.
+        by_owner: Dict[str, List[str]] = {}
+        for doc_id in doomed:
+            if owners.get(doc_id) is not None:
+                by_owner.setdefault(owners[doc_id], []).append(doc_id)
+        for owner, owned in by_owner.items():
+            self._notify("document.deleted", {"ids": owned, "user_id": owner})
+        return doomed
+
+    def _delete_rows(self, cur, ids: List[str], source_prefix: Optional[str], user_id: Optional[str] = None):
+        """Delete the matching rows; returns (ids, heirs, {id: owning partition}).
+
+        An embedding without a document row (left by an interrupted write) is
+        deleted by id too; it has no owner.
+        """
+        owners: Dict[str, Optional[str]] = {}
+
+        def collect(rows) -> None:
+            for doc_id, owner in rows:
+                if owners.get(doc_id) is None:
+                    owners[doc_id] = owner
+
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            if user_id is None:
+                collect(cur.execute(
+                    f"SELECT id,user_id FROM docs WHERE id IN ({marks}) "
+                    f"UNION SELECT doc_id,NULL FROM embeddings WHERE doc_id IN ({marks})",
+                    chunk + chunk))
+            else:
+                collect(cur.execute(
+                    f"SELECT id,user_id FROM docs WHERE id IN ({marks}) AND user_id=?", chunk + [user_id]))
+        if source_prefix:
+            escaped = source_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            if user_id is None:
+                collect(cur.execute("SELECT id,user_id FROM docs WHERE source LIKE ? ESCAPE '\\'", (escaped + "%",)))
+            else:
+                collect(cur.execute(
+                    "SELECT id,user_id FROM docs WHERE user_id=? AND source LIKE ? ESCAPE '\\'", (user_id, escaped + "%")))
+        doomed = list(owners)
+        if not doomed:
+            return [], [], {}
+        heirs = self._promote_linked(cur, doomed)
+        for start in range(0, len(doomed), 500):
+            chunk = doomed[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            cur.execute(f"DELETE FROM embeddings WHERE doc_id IN ({marks})", chunk)
+            cur.execute(f"DELETE FROM docs WHERE id IN ({marks})", chunk)
+        self._bump_generation(cur)
+        self._bump_version(cur)
+        return doomed, heirs, owners
+
+    def _promote_linked(self, cur, doomed: List[str]) -> List[Tuple[str, Optional[np.ndarray], Optional[int], str]]:
+        """Hand a deleted document's embedding to the oldest surviving duplicate linked to it."""
+        gone = set(doomed)
+        linked: Dict[str, List[Tuple[str, Optional[int], str]]] = {}
+        for start in range(0, len(doomed), 500):
+            chunk = doomed[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            for doc_id, canon, fp, partition in cur.execute(
+                    f"SELECT id,dup_of,simhash,user_id FROM docs WHERE dup_of IN ({marks}) ORDER BY ts,id", chunk).fetchall():
+                if doc_id not in gone:
+                    linked.setdefault(canon, []).append((doc_id, fp, partition))
+        heirs: List[Tuple[str, Optional[np.ndarray], Optional[int], str]] = []
+        for canon, members in linked.items():
+            heir, fp, partition = members[0]
+            row = cur.execute("SELECT vec FROM embeddings WHERE doc_id=?", (canon,)).fetchone()
+            if row:
+                cur.execute("INSERT OR REPLACE INTO embeddings(id,doc_id,vec) VALUES (?,?,?)", (f"emb-{heir}", heir, row[0]))
+            cur.execute("UPDATE docs SET dup_of=NULL WHERE id=?", (heir,))
+            cur.execute("UPDATE docs SET dup_of=? WHERE dup_of=?", (heir, canon))
+            vec = unpack_vector(row[0]) if row else None
+            heirs.append((heir, vec, to_unsigned(fp) if fp is not None else None, partition))
+        return heirs
+
+    def compact(self, vacuum_after: int = 1) -> Dict[str, int]:
+        """Drop index tombstones and, after ``vacuum_after`` deletions, vacuum SQLite."""
+        self._await_vectors()
+        with span("store.compact") as sp:
+            with self._index_lock:
+                reclaimed = sum(index.compact() for index in self._indexes.values())
+                pending = self._deleted_since_vacuum
+            vacuumed = 0
+            if pending >= max(1, vacuum_after):
+                def vacuum(cur):
+                    cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    cur.execute("VACUUM")
+
+                try:
+                    # Outside a transaction, between write batches.
+                    self._writer.run(vacuum, transactional=False)
+                    vacuumed = 1
+                    with self._index_lock:
+                        self._deleted_since_vacuum -= pending
+                except sqlite3.OperationalError:
+                    # Busy with other statements; the next run retries.
+                    pass
+            sp.set("index_rows", reclaimed)
+            sp.set("vacuumed", vacuumed)
+            return {"index_rows": reclaimed, "vacuumed": vacuumed}
+
+    def stats(self) -> Dict[str, int]:
+        with self._index_lock:
+            tombstones = sum(index.tombstones for index in self._indexes.values())
+            loaded = len(self._indexes)
+        pending = self._meta("vectors_pending")
+        with self._pool.read() as db:
+            return {
+                "documents": db.execute("SELECT COUNT(*) FROM docs").fetchone()[0],
+                "embeddings": (json.loads(pending)["rows"] if pending
+                               else db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]),
+                "linked": db.execute("SELECT COUNT(*) FROM docs WHERE dup_of IS NOT NULL").fetchone()[0],
+                "tombstones": tombstones,
+                "partitions": db.execute("SELECT COUNT(DISTINCT user_id) FROM docs").fetchone()[0],
+                "partitions_loaded": loaded,
+            }
+
+    def partition_stats(self, user_id: str=DEFAULT_PARTITION) -> Dict[str, int]:
+        """Document and vector counts of one partition, and whether its index is loaded or memory-mapped.
+
+        Does not wait for a restore's vector copy (it feeds ``/events`` status); until then
+        ``embeddings`` counts the rows copied so far.
+        """
+        with self._index_lock:
+            index = self._indexes.get(user_id)
+            rows = len(index) if index is not None else None
+            mapped = isinstance(index, LocalIndex) and index.mapped
+        with self._pool.read() as db:
+            documents = db.execute("SELECT COUNT(*) FROM docs WHERE user_id=?", (user_id,)).fetchone()[0]
+            embeddings = db.execute("SELECT COUNT(*) FROM embeddings e LEFT JOIN docs d ON d.id=e.doc_id "
+                                    "WHERE COALESCE(d.user_id,'')=?", (user_id,)).fetchone()[0]
+        return {"documents": documents, "embeddings": embeddings, "loaded": rows is not None, "mapped": mapped,
+                "quota": self.max_docs_per_user}
+
+    def io_metrics(self) -> Dict[str, Any]:
+        """Writer batching and read-pool counters, for ``/metrics``."""
+        return {"writer": self._writer.metrics(), "readers": self._pool.metrics()}
+
+    @traced("store.insert_embedding")
     def insert_embedding(self, doc_id: str, vec: np.ndarray):
-        blob = msgpack.packb(vec.astype('float32').tolist())
-        cur = self.db.cursor()
-        cur.execute("INSERT OR REPLACE INTO embeddings(id,doc_id,vec) VALUES (?,?,?)", (f"emb-{doc_id}", doc_id, blob))
-        self.db.commit()
-
-    def all_embeddings(self) -> List[Tuple[str, np.ndarray, str]]:
-        cur = self.db.cursor()
-        rows = cur.execute("SELECT id,vec,doc_id FROM embeddings").fetchall()
-        out=[]
-        for id, blob, doc_id in rows:
-            arr = np.array(msgpack.unpackb(blob), dtype=np.float32)
-            out.append((id, arr, doc_id))
-        return out
+        self._await_vectors()
+        blob = pack_vector(vec)
 
+        def write(cur):
+            cur.execute("INSERT OR REPLACE INTO embeddings(id,doc_id,vec) VALUES (?,?,?)", (f"emb-{doc_id}", doc_id, blob))
+            self._bump_generation(cur)
+            row = cur.execute("SELECT user_id FROM docs WHERE id=?", (doc_id,)).fetchone()
+            return row[0] if row else DEFAULT_PARTITION
+
+        partition = self._writer.run(write)
+        with self._index_lock:
+            index = self._indexes.get(partition)
+            if index is None:
+                index = self._pending.get(partition)
+            if index is not None:
+                # A replaced vector leaves a tombstone for its old row.
+                index.add([doc_id], vec.reshape(1, -1))
+
+    def all_embeddings(self, user_id: Optional[str]=None) -> List[Tuple[str, np.ndarray, str]]:
+        """``(embedding id, vector, doc_id)`` rows, of one partition if ``user_id`` is given."""
+        self._await_vectors()
+        with span("store.all_embeddings") as sp:
+            with self._pool.read() as db:
+                if user_id is None:
+                    rows = db.execute("SELECT id,vec,doc_id FROM embeddings").fetchall()
+                elif user_id == DEFAULT_PARTITION:
+                    # Vectors without a document row count as the default partition's.
+                    rows = db.execute("SELECT e.id,e.vec,e.doc_id FROM embeddings e LEFT JOIN docs d ON d.id=e.doc_id "
+                                      "WHERE COALESCE(d.user_id,'')=''").fetchall()
+                else:
+                    rows = db.execute("SELECT e.id,e.vec,e.doc_id FROM docs d JOIN embeddings e ON e.doc_id=d.id "
+                                      "WHERE d.user_id=?", (user_id,)).fetchall()
+            out=[]
+            for id, blob, doc_id in rows:
+                arr = unpack_vector(blob)
+                out.append((id, arr, doc_id))
+            sp.set("rows", len(out))
+            return out
+
+    def _full_vectors(self, ids: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        """Stored vectors of those ``ids`` that still have one, in the given order; for re-ranking."""
+        if not ids:
+            return [], np.zeros((0, 0), np.float32)
+        self._await_vectors()
+        with self._pool.read() as db:
+            rows = dict(db.execute(f"SELECT doc_id,vec FROM embeddings WHERE doc_id IN ({','.join('?' * len(ids))})",
+                                   list(ids)).fetchall())
+        found = [doc_id for doc_id in ids if doc_id in rows]
+        if not found:
+            return [], np.zeros((0, 0), np.float32)
+        return found, np.stack([unpack_vector(rows[doc_id]) for doc_id in found])
+
+    @traced("store.get_doc")
     def get_doc(self, doc_id: str) -> Optional[str]:
-        cur = self.db.cursor()
-        r = cur.execute("SELECT text FROM docs WHERE id= ?", (doc_id,)).fetchone()
+        with self._pool.read() as db:
+            r = db.execute("SELECT text FROM docs WHERE id= ?", (doc_id,)).fetchone()
         return r[0] if r else None
+
+    def get_document(self, doc_id: str, user_id: Optional[str]=None) -> Optional[Dict[str, Any]]:
+        return self.get_documents([doc_id], user_id).get(doc_id)
+
+    @traced("store.get_documents")
+    def get_documents(self, ids: Sequence[str], user_id: Optional[str]=None) -> Dict[str, Dict[str, Any]]:
+        """``{id: {"id", "source", "ts", "text"}}`` for those ``ids`` that exist (in the partition, if given)."""
+        out: Dict[str, Dict[str, Any]] = {}
+        ids = list(ids)
+        scope, extra = (" AND user_id=?", [user_id]) if user_id is not None else ("", [])
+        with self._pool.read() as db:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for doc_id, source, ts, text in db.execute(
+                        f"SELECT id,source,ts,text FROM docs WHERE id IN ({marks}){scope}", chunk + extra):
+                    out[doc_id] = {"id": doc_id, "source": source, "ts": ts, "text": text}
+        return out
+
+    def list_documents(self, user_id: Optional[str]=None) -> List[Dict[str, Any]]:
+        """Every document (of one partition if ``user_id`` is given), newest first."""
+        where, args = ("WHERE user_id=? ", (user_id,)) if user_id is not None else ("", ())
+        with self._pool.read() as db:
+            return [{"id": doc_id, "source": source, "ts": ts, "text": text}
+                    for doc_id, source, ts, text in db.execute(
+                        f"SELECT id,source,ts,text FROM docs {where}ORDER BY ts DESC, id", args)]
+
+    def page_documents(self, user_id: Optional[str]=None, limit: int=100, after: Optional[str]=None,
+                       fields: Sequence[str]=("id", "source", "ts", "text"),
+                       preview_chars: int=200) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Up to ``limit`` documents, newest first, following the cursor ``after``.
+
+        Returns the rows and the cursor of the next page (``None`` on the last
+        one). Within a partition the page is read off the ``docs_user_ts``
+        index, so its cost does not grow with the partition. ``fields`` is a
+        subset of id, source, ts, text, user_id and preview (the first
+        ``preview_chars`` characters, cut in SQL so whole texts are not read
+        into Python). Raises ``ValueError`` for an unknown field or a malformed
+        cursor.
+        """
+        columns = {"id": "id", "source": "source", "ts": "ts", "text": "text", "user_id": "user_id",
+                   "preview": f"substr(text,1,{int(preview_chars)})"}
+        unknown = [name for name in fields if name not in columns]
+        if unknown:
+            raise ValueError(f"Unknown document fields: {', '.join(unknown)}")
+        where, args = (["user_id=?"], [user_id]) if user_id is not None else ([], [])
+        if after:
+            ts, sep, last_id = after.partition(":")
+            if not sep or not ts.lstrip("-").isdigit():
+                raise ValueError(f"Malformed cursor: {after!r}")
+            where.append("(ts,id) < (?,?)")
+            args += [int(ts), last_id]
+        clause = f"WHERE {' AND '.join(where)} " if where else ""
+        select = ",".join(["ts", "id"] + [columns[name] for name in fields])
+        with self._pool.read() as db:
+            rows = db.execute(f"SELECT {select} FROM docs {clause}ORDER BY ts DESC, id DESC LIMIT ?",
+                              args + [max(1, limit) + 1]).fetchall()
+        more = len(rows) > max(1, limit)
+        rows = rows[:max(1, limit)]
+        page = [dict(zip(fields, row[2:])) for row in rows]
+        return page, (f"{rows[-1][0]}:{rows[-1][1]}" if more else None)
+
+    def import_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Insert ``{"id", "source", "ts", "text", "vector"}`` records, keeping ids; known ids are skipped.
+
+        Records without a ``vector`` are stored unembedded; ``unembedded`` lists them for the caller to embed.
+        """
+        self._await_vectors()
+
+        def write(cur):
+            imported = 0
+            for rec in records:
+                doc_id, text = rec.get("id"), rec.get("text") or ""
+                if not doc_id:
+                    continue
+                fp = simhash(text)
+                cur.execute("INSERT OR IGNORE INTO docs(id,source,ts,text,content_hash,simhash,user_id) "
+                            "VALUES (?,?,?,?,?,?,?)",
+                            (doc_id, rec.get("source") or "api", int(rec.get("ts") or time.time()), text,
+                             self.content_hash(text), to_signed(fp) if fp is not None else None,
+                             rec.get("user_id") or DEFAULT_PARTITION))
+                if not cur.rowcount:
+                    continue
+                imported += 1
+                if rec.get("vector"):
+                    blob = pack_vector(np.asarray(rec["vector"], dtype=np.float32))
+                    cur.execute("INSERT OR IGNORE INTO embeddings(id,doc_id,vec) VALUES (?,?,?)",
+                                (f"emb-{doc_id}", doc_id, blob))
+            self._bump_generation(cur)
+            self._bump_version(cur)
+            return imported
+
+        imported = self._writer.run(write)
+        if imported:
+            with self._index_lock:
+                self._drop_index()
+            self._notify("store.reloaded", {"imported": imported})
+        return imported
+
+    def unembedded(self, user_id: Optional[str]=None) -> List[Tuple[str, str]]:
+        """(id, text) of the documents with neither their own vector nor a linked one."""
+        self._await_vectors()
+        scope, args = (" AND d.user_id=?", (user_id,)) if user_id is not None else ("", ())
+        with self._pool.read() as db:
+            return db.execute("SELECT d.id,d.text FROM docs d LEFT JOIN embeddings e ON e.doc_id=d.id "
+                              f"WHERE e.doc_id IS NULL AND d.dup_of IS NULL{scope} ORDER BY d.ts,d.id",
+                              args).fetchall()
+
+    def import_sqlite(self, path: str) -> int:
+        """Copy documents and embeddings from another store file; known ids are skipped."""
+        self._await_vectors()
+
+        def copy(cur):
+            # ATTACH cannot run inside a transaction, so this is a job of its own.
+            cur.execute("ATTACH DATABASE ? AS legacy", (path,))
+            try:
+                columns = {row[1] for row in cur.execute("PRAGMA legacy.table_info(docs)")}
+                if not columns:
+                    return 0
+                wanted = [c for c in DOC_COLUMNS if c in columns]
+                cur.execute("BEGIN IMMEDIATE")
+                before = cur.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+                cur.execute(f"INSERT OR IGNORE INTO docs({','.join(wanted)}) SELECT {','.join(wanted)} FROM legacy.docs")
+                cur.execute("INSERT OR IGNORE INTO embeddings(id,doc_id,vec) SELECT id,doc_id,vec FROM legacy.embeddings")
+                rows = cur.execute("SELECT id,text FROM docs WHERE content_hash IS NULL").fetchall()
+                cur.executemany("UPDATE docs SET content_hash=? WHERE id=?", [(self.content_hash(t or ""), i) for i, t in rows])
+                self._bump_generation(cur)
+                self._bump_version(cur)
+                imported = cur.execute("SELECT COUNT(*) FROM docs").fetchone()[0] - before
+                cur.execute("COMMIT")
+                return imported
+            finally:
+                if cur.connection.in_transaction:
+                    cur.execute("ROLLBACK")
+                cur.execute("DETACH DATABASE legacy")
+
+        imported = self._writer.run(copy, transactional=False)
+        if imported:
+            with self._index_lock:
+                self._drop_index()
+            self._notify("store.reloaded", {"imported": imported})
+        return imported
+
+    def _close_indexes(self):
+        for index in self._indexes.values():
+            self._retire(index)
+        self._indexes.clear()
+        # Builds in progress read the old rows (or projection); they are discarded.
+        self._pending.clear()
+
+    def _retire(self, index: Union[LocalIndex, ShardedIndex, RerankIndex]) -> None:
+        """Close an index dropped from ``_indexes``, or once its last search finishes. Holds ``_index_lock``."""
+        if self._leases[id(index)]:
+            self._retired[id(index)] = index
+        else:
+            index.close()
+
+    def _release(self, index: Union[LocalIndex, ShardedIndex, RerankIndex]) -> None:
+        with self._index_lock:
+            self._leases[id(index)] -= 1
+            if self._leases[id(index)] > 0:
+                return
+            del self._leases[id(index)]
+            retired = self._retired.pop(id(index), None)
+        if retired is not None:
+            retired.close()
+
+    def _drop_index(self):
+        self._close_indexes()
+        self._nears.clear()
+        self._pending_nears.clear()
+
+    def _vector_index(self, user_id: str=DEFAULT_PARTITION,
+                      lease: bool=False) -> Union[LocalIndex, ShardedIndex, RerankIndex]:
+        """The partition's index, built on first use; with ``lease`` the caller must ``_release`` it.
+
+        The build runs without ``_index_lock``, so other partitions stay
+        usable meanwhile. Vector writes and deletes made during the build are
+        recorded on its ``_PendingIndex`` and replayed before it is installed.
+        """
+        while True:
+            with self._index_lock:
+                index = self._indexes.get(user_id)
+                if index is not None:
+                    self._indexes.move_to_end(user_id)
+                    if lease:
+                        self._leases[id(index)] += 1
+                    return index
+                pending = self._pending.get(user_id)
+                building = pending is None
+                if building:
+                    pending = self._pending[user_id] = _PendingIndex()
+            if not building:
+                pending.done.wait()
+                continue
+            try:
+                index = self._build_index(user_id)
+                with self._index_lock:
+                    current = self._pending.get(user_id) is pending
+                    if current:
+                        del self._pending[user_id]
+                        pending.replay(index)
+                        self._indexes[user_id] = index
+                        if lease:
+                            self._leases[id(index)] += 1
+                        while len(self._indexes) > self.max_partitions:
+                            _, idle = self._indexes.popitem(last=False)
+                            self._retire(idle)
+            except BaseException:
+                with self._index_lock:
+                    if self._pending.get(user_id) is pending:
+                        del self._pending[user_id]
+                raise
+            finally:
+                pending.done.set()
+            if current:
+                return index
+            # The store was reloaded or reprojected while building; start over.
+            index.close()
+
+    def _build_index(self, user_id: str) -> Union[LocalIndex, ShardedIndex, RerankIndex]:
+        mapped = self._mapped_snapshot(user_id)
+        if mapped is not None and self.shards <= 0 and self.projection is None:
+            return LocalIndex.from_normalised(mapped.vector_ids(), mapped.vectors())
+        index = ShardedIndex(shards=self.shards) if self.shards > 0 else LocalIndex()
+        if self.projection is not None:
+            # Sharded candidates re-rank on vectors read from SQLite rather than a full in-process copy.
+            index = RerankIndex(self.projection, index, self.oversample,
+                                full=self._full_vectors if self.shards > 0 else None)
+        if mapped is not None:
+            ids, vecs = mapped.vector_ids(), mapped.vectors()
+        else:
+            rows = self.all_embeddings(user_id)
+            ids = [doc_id for _, _, doc_id in rows]
+            vecs = np.stack([vec for _, vec, _ in rows]) if rows else None
+        if ids:
+            index.add(ids, vecs)
+        return index
+
+    def _mapped_snapshot(self, user_id: str=DEFAULT_PARTITION) -> Optional[Snapshot]:
+        """The snapshot this store was restored from, if no vector has changed since.
+
+        Its vector block is only usable as the index of a partition that
+        holds every vector in the store.
+        """
+        raw = self._meta("restored_from")
+        if not raw:
+            return None
+        info = json.loads(raw)
+        if info.get("generation") != self.generation:
+            return None
+        with self._pool.read() as db:
+            if self._vectors_ready.is_set():
+                other = db.execute("SELECT 1 FROM embeddings e LEFT JOIN docs d ON d.id=e.doc_id "
+                                   "WHERE COALESCE(d.user_id,'')<>? LIMIT 1", (user_id,)).fetchone()
+            else:
+                # The vector rows are still being copied in; judge by the documents.
+                other = db.execute("SELECT 1 FROM docs WHERE user_id<>? LIMIT 1", (user_id,)).fetchone()
+            if other:
+                return None
+        try:
+            snap = Snapshot(info["path"])
+        except (OSError, SnapshotError):
+            return None
+        return snap if snap.digest == info.get("digest") else None
+
+    def snapshot(self, path: str) -> Dict[str, Any]:
+        """Write a consistent binary snapshot of documents, vectors and projection to ``path``."""
+        self._await_vectors()
+        with span("store.snapshot") as sp:
+            # A separate connection inside one read transaction sees a single
+            # WAL snapshot, even while this store keeps taking writes.
+            with self._pool.read() as reader:
+                reader.execute("BEGIN")
+                generation = int((reader.execute("SELECT value FROM meta WHERE key='generation'").fetchone() or [0])[0])
+                rows = reader.execute("SELECT doc_id,vec FROM embeddings ORDER BY doc_id").fetchall()
+                ids = [doc_id for doc_id, _ in rows]
+                dim = len(unpack_vector(rows[0][1])) if rows else 0
+                vectors = np.zeros((len(rows), dim), dtype=np.float32)
+                for n, (_, blob) in enumerate(rows):
+                    vectors[n] = unpack_vector(blob)
+                del rows
+                header = write_snapshot(
+                    path, vector_ids=ids, vectors=vectors, doc_columns=DOC_COLUMNS,
+                    docs=reader.execute(f"SELECT {','.join(DOC_COLUMNS)} FROM docs ORDER BY id"),
+                    generation=generation, projection=self.projection)
+                reader.execute("COMMIT")
+            sp.set("rows", header["rows"])
+            sp.set("docs", header["docs"])
+            return header
+
+    def restore(self, path: str, replace: bool = False, verify: bool = True) -> Dict[str, Any]:
+        """Load a snapshot into this store; refuses a non-empty store unless ``replace``.
+
+        Document rows are bulk-inserted into SQLite. Vectors are not: the
+        search index maps the snapshot's normalised block directly, and the
+        vector rows are copied into the embeddings table by a background
+        thread (resumed on the next start if the process stops first).
+        """
+        with span("store.restore") as sp:
+            # A replace must not race the copy of an earlier restore.
+            self._vectors_ready.wait()
+            snap = Snapshot(path)
+            if verify:
+                snap.verify()
+            columns = snap.header["doc_columns"]
+            unknown = set(columns) - set(DOC_COLUMNS)
+            if unknown:
+                raise SnapshotError(f"Snapshot has unknown document columns: {sorted(unknown)}")
+            ids, vectors = snap.vector_ids(), snap.vectors()
+            pending = {"path": os.path.abspath(path), "digest": snap.digest, "rows": len(ids),
+                       "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0}
+
+            def load(cur):
+                if not replace and cur.execute("SELECT 1 FROM docs LIMIT 1").fetchone():
+                    raise ValueError(f"{self.path} already has documents; restore into an empty store or pass replace=True")
+                cur.execute("DELETE FROM embeddings")
+                cur.execute("DELETE FROM docs")
+                # Bulk load without secondary indexes and build them once at the end.
+                for name in _SECONDARY_INDEXES:
+                    cur.execute(f"DROP INDEX IF EXISTS {name}")
+                marks = ",".join("?" * len(columns))
+                cur.executemany(f"INSERT INTO docs({','.join(columns)}) VALUES ({marks})", snap.docs())
+                for name, ddl in _SECONDARY_INDEXES.items():
+                    cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {ddl}")
+                self._bump_generation(cur)
+                self._bump_version(cur)
+                generation = int(cur.execute("SELECT value FROM meta WHERE key='generation'").fetchone()[0])
+                cur.execute("INSERT OR REPLACE INTO meta(key,value) VALUES('restored_from',?)", (json.dumps(
+                    {"path": os.path.abspath(path), "digest": snap.digest, "generation": generation}),))
+                cur.execute("INSERT OR REPLACE INTO meta(key,value) VALUES('vectors_pending',?)", (json.dumps(pending),))
+                return generation
+
+            with self._index_lock:
+                self._drop_index()
+                generation = self._writer.run(load)
+                self._deleted_since_vacuum = 0
+            if ids:
+                self._load_vectors_in_background(pending)
+            else:
+                self._writer.run(lambda cur: cur.execute("DELETE FROM meta WHERE key='vectors_pending'"))
+            projection = snap.projection()
+            if projection is not None and self.projection is None:
+                projection.save(f"{self.path}.proj.npz")
+                self.set_projection(projection)
+            self._notify("store.reloaded", {"restored": snap.header.get("docs", 0)})
+            sp.set("rows", len(ids))
+            sp.set("docs", snap.header.get("docs", 0))
+            return {"documents": snap.header.get("docs", 0), "embeddings": len(ids), "generation": generation}
+
+    def search(self, query: np.ndarray, k: int = 5, user_id: str = DEFAULT_PARTITION) -> List[Tuple[float, str]]:
+        """Top-``k`` (cosine score, doc_id) pairs of the partition, best first."""
+        index = self._vector_index(user_id, lease=True)
+        try:
+            dim = self.projection.dim_out if self.projection is not None else index.dim
+            with span("store.search", k=k, rows=len(index), shards=self.shards, dim=dim):
+                return index.search(np.asarray(query, dtype=np.float32), k)
+        finally:
+            self._release(index)
+
+    def close(self):
+        # The copy of restored vectors stops between blocks and resumes on the next start.
+        self._closing = True
+        if self._vector_loader is not None:
+            self._vector_loader.join()
+        with self._index_lock:
+            self._drop_index()
+        self._writer.close()
+        self._pool.close()
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from core.action_executor import ActionBackend, ActionExecutor, ActionTimeoutError, FakeBackend, OsascriptBackend
+from core.plugin_runtime import PluginRuntime
+
+
+def test_concurrent_actions_share_an_invocation_and_fail_independently():
+    backend = FakeBackend(startup_delay=0.01)
+    executor = ActionExecutor(backend=backend, max_batch=8, batch_window=0.02)
+
+    async def _run():
+        return await asyncio.gather(
+            *(executor.run("FAIL" if i == 2 else f"script {i}") for i in range(5)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(_run())
+    assert backend.invocations == 1
+    assert isinstance(results[2], RuntimeError)
+    assert [r for i, r in enumerate(results) if i != 2] == ["ran 8 chars"] * 4
+    assert executor.metrics()["failures"] == 1
+
+
+def test_executor_is_reusable_across_event_loops():
+    backend = FakeBackend(startup_delay=0.0)
+    executor = ActionExecutor(backend=backend, max_concurrency=1, max_batch=1)
+
+    async def _run():
+        # Two batches contend for the single slot.
+        return await asyncio.gather(executor.run("first"), executor.run("second"))
+
+    for _ in range(2):
+        assert asyncio.run(_run()) == ["ran 5 chars", "ran 6 chars"]
+    assert backend.invocations == 4 and executor.metrics()["pending"] == 0
+    with pytest.raises(TypeError):
+        ActionBackend()
+
+
+def test_timeout_kills_interpreter_without_blocking_loop():
+    executor = ActionExecutor(backend=FakeBackend(startup_delay=5.0), timeout=0.2)
+
+    async def _run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        with pytest.raises(ActionTimeoutError):
+            await executor.run("slow")
+        ticking.cancel()
+        return ticks, time.perf_counter() - started
+
+    ticks, elapsed = asyncio.run(_run())
+    assert elapsed < 2.0
+    assert ticks >= 5
+    assert executor.metrics()["timeouts"] == 1
+
+
+def test_osascript_batch_round_trip():
+    script = OsascriptBackend.combine(['tell application "Notes" to return 1', "error \"nope\""])
+    assert script.count("on error _msg") == 2
+    results = OsascriptBackend.split("ok\x1f1\x1eerr\x1fnope\x1e\n", 2)
+    assert results[0] == "1" and str(results[1]) == "nope"
+
+
+def test_plugin_runtime_runs_actions_through_executor():
+    backend = FakeBackend(startup_delay=0.01)
+    runtime = PluginRuntime(executor=ActionExecutor(backend=backend, batch_window=0.02))
+
+    async def _run():
+        return await asyncio.gather(
+            runtime.execute("create_note", {"title": "a"}),
+            runtime.execute("open_finder", {"path": "/tmp"}),
+        )
+
+    assert all(r.startswith("ran ") for r in asyncio.run(_run()))
+    assert backend.invocations == 1
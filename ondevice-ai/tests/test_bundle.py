@@ -0,0 +1,179 @@
+import hashlib
+import json
+import zipfile
+
+from core import bundle
+from core.bundle import VerificationCache, sha256_file, verify_bundle
+
+
+def _make_bundle(path, model=b"weights" * 300_000, per_member=True, extra=None):
+    members = {"model.mlxq": model, "tokenizer.json": b'{"vocab": {}}', "config.json": b"{}", **(extra or {})}
+    digests = {name: hashlib.sha256(data).hexdigest() for name, data in members.items()}
+    manifest = {"version": "1", "sha256": digests if per_member else digests["model.mlxq"],
+                "ed25519_signature": "ed25519:AAAA"}
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(zipfile.ZipInfo("model.mlxq"), model, compress_type=zipfile.ZIP_STORED)
+        zf.writestr("tokenizer.json", members["tokenizer.json"], compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr("config.json", members["config.json"])
+        for name, data in (extra or {}).items():
+            zf.writestr(name, data)
+        zf.writestr("manifest.json", json.dumps(manifest))
+    return digests
+
+
+def test_verify_bundle_hashes_members_in_place(tmp_path):
+    digests = _make_bundle(tmp_path / "a.zip")
+    result = verify_bundle(str(tmp_path / "a.zip"), workers=3, allow_unsigned=True)
+    assert result.ok and result.digests == digests
+
+    # A single digest covers only the model, so the tokenizer and config would go unchecked.
+    _make_bundle(tmp_path / "b.zip", per_member=False)
+    partial = verify_bundle(str(tmp_path / "b.zip"), allow_unsigned=True)
+    assert not partial.ok and partial.errors == ["Manifest has no sha256 for: config.json, tokenizer.json"]
+
+    (tmp_path / "plain.bin").write_bytes(b"weights" * 300_000)
+    assert sha256_file(str(tmp_path / "plain.bin")) == digests["model.mlxq"]
+
+
+def test_tampered_bundle_fails(tmp_path):
+    path = tmp_path / "bad.zip"
+    _make_bundle(path)
+    raw = bytearray(path.read_bytes())
+    offset = raw.index(b"weights")
+    raw[offset:offset + 7] = b"WEIGHTS"
+    path.write_bytes(bytes(raw))
+    result = verify_bundle(str(path), allow_unsigned=True)
+    assert not result.ok
+    assert result.errors == ["Digest mismatch: model.mlxq"]
+
+
+def test_bundles_without_a_key_are_refused_unless_allowed(tmp_path):
+    path = tmp_path / "unsigned.zip"
+    _make_bundle(path)
+    refused = verify_bundle(str(path))
+    assert not refused.ok and "No public key" in refused.errors[0] and not refused.digests
+    # A key the (placeholder) signature does not verify against fails too.
+    assert verify_bundle(str(path), "A" * 44).errors[0] == "Manifest signature did not verify"
+    assert verify_bundle(str(path), allow_unsigned=True).ok
+
+    cache = VerificationCache(str(tmp_path / "cache.json"))
+    assert verify_bundle(str(path), cache=cache, allow_unsigned=True).ok
+    # An unsigned pass recorded in the cache does not let a strict caller through.
+    assert not verify_bundle(str(path), cache=cache).ok
+
+
+def test_unchanged_bundle_verifies_from_cache(tmp_path, monkeypatch):
+    path = tmp_path / "c.zip"
+    _make_bundle(path)
+    cache_file = tmp_path / "cache.json"
+    assert not verify_bundle(str(path), cache=VerificationCache(str(cache_file)), allow_unsigned=True).cached
+
+    def _boom(*args, **kwargs):
+        raise AssertionError("should not rehash")
+
+    monkeypatch.setattr(bundle, "hash_bundle_members", _boom)
+    again = verify_bundle(str(path), cache=VerificationCache(str(cache_file)), allow_unsigned=True)
+    assert again.ok and again.cached
+
+
+def test_open_bundle_extracts_once_into_shared_cache(tmp_path):
+    from core.bundle_loader import open_bundle
+
+    path = tmp_path / "planner.zip"
+    digests = _make_bundle(path, extra={"adapters/legal.lora": b"lora-bytes"})
+    cache = tmp_path / "cache"
+
+    loaded = open_bundle(str(path), cache_root=str(cache), allow_unsigned=True)
+    assert loaded.model_path.name == "model.mlxq"
+    assert loaded.weights()[:7] == b"weights"
+    assert list(loaded.adapters()) == ["legal"] and loaded.adapter("legal")[:] == b"lora-bytes"
+    obj = cache / "objects" / digests["model.mlxq"][:2] / digests["model.mlxq"]
+    assert (loaded.model_path).stat().st_ino == obj.stat().st_ino
+
+    # A copy of the same bundle elsewhere reuses the extracted tree.
+    copy = tmp_path / "copy.zip"
+    copy.write_bytes(path.read_bytes())
+    again = open_bundle(str(copy), cache_root=str(cache), allow_unsigned=True)
+    assert again.root == loaded.root
+    assert len([p for p in (cache / "objects").rglob("*") if p.is_file()]) == 5
+    loaded.close()
+    again.close()
+
+
+def test_open_bundle_refuses_escaping_and_unlisted_members(tmp_path):
+    import pytest
+
+    from core.bundle_loader import BundleError, open_bundle
+
+    cache = tmp_path / "cache" / "bundles"
+    for name in ("../../../escaped.txt", "/abs/escaped.txt", "adapters/../../escaped.txt"):
+        path = tmp_path / "slip.zip"
+        _make_bundle(path, extra={name: b"gotcha"})
+        with pytest.raises(BundleError, match="Unsafe member name"):
+            open_bundle(str(path), cache_root=str(cache), allow_unsigned=True)
+        with pytest.raises(BundleError, match="Unsafe member name"):
+            open_bundle(str(path), cache_root=str(cache), verify=False)
+    assert not list(tmp_path.rglob("escaped.txt"))
+
+    # A member slipped into a signed bundle without a digest in the manifest is not extracted.
+    path = tmp_path / "extra.zip"
+    _make_bundle(path)
+    with zipfile.ZipFile(path, "a") as zf:
+        zf.writestr("adapters/evil.lora", b"unchecked")
+    with pytest.raises(BundleError, match="no sha256 for: adapters/evil.lora"):
+        open_bundle(str(path), cache_root=str(cache), allow_unsigned=True)
+    assert not list(tmp_path.rglob("evil.lora"))
+
+
+def test_runtime_reports_a_bundle_that_fails_verification(tmp_path, monkeypatch):
+    import importlib
+    import sys
+
+    path = tmp_path / "planner.zip"
+    _make_bundle(path)
+    raw = bytearray(path.read_bytes())
+    offset = raw.index(b"weights")
+    raw[offset:offset + 7] = b"WEIGHTS"
+    path.write_bytes(bytes(raw))
+    monkeypatch.setenv("EKUPKARAN_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("PLANNER_BUNDLE_PATH", str(path))
+    monkeypatch.setenv("PLANNER_BUNDLE_ALLOW_UNSIGNED", "1")
+    sys.modules.pop("tools.mlx_runtime", None)
+    runtime = importlib.import_module("tools.mlx_runtime")
+
+    runtime.start_warmup()
+    assert runtime._WARMUP.wait("model", 10)
+    with runtime.app.test_client() as client:
+        ready = client.get("/ready")
+    assert ready.status_code == 503 and ready.json["ready"] is False
+    assert ready.json["stages"]["model"]["state"] == "failed"
+    assert "Digest mismatch: model.mlxq" in ready.json["stages"]["model"]["error"]
+    assert runtime.BUNDLE is None and runtime.MODEL_BACKEND == "fallback"
+
+
+def test_runtime_maps_a_requested_adapter_from_the_bundle(tmp_path, monkeypatch):
+    import importlib
+    import sys
+
+    path = tmp_path / "planner.zip"
+    _make_bundle(path, extra={"adapters/legal.lora": b"lora-bytes"})
+    monkeypatch.setenv("EKUPKARAN_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("PLANNER_BUNDLE_PATH", str(path))
+    monkeypatch.setenv("PLANNER_BUNDLE_ALLOW_UNSIGNED", "1")
+    sys.modules.pop("tools.mlx_runtime", None)
+    runtime = importlib.import_module("tools.mlx_runtime")
+    seen = []
+
+    def generate(prompt, **kwargs):
+        seen.append(kwargs.get("adapter"))
+        return "ok"
+
+    runtime.start_warmup()
+    assert runtime._WARMUP.wait("model", 10)
+    monkeypatch.setattr(runtime, "generate", generate)
+    with runtime.app.test_client() as client:
+        assert client.post("/predict", json={"prompt": "hi", "params": {"adapter": "legal"}}).json["text"] == "ok"
+        missing = client.post("/predict", json={"prompt": "hi", "params": {"adapter": "medical"}})
+    assert missing.status_code == 400 and "Unknown adapter" in missing.json["error"]
+    assert len(seen) == 1 and seen[0][:] == b"lora-bytes"
+    runtime.BUNDLE.close()
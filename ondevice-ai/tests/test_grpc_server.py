@@ -1,14 +1,19 @@
+import asyncio
 import json
 import socket
+import threading
 import time
 from typing import Any, cast
 
 import grpc
+import pytest
 
 from core import assistant_pb2 as pb_module
 from core import assistant_pb2_grpc as rpc
+from core import deadline
+from core.model_adapter import ModelBusyError
 from core.orchestrator import Orchestrator
-from core.server import create_server
+from core.server import create_server, rpc_metrics
 from core.vector_store import VectorStore
 
 
@@ -31,7 +36,8 @@ def _free_port() -> int:
         return sock.getsockname()[1]
 
 
-def test_grpc_round_trip(tmp_path):
+def test_grpc_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setenv("ONDEVICE_AUDIT_DIR", str(tmp_path / "logs"))
     port = _free_port()
     orchestrator = Orchestrator(store=VectorStore(path=str(tmp_path / "grpc.db")), model=StubModel())
     server = create_server(host="127.0.0.1", port=port, orchestrator=orchestrator)
@@ -50,5 +56,299 @@ def test_grpc_round_trip(tmp_path):
         plan_resp = stub.Plan(pb.PlanRequest(id="plan", user_id="u", goal="demo goal"))
         assert plan_resp.actions and plan_resp.actions[0].name == "demo"
 
+        again = stub.IndexText(pb.IndexRequest(id="idx2", user_id="u", text="hello", source="test"))
+        assert again.doc_id == index_resp.doc_id
+
+        deleted = stub.DeleteDocuments(pb.DeleteRequest(id="del", user_id="u", source_prefix="te"))
+        assert deleted.deleted == 1 and list(deleted.doc_ids) == [index_resp.doc_id]
+        assert not stub.Query(pb.QueryRequest(id="q2", user_id="u", query="hello", k=3)).hits
+        try:
+            stub.DeleteDocuments(pb.DeleteRequest(id="all", user_id="u"))
+        except grpc.RpcError as exc:
+            assert exc.code() == grpc.StatusCode.INVALID_ARGUMENT
+        else:
+            raise AssertionError("empty delete should be rejected")
+
+    finally:
+        server.stop(grace=0)
+
+
+def test_cli_bulk_ingest_resumes(tmp_path, monkeypatch, capsys):
+    import io
+
+    from cli import index as cli_index
+    from cli.bulk import Record, iter_records
+
+    monkeypatch.setenv("ONDEVICE_AUDIT_DIR", str(tmp_path / "logs"))
+    docs = tmp_path / "docs"
+    (docs / "nested").mkdir(parents=True)
+    for n in range(6):
+        (docs / ("nested" if n % 2 else "") / f"note{n}.md").write_text(f"note number {n}")
+    (docs / "image.png").write_bytes(b"\x89PNG")
+    (docs / "extra.jsonl").write_text('{"text": "from jsonl", "source": "feed"}\nnot json\n')
+    state = tmp_path / "bulk.state"
+
+    port = _free_port()
+    store = VectorStore(path=str(tmp_path / "bulk.db"))
+    server = create_server(host="127.0.0.1", port=port, orchestrator=Orchestrator(store=store, model=StubModel()))
+    server.start()
+    try:
+        base = ["bulk", "--target", f"127.0.0.1:{port}", "--state", str(state), "--in-flight", "3", "--quiet"]
+        # An earlier run that was interrupted after acknowledging one document.
+        first = next(r for r in iter_records([str(docs)]) if isinstance(r, Record))
+        state.write_text(first.key + "\n")
+        try:
+            cli_index.main([*base, str(docs)])
+        except SystemExit as exc:
+            raise AssertionError(f"bulk exited with {exc.code}")
+        summary = json.loads(capsys.readouterr().out)
+        assert summary["indexed"] == 6 and summary["skipped"] == 1 and summary["invalid"] == 1
+        assert summary["failed"] == 0 and not summary["interrupted"]
+        assert store.stats()["documents"] == 6
+
+        cli_index.main([*base, str(docs)])
+        assert json.loads(capsys.readouterr().out)["skipped"] == 7
+
+        monkeypatch.setattr("sys.stdin", io.StringIO('{"text": "piped in"}\n'))
+        cli_index.main([*base, "-"])
+        assert json.loads(capsys.readouterr().out)["indexed"] == 1
+        assert store.find("piped in", "bulk", user_id="cli")
+    finally:
+        server.stop(grace=0)
+        store.close()
+
+
+class _Unavailable(grpc.RpcError, grpc.Call):
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+    def details(self):
+        return "try again"
+
+    def initial_metadata(self):
+        return ()
+
+    def trailing_metadata(self):
+        return ()
+
+    def is_active(self):
+        return False
+
+    def time_remaining(self):
+        return None
+
+    def cancel(self):
+        return False
+
+    def add_callback(self, callback):
+        return False
+
+
+def test_bulk_retries_do_not_block_and_state_is_flushed_as_it_goes(tmp_path, monkeypatch):
+    from concurrent import futures
+
+    from cli import bulk
+    from cli.bulk import Record, State, run_bulk
+
+    sent = []
+
+    class FlakyStub:
+        class IndexText:
+            @staticmethod
+            def future(request, timeout=None):
+                future = futures.Future()
+                if request.text == "r0" and "r0" not in sent:
+                    future.set_exception(_Unavailable())
+                else:
+                    future.set_result(pb.IndexResponse(doc_id=request.text))
+                sent.append(request.text)
+                return future
+
+    class CountingState(State):
+        flushes = 0
+
+        def flush(self):
+            self.flushes += 1
+            super().flush()
+
+    def no_sleep(seconds):
+        raise AssertionError("retries must not sleep on the submitting thread")
+
+    monkeypatch.setattr(bulk.time, "sleep", no_sleep)
+    state = CountingState(str(tmp_path / "bulk.state"))
+    try:
+        records = [Record(text=f"r{n}", source="s", origin=f"r{n}") for n in range(6)]
+        summary = run_bulk(FlakyStub(), records, state, in_flight=2, backoff=0.01, flush_every=2)
+    finally:
+        state.close()
+    assert summary["indexed"] == 6 and summary["retried"] == 1 and summary["failed"] == 0
+    # The other records went out while r0 waited for its retry.
+    assert sent == ["r0", "r1", "r2", "r3", "r4", "r5", "r0"]
+    # Three periodic flushes plus the final one.
+    assert state.flushes == 4
+    assert len((tmp_path / "bulk.state").read_text().split()) == 6
+
+
+class BusyPlanModel(StubModel):
+    async def predict(self, prompt, params=None):
+        if "gamma" in prompt:
+            raise ModelBusyError("queue full")
+        return await super().predict(prompt, params)
+
+
+def test_cli_loadtest_reports_latency(tmp_path, monkeypatch, capsys):
+    from cli import index as cli_index
+
+    monkeypatch.setenv("ONDEVICE_AUDIT_DIR", str(tmp_path / "logs"))
+    corpus = tmp_path / "queries.txt"
+    corpus.write_text("alpha\n\n{\"query\": \"beta\"}\ngamma\n")
+    port = _free_port()
+    store = VectorStore(path=str(tmp_path / "load.db"))
+    server = create_server(host="127.0.0.1", port=port, orchestrator=Orchestrator(store=store, model=BusyPlanModel()))
+    server.start()
+    try:
+        base = ["loadtest", str(corpus), "--target", f"127.0.0.1:{port}", "--mix", "query=2,index=1,plan=1"]
+        cli_index.main([*base, "--concurrency", "3", "--requests", "24"])
+        closed = json.loads(capsys.readouterr().out)
+        assert closed["mode"] == "closed" and closed["requests"] == 24
+        assert closed["errors"] == closed["per_op"]["plan"]["errors"] == {"RESOURCE_EXHAUSTED": closed["error_count"]}
+        assert not closed["per_op"]["query"]["errors"] and not closed["per_op"]["index"]["errors"]
+        assert set(closed["latency_ms"]) >= {"p50", "p90", "p99", "p999"}
+        assert closed["throughput_rps"] > 0 and set(closed["per_op"]) == {"query", "index", "plan"}
+        assert closed["cleaned_up"] == closed["per_op"]["index"]["ok"]
+        assert store.stats()["documents"] == 0
+
+        cli_index.main([*base, "--rate", "200", "--requests", "12"])
+        opened = json.loads(capsys.readouterr().out)
+        assert opened["mode"] == "open" and opened["requests"] == 12
+        assert opened["errors"] == {"RESOURCE_EXHAUSTED": opened["per_op"]["plan"]["errors"]["RESOURCE_EXHAUSTED"]}
+    finally:
+        server.stop(grace=0)
+        store.close()
+
+
+class SlowModel(StubModel):
+    def __init__(self):
+        self.deadlines = []
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+        # Answer like a runtime that ran out of the propagated deadline (504) instead of hanging.
+        self.give_up = False
+
+    async def predict(self, prompt, params=None):
+        self.deadlines.append(deadline.remaining())
+        self.started.set()
+        if self.give_up:
+            raise deadline.DeadlineExceeded("request deadline exceeded")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return "[]"
+
+
+def test_deadline_and_cancel_stop_the_orchestrator(tmp_path, monkeypatch):
+    from core import server as server_module
+
+    monkeypatch.setenv("ONDEVICE_AUDIT_DIR", str(tmp_path / "logs"))
+    abandoned = threading.Event()
+    abandon = server_module._abandon
+
+    def _abandon(*args):
+        try:
+            abandon(*args)
+        finally:
+            abandoned.set()
+
+    monkeypatch.setattr(server_module, "_abandon", _abandon)
+    port = _free_port()
+    model = SlowModel()
+    store = VectorStore(path=str(tmp_path / "deadline.db"))
+    server = create_server(host="127.0.0.1", port=port, orchestrator=Orchestrator(store=store, model=model))
+    server.start()
+    try:
+        stub = rpc.AssistantStub(grpc.insecure_channel(f"127.0.0.1:{port}"))
+        # The call's deadline reaches the model, and the model is stopped when it passes.
+        with pytest.raises(grpc.RpcError) as err:
+            stub.Plan(pb.PlanRequest(id="slow", user_id="u", goal="take your time"), timeout=0.3)
+        assert err.value.code() == grpc.StatusCode.DEADLINE_EXCEEDED
+        assert model.cancelled.wait(5) and abandoned.wait(5)
+        # The server's view of the deadline can be a hair later than the client's, but it is bounded.
+        assert model.deadlines[0] is not None and 0 < model.deadlines[0] < 1
+
+        # A model that gives up on the deadline is reported as DEADLINE_EXCEEDED.
+        before, model.give_up = rpc_metrics(), True
+        abandoned.clear()
+        with pytest.raises(grpc.RpcError) as err:
+            stub.Plan(pb.PlanRequest(id="late", user_id="u", goal="out of time"), timeout=30)
+        assert err.value.code() == grpc.StatusCode.DEADLINE_EXCEEDED and abandoned.wait(5)
+        assert rpc_metrics()["deadline_exceeded"] == before["deadline_exceeded"] + 1
+
+        # A client that goes away is reported as CANCELLED.
+        before, model.give_up = rpc_metrics(), False
+        model.started.clear()
+        model.cancelled.clear()
+        abandoned.clear()
+        call = stub.Plan.future(pb.PlanRequest(id="gone", user_id="u", goal="never mind"))
+        assert model.started.wait(5)
+        call.cancel()
+        assert model.cancelled.wait(5) and abandoned.wait(5)
+        after = rpc_metrics()
+        assert after["cancelled"] == before["cancelled"] + 1
+        assert after["deadline_exceeded"] == before["deadline_exceeded"]
+    finally:
+        server.stop(grace=0)
+        store.close()
+
+
+def test_abandoned_calls_are_coded_by_what_stopped_them():
+    from concurrent import futures
+
+    from core import server as server_module
+    from core.deadline import DeadlineExceeded
+
+    class Context:
+        def abort(self, code, details):
+            raise grpc.RpcError(code)
+
+        def time_remaining(self):
+            return 0.0
+
+    for exc, code in ((futures.TimeoutError(), "DEADLINE_EXCEEDED"), (DeadlineExceeded("runtime"), "DEADLINE_EXCEEDED"),
+                      (futures.CancelledError(), "CANCELLED")):
+        before = rpc_metrics()["by_method"].get("Probe", {}).get(code, 0)
+        try:
+            server_module._abandon(Context(), "Probe", exc)
+        except grpc.RpcError as err:
+            assert err.args[0].name == code
+        assert rpc_metrics()["by_method"]["Probe"][code] == before + 1
+
+
+def test_queries_only_see_the_callers_partition(tmp_path, monkeypatch):
+    monkeypatch.setenv("ONDEVICE_AUDIT_DIR", str(tmp_path / "logs"))
+    port = _free_port()
+    store = VectorStore(path=str(tmp_path / "users.db"), max_docs_per_user=1)
+    server = create_server(host="127.0.0.1", port=port, orchestrator=Orchestrator(store=store, model=StubModel()))
+    server.start()
+    try:
+        stub = rpc.AssistantStub(grpc.insecure_channel(f"127.0.0.1:{port}"))
+        alice = stub.IndexText(pb.IndexRequest(id="a", user_id="alice", text="alice's diary", source="notes")).doc_id
+        bob = stub.IndexText(pb.IndexRequest(id="b", user_id="bob", text="bob's ledger", source="notes")).doc_id
+        hits = stub.Query(pb.QueryRequest(id="q", user_id="alice", query="diary", k=5)).hits
+        assert [h.doc_id for h in hits] == [alice]
+        assert not stub.Query(pb.QueryRequest(id="q2", user_id="mallory", query="diary", k=5)).hits
+
+        gone = stub.DeleteDocuments(pb.DeleteRequest(id="d", user_id="alice", doc_ids=[bob], source_prefix="notes"))
+        assert list(gone.doc_ids) == [alice]
+        assert [h.doc_id for h in stub.Query(pb.QueryRequest(id="q3", user_id="bob", query="x", k=5)).hits] == [bob]
+
+        try:
+            stub.IndexText(pb.IndexRequest(id="b2", user_id="bob", text="second entry", source="notes"))
+        except grpc.RpcError as exc:
+            assert exc.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+        else:
+            raise AssertionError("bob's partition is full")
     finally:
-        server.stop(grace=0)
\ No newline at end of file
+        server.stop(grace=0)
+        store.close()
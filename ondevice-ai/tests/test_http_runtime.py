@@ -45,3 +45,232 @@ def test_index_query_and_persist(tmp_path, monkeypatch):
     # audit log should live inside the data dir
     expected_log = tmp_path / "data" / "logs" / "audit.jsonl"
     assert expected_log.exists()
+
+
+def test_ready_reports_warmup_and_fail_fast_policy(tmp_path, monkeypatch):
+    import threading
+
+    runtime = _load_runtime(tmp_path, monkeypatch)
+    release = threading.Event()
+    monkeypatch.setattr(runtime, "_load_model", lambda: release.wait(5))
+    runtime.configure_warmup(policy="fail")
+    with runtime.app.test_client() as client:
+        assert client.get("/health").status_code == 200
+
+        not_ready = client.get("/ready")
+        assert not_ready.status_code == 503
+        assert not_ready.json["ready"] is False
+        assert set(not_ready.json["stages"]) == {"storage", "documents", "model"}
+
+        rejected = client.post("/embed", json={"texts": ["x"]})
+        assert rejected.status_code == 503
+        assert rejected.headers["Retry-After"] == "1"
+
+        release.set()
+        assert runtime._WARMUP.wait("model", 5)
+        ready = client.get("/ready")
+        assert ready.status_code == 200
+        assert ready.json["stages"]["model"]["state"] == "done"
+        assert client.post("/embed", json={"texts": ["x"]}).status_code == 200
+
+
+def test_store_opens_in_warmup_after_the_server_answers(tmp_path, monkeypatch):
+    import threading
+
+    from core.vector_store import VectorStore
+
+    runtime = _load_runtime(tmp_path, monkeypatch)
+    release = threading.Event()
+    opened = []
+
+    def _open():
+        release.wait(5)
+        opened.append(VectorStore(str(tmp_path / "opened.db")))
+        return opened[0]
+
+    runtime.configure_store_opener(_open)
+    runtime.configure_warmup(policy="fail")
+    runtime.start_warmup()
+    try:
+        with runtime.app.test_client() as client:
+            health = client.get("/health")
+            assert health.status_code == 200
+            assert health.json["documents"] == 0 and health.json["backend"]["storage"] is None
+            not_ready = client.get("/ready")
+            assert not_ready.status_code == 503
+            assert not_ready.json["stages"]["storage"]["state"] == "running"
+
+            release.set()
+            assert runtime._WARMUP.wait("model", 5)
+            assert runtime._store() is opened[0]
+            doc_id = client.post("/index", json={"text": "after the store opened", "source": "test"}).json["id"]
+            assert opened[0].get_document(doc_id)["text"] == "after the store opened"
+    finally:
+        release.set()
+        runtime._WARMUP.wait("model", 5)
+        for store in opened:
+            store.close()
+
+
+def test_runtime_shares_store_with_orchestrator_and_migrates_json(tmp_path, monkeypatch):
+    import asyncio
+    import json
+
+    from core.orchestrator import Orchestrator
+
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "documents.json").write_text(json.dumps({"documents": [
+        {"id": "legacy-1", "source": "api", "ts": 1, "text": "old note", "vector": [1.0] + [0.0] * 255},
+        {"id": "legacy-2", "source": "api", "ts": 2, "text": "note saved before vectors were kept"},
+    ]}))
+    runtime = _load_runtime(tmp_path, monkeypatch)
+
+    class RuntimeEmbedder:
+        async def embed(self, texts):
+            return [runtime.embed_text(t).tolist() for t in texts]
+
+    with runtime.app.test_client() as client:
+        docs = client.get("/documents").json["documents"]
+        assert [d["id"] for d in docs] == ["legacy-2", "legacy-1"]
+        assert (data / "documents.json.migrated").exists() and not (data / "documents.json").exists()
+        # The record without a vector is embedded once the model stage has run.
+        hits = client.post("/query", json={"query": "note saved before vectors were kept", "limit": 1}).json["hits"]
+        assert hits[0]["doc_id"] == "legacy-2" and runtime._store().unembedded() == []
+
+        store = runtime._store()
+        assert store.path == str(data / "store.db")
+        orchestrator = Orchestrator(store=store, model=RuntimeEmbedder())
+        grpc_doc = asyncio.run(orchestrator.index_text("indexed over grpc", source="cli"))
+        hits = client.post("/query", json={"query": "indexed over grpc", "limit": 1}).json["hits"]
+        assert hits[0]["doc_id"] == grpc_doc
+
+        http_doc = client.post("/index", json={"text": "indexed over http", "source": "api"}).json["id"]
+        assert client.post("/index", json={"text": "indexed over http", "source": "api"}).json["id"] == http_doc
+        assert asyncio.run(orchestrator.query("indexed over http", k=1))[0]["doc_id"] == http_doc
+        assert client.get("/health").json["documents"] == 4
+
+
+def _sse_frames(response, stop):
+    """Parse a streaming SSE response into (id, event, data) tuples until ``stop(frames)`` is true."""
+    import json
+
+    frames = []
+    for chunk in response.response:
+        text = chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk
+        if text.startswith(":"):
+            frames.append((None, "ping", None))
+        else:
+            fields = dict(line.split(": ", 1) for line in text.strip().split("\n"))
+            frames.append((int(fields["id"]) if "id" in fields else None, fields["event"], json.loads(fields["data"])))
+        if stop(frames):
+            break
+    response.close()
+    return frames
+
+
+def test_index_endpoint_shares_the_dedup_path(tmp_path, monkeypatch):
+    runtime = _load_runtime(tmp_path, monkeypatch)
+    note = ("Minutes of the planning meeting: the launch moves to May, design owns the onboarding flow, "
+            "support drafts the help articles, and finance reviews the pricing page before the freeze. "
+            "Marketing will brief the regional teams next week and collect their questions in the shared doc. "
+            "Engineering confirmed the migration scripts are ready and the rollback plan has been rehearsed twice.")
+    with runtime.app.test_client() as client:
+        first = client.post("/index", json={"text": note, "source": "notes/1"}).json["id"]
+        assert client.post("/index", json={"text": note, "source": "notes/1"}).json["id"] == first
+        linked = client.post("/index", json={"text": note + " Sent from my phone", "source": "notes/2"}).json["id"]
+    store = runtime._store()
+    # The near-duplicate is stored but shares the first note's embedding.
+    assert linked != first and store.has_embedding(linked)
+    assert [d for _, _, d in store.all_embeddings()] == [first]
+    stats = store.dedup_stats()
+    assert (stats["indexed"], stats["exact"], stats["linked"]) == (3, 1, 1)
+
+
+def test_change_feed_replays_streams_and_resets(tmp_path, monkeypatch):
+    import threading
+
+    runtime = _load_runtime(tmp_path, monkeypatch)
+    monkeypatch.setattr(runtime, "EVENTS_HEARTBEAT", 0.05)
+    monkeypatch.setattr(runtime.events, "FEED", runtime.events.EventFeed(capacity=64))
+    feed = runtime.events.FEED
+
+    with runtime.app.test_client() as client:
+        first = client.post("/index", json={"text": "first note", "source": "test"}).json["id"]
+        client.post("/index", json={"text": "bob's note", "user_id": "bob"})
+        assert client.get("/health").json["documents"] == 2
+        mark = feed.last_seq
+
+        # Replay from 0, then live events; another partition's documents and their audit entries stay invisible.
+        store = runtime._store()
+        timer = threading.Timer(0.2, lambda: (store.upsert("private note", "api", "bob"), store.delete([first])))
+        timer.start()
+        frames = _sse_frames(client.get("/events?since=0", buffered=False),
+                             lambda fs: any(kind == "document.deleted" for _, kind, _ in fs))
+        timer.join()
+        status = frames[0]
+        assert status[1] == "status" and status[2]["documents"] == 1 and status[2]["seq"] == mark
+        events = [(seq, kind, data) for seq, kind, data in frames[1:] if kind != "ping"]
+        seqs = [seq for seq, _, _ in events]
+        assert seqs == sorted(seqs) and all(seq > 0 for seq in seqs)
+        indexed = [data for _, kind, data in events if kind == "document.indexed"]
+        assert [d["id"] for d in indexed] == [first]
+        assert indexed[0]["preview"] == "first note" and "text" not in indexed[0]
+        assert any(kind == "audit" and data["type"] == "document_indexed" for _, kind, data in events)
+        assert events[-1][1] == "document.deleted" and events[-1][2]["ids"] == [first]
+        assert all(data.get("user_id") != "bob" for _, _, data in events)
+        assert [data["id"] for _, kind, data in events if kind == "audit"] == [first]
+        assert client.get("/health").json["documents"] == 2
+
+        # Resuming from the last id sends only what came after it.
+        last = events[-1][0]
+        client.post("/audit", json={"type": "note"})
+        frames = _sse_frames(client.get("/events", headers={"Last-Event-ID": str(last)}, buffered=False),
+                             lambda fs: any(kind == "audit" for _, kind, _ in fs))
+        assert [(kind, data["type"]) for _, kind, data in frames if kind == "audit"] == [("audit", "note")]
+
+        # Events that fell out of the buffer, or a sequence from another run, force a reset.
+        monkeypatch.setattr(runtime.events, "FEED", runtime.events.EventFeed(capacity=2))
+        for n in range(4):
+            runtime.events.publish("audit", {"n": n})
+        for url in ("/events?since=1", "/events?since=4&epoch=stale"):
+            frames = _sse_frames(client.get(url, buffered=False), lambda fs: len(fs) >= 2)
+            assert frames[1][1] == "reset" and frames[1][2]["seq"] == 4
+        frames = _sse_frames(client.get("/events?since=3", buffered=False), lambda fs: len(fs) >= 2)
+        assert frames[1][:2] == (4, "audit")
+
+
+def test_documents_pages_select_fields_and_revalidate(tmp_path, monkeypatch):
+    runtime = _load_runtime(tmp_path, monkeypatch)
+    with runtime.app.test_client() as client:
+        ids = {client.post("/index", json={"text": f"note {n} " + "x" * 300, "source": "test"}).json["id"]
+               for n in range(5)}
+        client.post("/index", json={"text": "someone else's", "user_id": "bob"})
+
+        first = client.get("/documents?limit=2")
+        assert first.status_code == 200 and first.headers["ETag"] and first.headers["Cache-Control"] == "no-cache"
+        assert len(first.json["documents"]) == 2 and first.json["next"]
+        assert set(first.json["documents"][0]) == {"id", "source", "ts", "preview"}
+        assert len(first.json["documents"][0]["preview"]) == runtime.PREVIEW_CHARS
+
+        seen, cursor = [], None
+        while True:
+            page = client.get("/documents", query_string={"limit": 2, "after": cursor or "", "fields": "id"}).json
+            assert all(set(doc) == {"id"} for doc in page["documents"])
+            seen += [doc["id"] for doc in page["documents"]]
+            cursor = page["next"]
+            if not cursor:
+                break
+        assert len(seen) == 5 and set(seen) == ids
+
+        etag = first.headers["ETag"]
+        cached = client.get("/documents?limit=2", headers={"If-None-Match": etag})
+        assert cached.status_code == 304 and cached.headers["ETag"] == etag and not cached.data
+        client.delete(f"/documents/{seen[0]}")
+        fresh = client.get("/documents?limit=2", headers={"If-None-Match": etag})
+        assert fresh.status_code == 200 and fresh.headers["ETag"] != etag
+        assert seen[0] not in {doc["id"] for doc in fresh.json["documents"]}
+
+        assert client.get("/documents?fields=id,secret").status_code == 400
+        assert client.get("/documents?after=garbage").status_code == 400
+        assert client.get("/documents?limit=lots").status_code == 400
@@ -0,0 +1,194 @@
+import importlib
+import sys
+import threading
+
+import pytest
+
+from tools.inference import InferenceScheduler, QueueFull
+
+
+def _load_runtime(tmp_path, monkeypatch):
+    monkeypatch.setenv("EKUPKARAN_DATA_DIR", str(tmp_path / "data"))
+    sys.modules.pop("tools.mlx_runtime", None)
+    return importlib.import_module("tools.mlx_runtime")
+
+
+def test_queue_full_rejects_and_counts():
+    gate = threading.Event()
+    started = threading.Event()
+
+    def runner(prompt, params):
+        started.set()
+        gate.wait(5)
+        return prompt.upper()
+
+    scheduler = InferenceScheduler(runner, slots=1, max_queue=1, max_batch=1)
+    first = scheduler.submit_async("a")
+    assert started.wait(5)
+    second = scheduler.submit_async("b")
+    with pytest.raises(QueueFull):
+        scheduler.submit_async("c")
+
+    gate.set()
+    assert first.result(5) == "A"
+    assert second.result(5) == "B"
+    stats = scheduler.metrics()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["queue_depth"] == 0
+
+
+def test_compatible_requests_are_batched():
+    gate = threading.Event()
+    started = threading.Event()
+    batches = []
+
+    def runner(prompt, params):
+        started.set()
+        gate.wait(5)
+        return prompt
+
+    def batch_runner(prompts, params):
+        batches.append(list(prompts))
+        return [p + "!" for p in prompts]
+
+    scheduler = InferenceScheduler(runner, batch_runner=lambda: batch_runner, slots=1, max_queue=8, max_batch=4)
+    blocker = scheduler.submit_async("block")
+    assert started.wait(5)
+    same = [scheduler.submit_async(p, {"max_tokens": 8}) for p in ("x", "y")]
+    other = scheduler.submit_async("z", {"max_tokens": 16})
+
+    gate.set()
+    assert blocker.result(5) == "block"
+    assert [f.result(5) for f in same] == ["x!", "y!"]
+    assert other.result(5) == "z"
+    assert batches == [["x", "y"]]
+
+
+def test_short_batch_output_fails_every_job():
+    gate = threading.Event()
+    started = threading.Event()
+
+    def runner(prompt, params):
+        started.set()
+        gate.wait(5)
+        return prompt
+
+    scheduler = InferenceScheduler(runner, batch_runner=lambda: (lambda prompts, params: ["only one"]),
+                                   slots=1, max_queue=8, max_batch=4)
+    blocker = scheduler.submit_async("block")
+    assert started.wait(5)
+    batched = [scheduler.submit_async(p, {"max_tokens": 8}) for p in ("x", "y", "z")]
+
+    gate.set()
+    assert blocker.result(5) == "block"
+    for future in batched:
+        with pytest.raises(RuntimeError, match="1 outputs for 3 prompts"):
+            future.result(5)
+
+
+def test_cancelled_jobs_leave_the_queue():
+    gate = threading.Event()
+    started = threading.Event()
+    ran = []
+
+    def runner(prompt, params):
+        ran.append(prompt)
+        started.set()
+        gate.wait(5)
+        return prompt
+
+    scheduler = InferenceScheduler(runner, slots=1, max_queue=1, max_batch=1)
+    blocker = scheduler.submit_async("block")
+    assert started.wait(5)
+    queued = scheduler.submit_async("queued")
+    assert queued.cancel()
+    assert scheduler.metrics()["queue_depth"] == 0
+    # The slot it held is free again, and a closed stream that never started gives its slot back too.
+    stream = scheduler.submit_stream("stream")
+    stream.close()
+    assert scheduler.metrics()["queue_depth"] == 0
+    after = scheduler.submit_async("after")
+    gate.set()
+    assert blocker.result(5) == "block" and after.result(5) == "after"
+    assert ran == ["block", "after"]
+    assert scheduler.metrics()["cancelled"] == 2
+
+
+def test_runtime_answers_429_when_queue_full(tmp_path, monkeypatch):
+    runtime = _load_runtime(tmp_path, monkeypatch)
+
+    def _full(*args, **kwargs):
+        raise QueueFull("inference queue full (0 pending)")
+
+    monkeypatch.setattr(runtime._SCHEDULER, "submit", _full)
+    with runtime.app.test_client() as client:
+        resp = client.post("/predict", json={"prompt": "hi"})
+        assert resp.status_code == 429
+        assert resp.json["error"] == "busy"
+        assert client.post("/plan", json={"goal": "x"}).status_code == 429
+        assert "queue_depth" in client.get("/metrics").json["inference"]
+
+
+def test_runtime_reuses_prefix_state(tmp_path, monkeypatch):
+    runtime = _load_runtime(tmp_path, monkeypatch)
+
+    class PrefillModel:
+        def __init__(self):
+            self.prefills = []
+            self.seen = []
+
+        def prefill(self, prefix):
+            self.prefills.append(prefix)
+            return {"prefix": prefix}
+
+        def generate(self, prompt, **kwargs):
+            self.seen.append(kwargs.get("prompt_cache"))
+            return "[]"
+
+    model = PrefillModel()
+    monkeypatch.setattr(runtime, "MODEL", model)
+    monkeypatch.setattr(runtime, "generate", model.generate)
+    for goal in ("a", "b"):
+        runtime._run_generation("PREFIX:" + goal, {"prefix_chars": 7, "max_tokens": 8})
+
+    assert model.prefills == ["PREFIX:"]
+    assert model.seen == [{"prefix": "PREFIX:"}, {"prefix": "PREFIX:"}]
+    assert runtime._PREFIX_CACHE.stats()["hits"] == 1
+
+
+def test_expired_jobs_are_dropped_and_runtime_answers_504(tmp_path, monkeypatch):
+    gate = threading.Event()
+    started = threading.Event()
+    ran = []
+
+    def runner(prompt, params):
+        ran.append(prompt)
+        started.set()
+        gate.wait(5)
+        return prompt
+
+    scheduler = InferenceScheduler(runner, slots=1, max_queue=4, max_batch=1)
+    blocker = scheduler.submit_async("block")
+    assert started.wait(5)
+    with pytest.raises(TimeoutError):
+        scheduler.submit("late", timeout=0.05)
+    gate.set()
+    assert blocker.result(5) == "block"
+    assert scheduler.submit("next", timeout=5) == "next"
+    assert ran == ["block", "next"]
+    assert scheduler.metrics()["expired"] == 1
+
+    runtime = _load_runtime(tmp_path, monkeypatch)
+    seen = []
+
+    def _slow(prompt, params=None, timeout=None):
+        seen.append(timeout)
+        raise TimeoutError
+
+    monkeypatch.setattr(runtime._SCHEDULER, "submit", _slow)
+    with runtime.app.test_client() as client:
+        resp = client.post("/predict", json={"prompt": "hi"}, headers={"X-Request-Timeout": "0.25"})
+        assert resp.status_code == 504 and resp.json["error"] == "deadline_exceeded"
+        assert client.post("/predict", json={"prompt": "hi"}, headers={"X-Request-Timeout": "0"}).status_code == 504
+    assert seen == [0.25]
@@ -36,3 +36,134 @@ def test_orchestrator_flow(tmp_path):
 
     plan = asyncio.run(orchestrator.plan("test goal"))
     assert isinstance(plan, list) and plan[0]["name"] == "step"
+
+
+class CountingModel(StubModel):
+    def __init__(self):
+        self.calls = []
+
+    async def predict(self, prompt, params=None):
+        self.calls.append((prompt, params))
+        return await super().predict(prompt, params)
+
+
+def test_plan_cache_reuses_near_identical_goals(tmp_path):
+    from core.orchestrator import PLAN_PROMPT_PREFIX
+    from core.plan_cache import PlanCache
+
+    model = CountingModel()
+    orchestrator = Orchestrator(store=VectorStore(path=str(tmp_path / "plan.db")), model=model)
+
+    first = asyncio.run(orchestrator.plan("Organise my notes"))
+    first[0]["name"] = "mutated"
+    second = asyncio.run(orchestrator.plan("  organise   my notes. "))
+    assert second[0]["name"] == "step"
+    assert len(model.calls) == 1
+    assert model.calls[0][1]["prefix_chars"] == len(PLAN_PROMPT_PREFIX)
+    assert model.calls[0][0].startswith(PLAN_PROMPT_PREFIX)
+
+    asyncio.run(orchestrator.plan("organise my notes", params={"max_tokens": 64}))
+    assert len(model.calls) == 2
+
+    expired = Orchestrator(store=orchestrator.store, model=model, plan_cache=PlanCache(ttl_seconds=0))
+    asyncio.run(expired.plan("organise my notes"))
+    asyncio.run(expired.plan("organise my notes"))
+    assert len(model.calls) == 4
+
+
+class EmbedCountingModel(StubModel):
+    def __init__(self):
+        self.embedded = []
+
+    async def embed(self, texts):
+        self.embedded.extend(texts)
+        return await super().embed(texts)
+
+
+MAIL = ("Hi team, the quarterly numbers are in and revenue is up eleven percent over last year. "
+        "Please review the attached deck before Thursday so we can agree the plan for next quarter. "
+        "The biggest changes are in the enterprise segment, where two large renewals closed early, "
+        "and in support costs, which dropped after the new triage rota went live in March. "
+        "Marketing spend came in under budget because the spring event moved online. "
+        "Hiring is still behind plan for engineering; we have four open roles and two offers out. "
+        "I would like each lead to bring one proposal for where the surplus should go, "
+        "with a rough estimate of impact and a named owner. "
+        "If you cannot make Thursday, send your notes to Priya by Wednesday evening. "
+        "Thanks, Dana")
+
+
+def test_near_duplicates_link_to_existing_embedding(tmp_path):
+    model = EmbedCountingModel()
+    orchestrator = Orchestrator(store=VectorStore(path=str(tmp_path / "dedup.db")), model=model)
+
+    original = asyncio.run(orchestrator.index_text(MAIL, source="mail/1"))
+    quoted = asyncio.run(orchestrator.index_text(MAIL + " Sent from my phone", source="mail/2"))
+    assert quoted != original
+    assert asyncio.run(orchestrator.index_text(MAIL, source="mail/1")) == original
+    assert model.embedded == [MAIL]
+    stats = orchestrator.dedup_stats()
+    assert (stats["near"], stats["linked"], stats["exact"]) == (1, 1, 1)
+
+    # Deleting the original hands its embedding to the linked copy.
+    asyncio.run(orchestrator.delete_documents([original]))
+    hits = asyncio.run(orchestrator.query(MAIL, k=3))
+    assert [h["doc_id"] for h in hits] == [quoted]
+
+    dropping = Orchestrator(store=orchestrator.store, model=model, dedup_policy="drop")
+    assert asyncio.run(dropping.index_text(MAIL + " Regards", source="mail/3")) == quoted
+    assert orchestrator.store.stats()["documents"] == 1
+
+
+def test_concurrent_identical_ingests_store_one_document(tmp_path):
+    model = EmbedCountingModel()
+    orchestrator = Orchestrator(store=VectorStore(path=str(tmp_path / "race.db")), model=model)
+
+    def http_ingest():
+        # The runtime's /index goes through the same per-text lock in the store.
+        return orchestrator.store.ingest(MAIL, "mail/1", embed=lambda text: model.embedded.append(text) or [1.0, 0.0, 0.0, 0.0])[0]
+
+    async def scenario():
+        grpc = [orchestrator.index_text(MAIL, source="mail/1") for _ in range(4)]
+        return await asyncio.gather(*grpc, asyncio.to_thread(http_ingest))
+
+    ids = asyncio.run(scenario())
+    assert len(set(ids)) == 1
+    assert orchestrator.store.stats()["documents"] == 1
+    assert model.embedded == [MAIL]
+    assert orchestrator.dedup_stats()["exact"] == 4
+    assert not orchestrator.store._ingesting
+    orchestrator.close()
+    orchestrator.store.close()
+
+
+def test_slow_scan_does_not_block_other_requests(tmp_path):
+    import threading
+
+    store = VectorStore(path=str(tmp_path / "async.db"))
+    orchestrator = Orchestrator(store=store, model=StubModel())
+    entered, release = threading.Event(), threading.Event()
+    search = store.search
+
+    def slow_search(query, k=5, user_id=""):
+        entered.set()
+        release.wait(5)
+        return search(query, k, user_id)
+
+    store.search = slow_search
+
+    async def scenario():
+        pending = asyncio.create_task(orchestrator.query("anything", k=1))
+        while not entered.is_set():
+            await asyncio.sleep(0.01)
+        # The scan holds a worker thread, not the loop.
+        doc_id = await asyncio.wait_for(orchestrator.index_text("indexed while a scan runs"), 5)
+        assert not pending.done()
+        release.set()
+        hits = await pending
+        return doc_id, hits
+
+    doc_id, hits = asyncio.run(scenario())
+    assert hits and hits[0]["doc_id"] == doc_id
+    metrics = orchestrator.astore.metrics()
+    # The ingest (which stores the vector too) and the hit lookup.
+    assert metrics["scan"]["calls"] == 1 and metrics["io"]["calls"] >= 2
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from core.plugin_runtime import PluginRuntime
+from core.plugins import ManifestRegistry
+
+MANIFEST = """id: demo.v1
+name: Demo
+version: 0.1.0
+scopes: [read]
+api: http://127.0.0.1:5100
+signature: ed25519:SIG
+min_core_version: 0.1.0
+capabilities: [{caps}]
+"""
+
+
+def test_registry_reparses_only_when_manifest_changes(tmp_path):
+    path = tmp_path / "plugin-manifest.yaml"
+    path.write_text(MANIFEST.format(caps="notes"))
+    registry = ManifestRegistry()
+
+    first = registry.get(str(path))
+    assert registry.get(str(path)) is first
+    assert registry.loads == 1
+
+    path.write_text(MANIFEST.format(caps="notes, mail"))
+    os.utime(path, ns=(1, 1))
+    runtime = PluginRuntime(manifest_path=str(path), registry=registry)
+    assert runtime.capabilities == {"notes", "mail"}
+    assert registry.loads == 2
+
+    path.write_text("id: broken\n")
+    os.utime(path, ns=(2, 2))
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            registry.get(str(path))
+    assert registry.loads == 3
+    runtime.reload()
+    assert not runtime.enabled
+
+    registry.invalidate(str(path))
+    path.unlink()
+    assert registry.get(str(path)) is None
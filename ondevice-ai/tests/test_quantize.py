@@ -0,0 +1,86 @@
+import json
+import zipfile
+
+import numpy as np
+
+from core.bundle import verify_bundle
+from tools import quantize
+
+
+def _bundle(tmp_path):
+    rng = np.random.default_rng(0)
+    tensors = {
+        "embed_tokens.weight": rng.standard_normal((512, 64)).astype(np.float32),
+        "layers.0.proj.weight": rng.standard_normal((96, 64)).astype(np.float32),
+        "layers.0.norm.weight": np.ones(64, dtype=np.float32),
+    }
+    quantize.write_safetensors(str(tmp_path / "model.mlxq"), tensors)
+    path = tmp_path / "src.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.write(tmp_path / "model.mlxq", "model.mlxq")
+        zf.writestr("tokenizer.json", "{}")
+        zf.writestr("manifest.json", json.dumps({"version": "1", "sha256": {}, "ed25519_signature": ""}))
+    return path, tensors
+
+
+def test_schemes_round_trip_within_tolerance():
+    w = np.random.default_rng(1).standard_normal((32, 100)).astype(np.float32)
+    int8 = quantize.dequantize_int8(quantize.quantize_int8(w), list(w.shape))
+    assert np.abs(int8 - w).max() <= np.abs(w).max(axis=1).max() / 127.0
+    q4 = quantize.dequantize_q4(quantize.quantize_q4(w, 32), list(w.shape), 32)
+    assert q4.shape == w.shape
+    assert np.abs(q4 - w).max() < 0.5
+
+
+def test_quantized_bundle_reports_and_verifies(tmp_path):
+    src, tensors = _bundle(tmp_path)
+    out = tmp_path / "out"
+    report = quantize.quantize_bundle(src, out, scheme="q4", group_size=32)
+    assert set(report["tensors"]) == {"embed_tokens.weight", "layers.0.proj.weight"}
+    assert report["size_ratio"] < 0.25
+    assert report["tensors"]["embed_tokens.weight"]["kind"] == "embedding"
+    assert report["cosine_min"] > 0.95
+
+    loaded, meta = quantize.read_safetensors((out / "model.mlxq").read_bytes())
+    restored = quantize.dequantize(loaded, meta)
+    assert np.array_equal(restored["layers.0.norm.weight"], tensors["layers.0.norm.weight"])
+
+    quantize.pack(out, tmp_path / "q.zip")
+    result = verify_bundle(str(tmp_path / "q.zip"), allow_unsigned=True)
+    assert result.ok and set(result.digests) == {"model.mlxq", "tokenizer.json"}
+
+
+
+def test_unreadable_input_raises_and_the_cli_exits_with_2(tmp_path, monkeypatch, capsys):
+    import sys
+
+    import pytest
+
+    monkeypatch.setitem(sys.modules, "onnx", None)
+    with pytest.raises(ImportError, match="onnx required"):
+        quantize.load_weights("model.onnx", b"")
+
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    (empty / "tokenizer.json").write_text("{}")
+    with pytest.raises(FileNotFoundError):
+        quantize.quantize_bundle(empty, tmp_path / "out")
+    monkeypatch.setattr(sys, "argv", ["quantize", "quantize", str(empty), str(tmp_path / "out")])
+    with pytest.raises(SystemExit) as exited:
+        quantize.main()
+    assert exited.value.code == 2 and "No model weights" in capsys.readouterr().err
+
+
+def test_bundle_members_cannot_escape_the_output_directory(tmp_path):
+    import pytest
+
+    src, _ = _bundle(tmp_path)
+    for name in ("../escape.txt", "/abs/escape.txt", "adapters/../../escape.txt"):
+        evil = tmp_path / "evil.zip"
+        with zipfile.ZipFile(src) as zf, zipfile.ZipFile(evil, "w") as out:
+            for info in zf.infolist():
+                out.writestr(info, zf.read(info))
+            out.writestr(name, b"owned")
+        with pytest.raises(ValueError, match="Unsafe member name"):
+            quantize.quantize_bundle(evil, tmp_path / "out" / "nested")
+        assert not (tmp_path / "escape.txt").exists() and not (tmp_path / "out" / "escape.txt").exists()
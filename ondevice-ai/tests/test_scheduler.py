@@ -0,0 +1,118 @@
+import asyncio
+import selectors
+
+import pytest
+
+from core.scheduler import Scheduler
+
+
+class _InstantSelector(selectors.DefaultSelector):
+    """Never blocks: a wait for the next timer moves the clock forward instead."""
+
+    def __init__(self):
+        super().__init__()
+        self.clock = 0.0
+
+    def select(self, timeout=None):
+        ready = super().select(0)
+        if not ready and timeout:
+            self.clock += timeout
+        return ready
+
+
+class _VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop on a virtual clock, so timings in these tests are exact and take no real time."""
+
+    def __init__(self):
+        super().__init__(_InstantSelector())
+
+    def time(self):
+        return self._selector.clock
+
+
+def _run(coro):
+    loop = _VirtualClockLoop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class _BusyMeter:
+    def rate(self):
+        return 10.0
+
+
+def test_failing_job_keeps_its_schedule():
+    calls = []
+
+    async def flaky():
+        calls.append(asyncio.get_running_loop().time())
+        raise RuntimeError("boom")
+
+    async def scenario():
+        sched = Scheduler()
+        sched.add_interval_job("flaky", flaky, 0.02)
+        await asyncio.sleep(0.15)
+        stats = sched.metrics()["jobs"]["flaky"]
+        sched.cancel_all()
+        return stats
+
+    stats = _run(scenario())
+    # Due at 0, 0.02, ... 0.14.
+    assert calls == pytest.approx([0.02 * n for n in range(8)])
+    assert stats["failures"] == stats["runs"] == 8
+    assert stats["last_error"] == "RuntimeError: boom"
+
+
+def test_priority_wins_contended_slot_and_overruns_are_skipped():
+    order = []
+
+    async def blocker():
+        order.append("blocker")
+        await asyncio.sleep(0.1)
+
+    def recorder(name):
+        async def job():
+            order.append(name)
+        return job
+
+    async def scenario():
+        sched = Scheduler(max_parallel=1)
+        sched.add_interval_job("blocker", blocker, 0.03)
+        await asyncio.sleep(0.01)
+        sched.add_interval_job("low", recorder("low"), 10, priority=0)
+        sched.add_interval_job("high", recorder("high"), 10, priority=5)
+        await asyncio.sleep(0.15)
+        stats = sched.metrics()["jobs"]
+        sched.cancel_all()
+        return stats
+
+    stats = _run(scenario())
+    # Both wait from 0.01 for the blocker's slot; it frees at 0.1 and the higher priority goes first.
+    assert order == ["blocker", "high", "low", "blocker"]
+    assert stats["high"]["last_lag_ms"] == pytest.approx(90.0)
+    # The blocker's 0.03, 0.06 and 0.09 ticks fell inside its own 0.1 s run; it next runs at 0.12.
+    assert stats["blocker"]["missed"] == 3
+
+
+def test_idle_job_waits_for_quiet_until_max_delay():
+    ran = []
+
+    async def job():
+        ran.append(asyncio.get_running_loop().time())
+
+    async def scenario():
+        sched = Scheduler(meter=_BusyMeter(), idle_rps=5.0, idle_poll=0.01)
+        sched.add_interval_job("idle", job, 10, when_idle=True, max_delay=0.1)
+        await asyncio.sleep(0.05)
+        assert not ran
+        await asyncio.sleep(0.1)
+        stats = sched.metrics()["jobs"]["idle"]
+        sched.cancel_all()
+        return stats
+
+    stats = _run(scenario())
+    # The load never drops, so the job runs on the first idle check past max_delay.
+    assert len(ran) == 1 and 0.1 <= ran[0] < 0.1 + 0.011
+    assert stats["idle_waits"] == 1
@@ -0,0 +1,132 @@
+import asyncio
+import importlib
+import json
+import socket
+import sys
+from typing import Any, cast
+
+import grpc
+
+from core import assistant_pb2 as pb_module
+from core import assistant_pb2_grpc as rpc
+from core.action_stream import ActionStreamParser
+from core.orchestrator import Orchestrator
+from core.server import create_server
+from core.vector_store import VectorStore
+
+
+pb = cast(Any, pb_module)
+
+PLAN = json.dumps([
+    {"name": "first", "payload": "{\"text\": \"a } tricky \\\" value\"}", "sensitive": False, "preview_required": False},
+    {"name": "second", "payload": "{}", "sensitive": True, "preview_required": False},
+])
+
+
+class StreamingModel:
+    def __init__(self):
+        self.consumed = 0
+
+    async def embed(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    async def predict(self, prompt, params=None):
+        return PLAN
+
+    async def predict_stream(self, prompt, params=None):
+        for start in range(0, len(PLAN), 7):
+            self.consumed = start
+            yield PLAN[start:start + 7]
+
+
+def test_parser_emits_actions_across_chunk_boundaries():
+    parser = ActionStreamParser()
+    seen = []
+    for i, ch in enumerate(PLAN):
+        seen.extend((i, action["name"]) for action in parser.feed(ch))
+    assert [name for _, name in seen] == ["first", "second"]
+    # The first action is available well before the text is complete.
+    assert seen[0][0] < PLAN.index('"second"')
+    assert parser.text == PLAN
+
+
+def test_orchestrator_plan_stream_yields_before_generation_finishes(tmp_path):
+    model = StreamingModel()
+    orchestrator = Orchestrator(store=VectorStore(path=str(tmp_path / "s.db")), model=model)
+
+    async def _first():
+        agen = orchestrator.plan_stream("goal")
+        first = await agen.__anext__()
+        progress = model.consumed
+        rest = [action async for action in agen]
+        return first, progress, rest
+
+    first, progress, rest = asyncio.run(_first())
+    assert first["name"] == "first"
+    assert progress < PLAN.index('"second"')
+    assert [a["name"] for a in rest] == ["second"]
+    # A completed stream populates the plan cache for the unary path.
+    assert asyncio.run(orchestrator.plan("goal"))[1]["name"] == "second"
+
+
+def test_grpc_plan_stream(tmp_path):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    orchestrator = Orchestrator(store=VectorStore(path=str(tmp_path / "g.db")), model=StreamingModel())
+    server = create_server(host="127.0.0.1", port=port, orchestrator=orchestrator)
+    server.start()
+    try:
+        stub = rpc.AssistantStub(grpc.insecure_channel(f"127.0.0.1:{port}"))
+        actions = list(stub.PlanStream(pb.PlanRequest(id="p", user_id="u", goal="demo")))
+        assert [a.name for a in actions] == ["first", "second"]
+        assert actions[1].sensitive is True
+    finally:
+        server.stop(grace=0)
+
+
+def test_runtime_streams_plan_and_tokens(tmp_path, monkeypatch):
+    monkeypatch.setenv("EKUPKARAN_DATA_DIR", str(tmp_path / "data"))
+    sys.modules.pop("tools.mlx_runtime", None)
+    runtime = importlib.import_module("tools.mlx_runtime")
+    with runtime.app.test_client() as client:
+        resp = client.post("/plan", json={"goal": "Write notes. Send them", "stream": True})
+        assert resp.status_code == 200
+        assert resp.mimetype == "text/event-stream"
+        events = [block for block in resp.get_data(as_text=True).split("\n\n") if block]
+        assert events[-1].startswith("event: done")
+        actions = [json.loads(e.split("data: ", 1)[1]) for e in events if e.startswith("event: action")]
+        assert actions and actions[0]["index"] == 0 and actions[0]["action"]["name"]
+
+        tokens = client.post("/predict", json={"prompt": "hello world. again", "stream": True})
+        text = "".join(
+            json.loads(block.split("data: ", 1)[1])["text"]
+            for block in tokens.get_data(as_text=True).split("\n\n")
+            if block.startswith("event: token")
+        )
+        assert text == runtime.generate("hello world. again")
+
+
+def test_runtime_plan_stream_reports_generation_failures(tmp_path, monkeypatch):
+    monkeypatch.setenv("EKUPKARAN_DATA_DIR", str(tmp_path / "data"))
+    sys.modules.pop("tools.mlx_runtime", None)
+    runtime = importlib.import_module("tools.mlx_runtime")
+
+    def failing(prompt, params=None, timeout=None):
+        yield "["
+        raise RuntimeError("model crashed")
+
+    def empty(prompt, params=None, timeout=None):
+        return iter(())
+
+    with runtime.app.test_client() as client:
+        monkeypatch.setattr(runtime._SCHEDULER, "submit_stream", failing)
+        events = client.post("/plan", json={"goal": "Write notes", "stream": True}).get_data(as_text=True)
+        assert "event: action" not in events and "event: done" not in events
+        error = [e for e in events.split("\n\n") if e.startswith("event: error")]
+        assert json.loads(error[0].split("data: ", 1)[1]) == {"error": "model crashed"}
+
+        # A generation that succeeds without any action still gets the default plan.
+        monkeypatch.setattr(runtime._SCHEDULER, "submit_stream", empty)
+        events = client.post("/plan", json={"goal": "Write notes", "stream": True}).get_data(as_text=True)
+        assert "event: action" in events and "event: done" in events
@@ -0,0 +1,75 @@
+import importlib
+import json
+import sys
+
+from core import tracing
+from core.orchestrator import Orchestrator
+from core.server import AssistantServicer
+from core.vector_store import VectorStore
+from core import assistant_pb2 as pb
+
+
+class StubModel:
+    async def embed(self, texts):
+        return [[1.0, 0.0, 0.5] for _ in texts]
+
+    async def predict(self, prompt, params=None):
+        return "[]"
+
+
+def _spans(path):
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+
+def test_spans_propagate_from_servicer_to_store(tmp_path):
+    trace_log = tmp_path / "traces.jsonl"
+    tracing.configure(sample_rate=1.0, path=str(trace_log))
+    try:
+        orchestrator = Orchestrator(store=VectorStore(path=str(tmp_path / "t.db")), model=StubModel())
+        servicer = AssistantServicer(orchestrator=orchestrator)
+        servicer.IndexText(pb.IndexRequest(id="i", user_id="u", text="hello", source="t"), None)
+        servicer.Query(pb.QueryRequest(id="q", user_id="u", query="hello", k=1), None)
+    finally:
+        tracing.configure(sample_rate=0.0)
+
+    spans = _spans(trace_log)
+    by_id = {s["span_id"]: s for s in spans}
+    root = next(s for s in spans if s["name"] == "rpc.Query")
+    assert root["parent_id"] is None
+    query = next(s for s in spans if s["name"] == "orchestrator.query")
+    assert query["parent_id"] == root["span_id"]
+    for name in ("orchestrator.score", "orchestrator.hydrate"):
+        child = next(s for s in spans if s["name"] == name and s["trace_id"] == root["trace_id"])
+        assert by_id[child["parent_id"]]["name"] == "orchestrator.query"
+    search = next(s for s in spans if s["name"] == "store.search")
+    assert by_id[search["parent_id"]]["name"] == "orchestrator.score"
+    # Store calls run on AsyncVectorStore's worker threads but keep their parent.
+    get_docs = next(s for s in spans if s["name"] == "store.get_documents")
+    assert by_id[get_docs["parent_id"]]["name"] == "orchestrator.hydrate"
+
+
+def test_unsampled_writes_nothing(tmp_path):
+    trace_log = tmp_path / "traces.jsonl"
+    tracing.configure(sample_rate=0.0, path=str(trace_log))
+    with tracing.span("outer"):
+        with tracing.span("inner"):
+            pass
+    assert not trace_log.exists()
+
+
+def test_runtime_joins_trace_from_header(tmp_path, monkeypatch):
+    monkeypatch.setenv("EKUPKARAN_DATA_DIR", str(tmp_path / "data"))
+    sys.modules.pop("tools.mlx_runtime", None)
+    runtime = importlib.import_module("tools.mlx_runtime")
+    trace_log = tmp_path / "traces.jsonl"
+    tracing.configure(sample_rate=0.0, path=str(trace_log))
+    headers = {"traceparent": "00-" + "a" * 32 + "-" + "b" * 16 + "-01"}
+    with runtime.app.test_client() as client:
+        assert client.post("/embed", json={"texts": ["x"]}, headers=headers).status_code == 200
+
+    spans = _spans(trace_log)
+    http_span = next(s for s in spans if s["name"] == "http POST /embed")
+    assert http_span["trace_id"] == "a" * 32
+    assert http_span["parent_id"] == "b" * 16
+    embed_span = next(s for s in spans if s["name"] == "runtime.embed")
+    assert embed_span["parent_id"] == http_span["span_id"]
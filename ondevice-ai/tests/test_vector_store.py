@@ -1,5 +1,6 @@
 # tests/test_vector_store.py
 import numpy as np
+import pytest
 from core.vector_store import VectorStore
 
 def test_vector_store_insert_and_fetch(tmp_path):
@@ -14,3 +15,481 @@ def test_vector_store_insert_and_fetch(tmp_path):
     assert did == doc_id
     assert np.allclose(arr, vec)
     assert vs.get_doc(doc_id) == "hello world"
+
+
+def test_sharded_search_matches_local_scan(tmp_path):
+    rng = np.random.default_rng(3)
+    vecs = rng.standard_normal((300, 16)).astype(np.float32)
+    local = VectorStore(path=str(tmp_path / "local.db"), shards=0)
+    sharded = VectorStore(path=str(tmp_path / "sharded.db"), shards=2)
+    for i, vec in enumerate(vecs[:200]):
+        for store in (local, sharded):
+            store.insert_embedding(f"doc-{i}", vec)
+    query = rng.standard_normal(16).astype(np.float32)
+    try:
+        assert [d for _, d in sharded.search(query, 5)] == [d for _, d in local.search(query, 5)]
+        # Rows added after the index is built land in the workers' shared memory.
+        for i, vec in enumerate(vecs[200:], start=200):
+            for store in (local, sharded):
+                store.insert_embedding(f"doc-{i}", vec)
+        expected = local.search(query, 10)
+        got = sharded.search(query, 10)
+        assert [d for _, d in got] == [d for _, d in expected]
+        assert np.allclose([s for s, _ in got], [s for s, _ in expected], atol=1e-5)
+        index = sharded._vector_index()
+        assert sorted(index.shard_sizes) == [150, 150]
+        index.rebalance(3)
+        assert sorted(index.shard_sizes) == [100, 100, 100]
+        assert [d for _, d in sharded.search(query, 10)] == [d for _, d in expected]
+    finally:
+        local.close()
+        sharded.close()
+
+
+def test_sharded_index_grows_without_blocking_add():
+    from core.shards import ShardedIndex
+
+    rng = np.random.default_rng(5)
+    vecs = rng.standard_normal((12, 8)).astype(np.float32)
+    ids = [f"doc-{i}" for i in range(12)]
+    index = ShardedIndex(shards=1, max_shards=2, rows_per_shard=8)
+    try:
+        index.add(ids, vecs)
+        # The old worker answers while the second one starts.
+        assert [d for _, d in index.search(vecs[3], 1)] == ["doc-3"]
+        index.wait_for_rebalance(30)
+        assert sorted(index.shard_sizes) == [6, 6] and index.rebalances == 1
+        assert [d for _, d in index.search(vecs[7], 1)] == ["doc-7"]
+    finally:
+        index.close()
+
+
+def test_dead_shard_worker_degrades_the_search_and_is_replaced():
+    from core.shards import ShardError, ShardedIndex, shard_metrics
+
+    rng = np.random.default_rng(6)
+    vecs = rng.standard_normal((10, 8)).astype(np.float32)
+    index = ShardedIndex(shards=2, timeout=5)
+    try:
+        index.add([f"doc-{i}" for i in range(10)], vecs)
+        before = shard_metrics()
+        survivor = {doc_id for doc_id in index._shards[1].ids if doc_id is not None}
+        worker = index._shards[0].process
+        worker.kill()
+        worker.join(5)
+        # The healthy shard still answers; the dead worker's rows are missing from this one search.
+        assert {d for _, d in index.search(vecs[0], 10)} == survivor
+        after = shard_metrics()
+        assert after["degraded_searches"] - before["degraded_searches"] == 1
+        assert after["failed_shards"] - before["failed_shards"] == 1
+        assert index._shards[0].process.is_alive()
+        assert {d for _, d in index.search(vecs[4], 10)} == {f"doc-{i}" for i in range(10)}
+
+        for shard in index._shards:
+            shard.process.kill()
+            shard.process.join(5)
+        with pytest.raises(ShardError):
+            index.search(vecs[0], 3)
+    finally:
+        index.close()
+
+
+def test_upsert_delete_and_compact(tmp_path):
+    vs = VectorStore(path=str(tmp_path / "dedup.db"))
+    first, created = vs.upsert("same text", source="notes/a")
+    again, created_again = vs.upsert("same text", source="notes/a")
+    other, _ = vs.upsert("same text", source="mail")
+    assert created and not created_again and again == first and other != first
+    for i, doc_id in enumerate((first, other)):
+        vs.insert_embedding(doc_id, np.eye(4, dtype=np.float32)[i])
+    kept, _ = vs.upsert("kept", source="notes_b")
+    vs.insert_embedding(kept, np.ones(4, dtype=np.float32))
+
+    assert len(vs.search(np.ones(4), k=10)) == 3
+    # "_" in the prefix is literal, so notes_b survives.
+    assert vs.delete(source_prefix="notes/") == [first]
+    assert vs.delete(ids=[other, "missing"]) == [other]
+    assert [d for _, d in vs.search(np.ones(4), k=10)] == [kept]
+    assert vs.stats() == {"documents": 1, "embeddings": 1, "linked": 0, "tombstones": 2, "partitions": 1,
+                          "partitions_loaded": 1}
+
+    assert vs.compact() == {"index_rows": 2, "vacuumed": 1}
+    assert vs.stats()["tombstones"] == 0
+    assert [d for _, d in vs.search(np.ones(4), k=10)] == [kept]
+
+
+def test_reduced_dimension_search_reranks_on_full_vectors(tmp_path):
+    from core.projection import fit, recall_report
+
+    rng = np.random.default_rng(5)
+    basis = rng.standard_normal((8, 64)).astype(np.float32)
+    vecs = rng.standard_normal((400, 8)).astype(np.float32) @ basis
+    vecs += 0.05 * rng.standard_normal(vecs.shape).astype(np.float32)
+    dbp = str(tmp_path / "reduced.db")
+    exact = VectorStore(path=dbp)
+    for i, vec in enumerate(vecs):
+        exact.insert_embedding(f"doc-{i}", vec)
+    query = vecs[7] + 0.1 * rng.standard_normal(64).astype(np.float32)
+    expected = exact.search(query, 5)
+
+    projection = fit(vecs, 8)
+    assert projection.explained > 0.95
+    projection.save(dbp + ".proj.npz")
+    reduced = VectorStore(path=dbp)
+    try:
+        assert reduced.projection is not None and reduced.projection.dim_out == 8
+        got = reduced.search(query, 5)
+        assert [d for _, d in got] == [d for _, d in expected]
+        # Scores come from the full-dimension re-rank, not the projected scan.
+        assert np.allclose([s for s, _ in got], [s for s, _ in expected], atol=1e-5)
+        reduced.delete([expected[0][1]])
+        assert expected[0][1] not in [d for _, d in reduced.search(query, 5)]
+
+        reduced.set_projection(fit(vecs, 16, kind="prefix"))
+        assert [d for _, d in reduced.search(query, 4)] == [d for _, d in expected[1:]]
+        with pytest.raises(ValueError):
+            reduced.set_projection(fit(vecs[:, :32], 8))
+    finally:
+        exact.close()
+        reduced.close()
+
+    # With sharded candidates the re-rank reads the full vectors from SQLite.
+    sharded = VectorStore(path=dbp, shards=2)
+    try:
+        got = sharded.search(query, 4)
+        assert [d for _, d in got] == [d for _, d in expected[1:]]
+        assert np.allclose([s for s, _ in got], [s for s, _ in expected[1:]], atol=1e-5)
+    finally:
+        sharded.close()
+
+    report = recall_report(vecs, projection, k=10, oversample=4, queries=50)
+    assert report["recall"] >= 0.95 and report["recall"] >= report["candidate_recall"]
+
+
+def test_import_sqlite_keeps_ids_and_vectors(tmp_path):
+    old = VectorStore(path=str(tmp_path / "old.db"))
+    doc_id = old.add("from the old store", source="cli")
+    old.insert_embedding(doc_id, np.ones(4, dtype=np.float32))
+    old.close()
+    vs = VectorStore(path=str(tmp_path / "new.db"))
+    assert vs.import_sqlite(str(tmp_path / "old.db")) == 1
+    assert vs.import_sqlite(str(tmp_path / "old.db")) == 0
+    assert vs.get_document(doc_id)["text"] == "from the old store"
+    assert vs.find("from the old store", "cli") == doc_id
+    assert vs.search(np.ones(4), k=1)[0][1] == doc_id
+    vs.close()
+
+
+def test_snapshot_restore_maps_vectors(tmp_path):
+    from core.snapshot import SnapshotError
+
+    rng = np.random.default_rng(11)
+    src = VectorStore(path=str(tmp_path / "src.db"))
+    dst = VectorStore(path=str(tmp_path / "dst.db"))
+    other = VectorStore(path=str(tmp_path / "other.db"))
+    try:
+        ids = [src.add(f"snapshot document number {i} with enough words", source="notes") for i in range(40)]
+        for doc_id in ids:
+            src.insert_embedding(doc_id, 3.0 * rng.standard_normal(12).astype(np.float32))
+        query = rng.standard_normal(12).astype(np.float32)
+        expected = src.search(query, 5)
+        snap = str(tmp_path / "corpus.snap")
+        header = src.snapshot(snap)
+        assert header["rows"] == 40 and header["docs"] == 40
+
+        assert dst.restore(snap)["documents"] == 40
+        assert [d for _, d in dst.search(query, 5)] == [d for _, d in expected]
+        # The index serves the snapshot's vector block instead of a copy rebuilt from SQLite.
+        assert dst.partition_stats()["mapped"]
+        assert dst.find("snapshot document number 3 with enough words", "notes") == ids[3]
+        restored = {d: v for _, v, d in dst.all_embeddings()}
+        assert all(np.allclose(restored[d], v, atol=1e-5) for _, v, d in src.all_embeddings())
+        with pytest.raises(ValueError):
+            dst.restore(snap)
+        # After the first vector write the mapped block is stale, so the next rebuild reads SQLite.
+        dst.delete([ids[0]])
+        dst.set_projection(None)
+        assert ids[0] not in [d for _, d in dst.search(query, 5)]
+        assert not dst.partition_stats()["mapped"]
+
+        with open(snap, "r+b") as f:
+            f.seek(100)
+            f.write(b"\xff\xff\xff\xff")
+        with pytest.raises(SnapshotError):
+            other.restore(snap)
+    finally:
+        src.close()
+        dst.close()
+        other.close()
+
+
+def test_restore_serves_searches_before_vector_rows_are_copied(tmp_path, monkeypatch):
+    import threading
+
+    rng = np.random.default_rng(12)
+    src = VectorStore(path=str(tmp_path / "src.db"))
+    try:
+        ids = [src.add(f"restored lazily {i}", source="notes") for i in range(20)]
+        for doc_id in ids:
+            src.insert_embedding(doc_id, rng.standard_normal(8).astype(np.float32))
+        query = rng.standard_normal(8).astype(np.float32)
+        expected = src.search(query, 3)
+        vectors = {d: v for _, v, d in src.all_embeddings()}
+        snap = str(tmp_path / "lazy.snap")
+        src.snapshot(snap)
+    finally:
+        src.close()
+
+    release = threading.Event()
+    stalled = []
+    copy = VectorStore._copy_vectors
+
+    def held_copy(self, snapshot):
+        if not release.wait(10):
+            stalled.append(True)
+        return copy(self, snapshot)
+
+    monkeypatch.setattr(VectorStore, "_copy_vectors", held_copy)
+    dst = VectorStore(path=str(tmp_path / "dst.db"))
+    try:
+        dst.restore(snap)
+        # No vector row is in SQLite yet, and search already answers from the mapped block.
+        assert [d for _, d in dst.search(query, 3)] == [d for _, d in expected]
+        assert dst.stats()["embeddings"] == 20
+        release.set()
+        restored = {d: v for _, v, d in dst.all_embeddings()}
+        assert restored.keys() == vectors.keys()
+        assert all(np.allclose(restored[d], vectors[d], atol=1e-5) for d in vectors)
+        # Nothing before the release waited for the copy.
+        assert not stalled
+    finally:
+        release.set()
+        dst.close()
+
+    # A process that stops before the copy finishes resumes it on the next start.
+    monkeypatch.setattr(VectorStore, "_copy_vectors", lambda self, snapshot: False)
+    again = VectorStore(path=str(tmp_path / "again.db"))
+    try:
+        again.restore(snap)
+    finally:
+        again.close()
+    monkeypatch.setattr(VectorStore, "_copy_vectors", copy)
+    again = VectorStore(path=str(tmp_path / "again.db"))
+    try:
+        assert len(again.all_embeddings()) == 20
+        assert [d for _, d in again.search(query, 3)] == [d for _, d in expected]
+    finally:
+        again.close()
+
+
+def test_concurrent_reads_and_batched_writes(tmp_path):
+    import sqlite3
+    import threading
+
+    import pytest
+
+    vs = VectorStore(path=str(tmp_path / "pool.db"))
+    errors = []
+
+    def write(n):
+        try:
+            for i in range(25):
+                vs.insert_embedding(vs.add(f"writer {n} doc {i}", source=f"w{n}"), np.ones(4, dtype=np.float32))
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    def read():
+        try:
+            for _ in range(50):
+                vs.stats()
+                vs.find("writer 0 doc 0", "w0")
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)] + [threading.Thread(target=read) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert vs.stats()["documents"] == 100 and vs.stats()["embeddings"] == 100
+
+    # Jobs queued behind a busy writer share one transaction; a failing job rolls back alone.
+    gate, started = threading.Event(), threading.Event()
+    blocker = vs._writer.submit(lambda cur: (started.set(), gate.wait(5)))
+    assert started.wait(5)
+    before = vs.io_metrics()["writer"]["batches"]
+    ok = vs._writer.submit(lambda cur: cur.execute("INSERT INTO meta(key,value) VALUES('a','1')"))
+    bad = vs._writer.submit(lambda cur: cur.execute("INSERT INTO missing VALUES (1)"))
+    ok2 = vs._writer.submit(lambda cur: cur.execute("INSERT INTO meta(key,value) VALUES('b','2')"))
+    gate.set()
+    blocker.result(5)
+    ok.result(5), ok2.result(5)
+    with pytest.raises(sqlite3.OperationalError):
+        bad.result(5)
+    # One commit for the blocker's batch, one for the three queued behind it.
+    assert vs.io_metrics()["writer"]["batches"] - before == 2
+    assert vs._meta("a") == "1" and vs._meta("b") == "2"
+    vs.close()
+
+
+def test_partitions_keep_users_apart(tmp_path):
+    from core.near_dup import simhash
+    from core.vector_store import QuotaExceeded
+
+    vs = VectorStore(path=str(tmp_path / "parts.db"), max_partitions=2, max_docs_per_user=3)
+    vec = np.ones(4, dtype=np.float32)
+    text = "notes from the shared planning meeting on tuesday"
+    ids = {}
+    for user in ("alice", "bob", "carol"):
+        ids[user] = vs.add(text, source="notes", simhash=simhash(text), user_id=user)
+        vs.insert_embedding(ids[user], vec)
+    try:
+        assert len(set(ids.values())) == 3 and vs.find(text, "notes", "bob") == ids["bob"]
+        for user, doc_id in ids.items():
+            assert [d for _, d in vs.search(vec, k=10, user_id=user)] == [doc_id]
+        assert vs.search(vec, k=10) == []
+        # Only the two most recently searched partitions keep an index in memory.
+        assert vs.stats()["partitions"] == 3 and vs.stats()["partitions_loaded"] == 2
+        assert not vs.partition_stats("alice")["loaded"] and vs.partition_stats("carol")["embeddings"] == 1
+        # Near-duplicates only link within a partition.
+        assert vs.near_duplicate(simhash(text), user_id="dave") is None
+        assert vs.near_duplicate(simhash(text), user_id="alice") == ids["alice"]
+
+        assert vs.delete([ids["alice"]], user_id="bob") == []
+        assert [d["id"] for d in vs.list_documents("alice")] == [ids["alice"]]
+        assert vs.get_document(ids["alice"], user_id="bob") is None
+
+        for n in range(2):
+            vs.add(f"more {n}", user_id="bob")
+        with pytest.raises(QuotaExceeded):
+            vs.add("one too many", user_id="bob")
+        vs.add("alice still has room", user_id="alice")
+    finally:
+        vs.close()
+
+
+def test_index_builds_outside_the_lock_and_eviction_waits_for_searches(tmp_path):
+    import threading
+
+    vs = VectorStore(path=str(tmp_path / "leases.db"), max_partitions=1)
+    ids = {user: vs.add(f"{user}'s note", user_id=user) for user in ("alice", "bob")}
+    for doc_id in ids.values():
+        vs.insert_embedding(doc_id, np.ones(4, dtype=np.float32))
+    try:
+        # While alice's index is built, other store calls go on and a new vector is not lost.
+        entered, release = threading.Event(), threading.Event()
+        rows = vs.all_embeddings
+
+        def slow_rows(user_id=None):
+            entered.set()
+            release.wait(5)
+            return rows(user_id)
+
+        vs.all_embeddings = slow_rows
+        hits = []
+        builder = threading.Thread(target=lambda: hits.extend(vs.search(np.ones(4, dtype=np.float32), 5, "alice")))
+        builder.start()
+        assert entered.wait(5)
+        late = vs.add("alice's late note", user_id="alice")
+        vs.insert_embedding(late, np.ones(4, dtype=np.float32))
+        assert vs.stats()["partitions_loaded"] == 0
+        release.set()
+        builder.join(5)
+        vs.all_embeddings = rows
+        assert {d for _, d in hits} == {ids["alice"], late}
+
+        # Evicting an index that a search still holds closes it only when that search ends.
+        index = vs._vector_index("alice", lease=True)
+        closed = []
+        index.close = lambda: closed.append(True)
+        assert [d for _, d in vs.search(np.ones(4, dtype=np.float32), 5, "bob")] == [ids["bob"]]
+        assert not vs.partition_stats("alice")["loaded"] and not closed
+        vs._release(index)
+        assert closed == [True]
+    finally:
+        vs.close()
+
+
+def test_near_duplicate_index_builds_outside_the_lock_and_deletes_notify_their_owners(tmp_path, monkeypatch):
+    import threading
+
+    from core import vector_store
+    from core.near_dup import simhash
+
+    vs = VectorStore(path=str(tmp_path / "nears.db"))
+    first, late = "the quarterly budget review moved to thursday", "hiking trip packing list with tent and stove"
+    gone = vs.add(first, simhash=simhash(first), user_id="alice")
+    events = []
+    vs.add_listener(lambda kind, data: events.append((kind, data)))
+    try:
+        entered, release = threading.Event(), threading.Event()
+        unsigned = vector_store.to_unsigned
+
+        def slow_unsigned(fp):
+            if threading.current_thread() is not threading.main_thread():
+                entered.set()
+                release.wait(5)
+            return unsigned(fp)
+
+        monkeypatch.setattr(vector_store, "to_unsigned", slow_unsigned)
+        builder = threading.Thread(target=lambda: vs.near_duplicate(simhash("an unrelated note about the garden shed"), "alice"))
+        builder.start()
+        assert entered.wait(5)
+        # Writes to the partition go on during the build and are replayed into the index.
+        kept = vs.add(late, simhash=simhash(late), user_id="alice")
+        vs.delete([gone], user_id="alice")
+        release.set()
+        builder.join(5)
+        assert vs.near_duplicate(simhash(late), "alice") == kept
+        assert vs.near_duplicate(simhash(first), "alice") is None
+
+        other = vs.add("bob's note", user_id="bob")
+        events.clear()
+        assert sorted(vs.delete([kept, other])) == sorted([kept, other])
+        assert sorted((data["user_id"], data["ids"]) for _, data in events) == [("alice", [kept]), ("bob", [other])]
+    finally:
+        vs.close()
+
+
+def test_page_documents_walks_the_ts_index_with_a_cursor(tmp_path):
+    vs = VectorStore(path=str(tmp_path / "pages.db"))
+    seen = []
+    vs.add_listener(lambda kind, data: seen.append(kind))
+    try:
+        versions = {vs.version}
+        ids = [vs.add(f"document number {n} " * 30, source="bulk", user_id="alice") for n in range(5)]
+        versions.add(vs.version)
+        vs.add("other partition", user_id="bob")
+        # Pairs of documents share a timestamp, so the id breaks ties.
+        vs._writer.run(lambda cur: cur.executemany("UPDATE docs SET ts=? WHERE id=?",
+                                                   [(100 + n // 2, doc_id) for n, doc_id in enumerate(ids)]))
+        with vs._pool.read() as db:
+            plan = " ".join(row[-1] for row in db.execute(
+                "EXPLAIN QUERY PLAN SELECT ts,id FROM docs WHERE user_id=? AND (ts,id) < (?,?) "
+                "ORDER BY ts DESC, id DESC LIMIT 3", ("alice", 200, "z")))
+        assert "docs_user_ts" in plan and "TEMP B-TREE" not in plan
+
+        pages, cursor = [], None
+        while True:
+            page, cursor = vs.page_documents("alice", limit=2, after=cursor, fields=("id", "ts", "preview"),
+                                             preview_chars=20)
+            pages.append(page)
+            if cursor is None:
+                break
+        rows = [row for page in pages for row in page]
+        assert [len(p) for p in pages] == [2, 2, 1]
+        assert [(r["ts"], r["id"]) for r in rows] == sorted(((r["ts"], r["id"]) for r in rows), reverse=True)
+        assert {r["id"] for r in rows} == set(ids) and all(len(r["preview"]) == 20 for r in rows)
+
+        before = vs.version
+        vs.delete([ids[0]])
+        assert vs.version != before and before not in versions and len(versions) == 2
+        assert len(vs.page_documents("alice", limit=10)[0]) == 4
+        assert seen.count("document.indexed") == 6 and seen[-1] == "document.deleted"
+        with pytest.raises(ValueError):
+            vs.page_documents("alice", fields=("id", "secret"))
+        with pytest.raises(ValueError):
+            vs.page_documents("alice", after="not-a-cursor")
+    finally:
+        vs.close()
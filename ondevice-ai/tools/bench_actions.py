@@ -0,0 +1,59 @@
+# tools/bench_actions.py
+"""Benchmark plugin action execution against the fake backend.
+
+Usage:
+  python tools/bench_actions.py [--actions 64] [--startup 0.05]
+
+Compares the old path (a blocking ``subprocess.run`` per action, which
+serialises everything on the event loop) with ``ActionExecutor`` at a few
+batch sizes and pool widths. Runs on any OS.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from core.action_executor import ActionExecutor, FakeBackend, _FAKE_INTERPRETER  # noqa: E402
+
+
+async def _blocking(actions: int, startup: float) -> float:
+    started = time.perf_counter()
+    for i in range(actions):
+        subprocess.run(
+            [sys.executable, "-c", _FAKE_INTERPRETER, str(startup), "FAIL"],
+            input=json.dumps([f"action {i}"]), capture_output=True, text=True, check=True,
+        )
+    return time.perf_counter() - started
+
+
+async def _pooled(actions: int, startup: float, max_batch: int, max_concurrency: int) -> float:
+    executor = ActionExecutor(FakeBackend(startup_delay=startup), max_concurrency=max_concurrency, max_batch=max_batch)
+    started = time.perf_counter()
+    await asyncio.gather(*(executor.run(f"action {i}") for i in range(actions)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--actions", type=int, default=64)
+    parser.add_argument("--startup", type=float, default=0.05, help="Simulated interpreter start-up (seconds)")
+    args = parser.parse_args()
+
+    rows = [("blocking subprocess.run", asyncio.run(_blocking(args.actions, args.startup)))]
+    for max_batch, max_concurrency in [(1, 1), (1, 4), (8, 1), (8, 4)]:
+        label = f"executor batch={max_batch} pool={max_concurrency}"
+        rows.append((label, asyncio.run(_pooled(args.actions, args.startup, max_batch, max_concurrency))))
+
+    baseline = rows[0][1]
+    print(f"{args.actions} actions, {args.startup * 1000:.0f} ms interpreter start-up")
+    for label, elapsed in rows:
+        print(f"  {label:<32} {elapsed * 1000:9.1f} ms  {args.actions / elapsed:8.1f} actions/s  x{baseline / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
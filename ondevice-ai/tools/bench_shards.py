@@ -0,0 +1,67 @@
+# tools/bench_shards.py
+"""Benchmark sharded vector search against a single-process scan.
+
+Usage:
+  python tools/bench_shards.py [--rows 200000] [--dim 256] [--queries 200] [--shards 1,2,4,8]
+
+Fills each index with the same random vectors and reports queries/s and
+speed-up over the in-process scan. Shard workers are pinned to one BLAS
+thread each, so scaling comes from processes; the in-process baseline is
+run the same way for a fair comparison. Expect near-linear scaling until
+shard count reaches the number of physical cores.
+"""
+import argparse
+import os
+import sys
+import time
+
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import numpy as np  # noqa: E402
+
+from core.shards import LocalIndex, ShardedIndex  # noqa: E402
+
+
+def _measure(index, queries: np.ndarray, k: int) -> float:
+    index.search(queries[0], k)
+    started = time.perf_counter()
+    for q in queries:
+        index.search(q, k)
+    return len(queries) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    default_shards = ",".join(str(n) for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1))
+    parser.add_argument("--shards", default=default_shards, help="Comma-separated shard counts")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((args.rows, args.dim)).astype(np.float32)
+    ids = [f"doc-{i}" for i in range(args.rows)]
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    local = LocalIndex()
+    local.add(ids, vecs)
+    baseline = _measure(local, queries, args.k)
+    print(f"{args.rows:,} x {args.dim} vectors, {os.cpu_count()} CPUs")
+    print(f"  {'in-process scan':<16} {baseline:10.1f} q/s  x1.00")
+    for count in (int(n) for n in args.shards.split(",") if n.strip()):
+        index = ShardedIndex(shards=count, max_shards=count)
+        try:
+            index.add(ids, vecs)
+            rate = _measure(index, queries, args.k)
+        finally:
+            index.close()
+        print(f"  {f'{count} shard(s)':<16} {rate:10.1f} q/s  x{rate / baseline:.2f}  ({rate / baseline / count:.0%} of linear)")
+
+
+if __name__ == "__main__":
+    main()
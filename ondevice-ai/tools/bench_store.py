@@ -0,0 +1,134 @@
+# tools/bench_store.py
+"""Benchmark VectorStore under mixed read/write load from many threads.
+
+Usage:
+  python tools/bench_store.py [--threads 8] [--ops 2000] [--read-ratio 0.8] [--seed-docs 5000]
+
+Compares the pooled store (per-caller read connections, batching writer,
+tuned pragmas) with a baseline built the way the store used to work: one
+shared connection, default pragmas and a commit after every write, with a
+lock around it so it is at least safe. Each thread runs a mix of reads
+(``find`` + ``get_documents``) and writes (``add`` + ``insert_embedding``)
+and the report gives total ops/s and p50/p99 latency per kind.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import numpy as np  # noqa: E402
+
+from core.vector_store import VectorStore, pack_vector  # noqa: E402
+
+
+class SharedConnectionStore:
+    """The old access pattern, kept here only as a baseline."""
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+        PRAGMA journal_mode=WAL;
+        CREATE TABLE IF NOT EXISTS docs(id TEXT PRIMARY KEY, source TEXT, ts INTEGER, text TEXT, content_hash TEXT);
+        CREATE TABLE IF NOT EXISTS embeddings(id TEXT PRIMARY KEY, doc_id TEXT, vec BLOB);
+        CREATE INDEX IF NOT EXISTS docs_source_hash ON docs(source, content_hash);
+        """)
+        self.lock = threading.Lock()
+
+    def add(self, text: str, source: str) -> str:
+        doc_id = str(uuid.uuid4())
+        with self.lock:
+            self.db.execute("INSERT INTO docs(id,source,ts,text,content_hash) VALUES (?,?,?,?,?)",
+                            (doc_id, source, int(time.time()), text, VectorStore.content_hash(text)))
+            self.db.commit()
+        return doc_id
+
+    def insert_embedding(self, doc_id: str, vec: np.ndarray) -> None:
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO embeddings(id,doc_id,vec) VALUES (?,?,?)",
+                            (f"emb-{doc_id}", doc_id, pack_vector(vec)))
+            self.db.commit()
+
+    def find(self, text: str, source: str):
+        with self.lock:
+            row = self.db.execute("SELECT id FROM docs WHERE source=? AND content_hash=? LIMIT 1",
+                                  (source, VectorStore.content_hash(text))).fetchone()
+        return row[0] if row else None
+
+    def get_documents(self, ids):
+        with self.lock:
+            marks = ",".join("?" * len(ids))
+            return self.db.execute(f"SELECT id,source,ts,text FROM docs WHERE id IN ({marks})", list(ids)).fetchall()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def _run(store, args, doc_ids):
+    vec = np.ones(args.dim, dtype=np.float32)
+    latencies = {"read": [], "write": []}
+    lock = threading.Lock()
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        local = {"read": [], "write": []}
+        for i in range(args.ops // args.threads):
+            started = time.perf_counter()
+            if rng.random() < args.read_ratio:
+                n = rng.randrange(len(doc_ids))
+                store.find(f"seed document {n}", "bench")
+                store.get_documents(rng.sample(doc_ids, 5))
+                kind = "read"
+            else:
+                store.insert_embedding(store.add(f"thread {seed} doc {i}", "bench"), vec)
+                kind = "write"
+            local[kind].append(time.perf_counter() - started)
+        with lock:
+            for kind, values in local.items():
+                latencies[kind].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return sum(len(v) for v in latencies.values()) / elapsed, latencies
+
+
+def _pct(values, q):
+    return 1000 * float(np.percentile(values, q)) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=2000, help="Total operations across threads")
+    parser.add_argument("--read-ratio", type=float, default=0.8)
+    parser.add_argument("--seed-docs", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads, {args.ops} ops, {args.read_ratio:.0%} reads, {args.seed_docs} seeded docs")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in (("shared connection", SharedConnectionStore), ("pooled + batched", VectorStore)):
+            store = factory(os.path.join(tmp, f"{name.split()[0]}.db"))
+            seed = [store.add(f"seed document {n}", "bench") for n in range(args.seed_docs)]
+            rate, lat = _run(store, args, seed)
+            print(f"  {name:<18} {rate:8.0f} ops/s   read p50 {_pct(lat['read'], 50):6.2f} ms "
+                  f"p99 {_pct(lat['read'], 99):6.2f} ms   write p50 {_pct(lat['write'], 50):6.2f} ms "
+                  f"p99 {_pct(lat['write'], 99):6.2f} ms")
+            if isinstance(store, VectorStore):
+                print(f"  writer: {store.io_metrics()['writer']}")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
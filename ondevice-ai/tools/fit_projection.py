@@ -0,0 +1,97 @@
+# tools/fit_projection.py
+"""Fit (or refit) a reduced-dimension search projection and report its recall.
+
+Usage:
+  python tools/fit_projection.py fit [store.db] --dim 64 [--kind pca|prefix] [--out PATH]
+                                     [--k 10] [--oversample 8] [--queries 200] [--report report.json]
+  python tools/fit_projection.py report [store.db] [--projection PATH] [--k 10] [--oversample 8]
+
+Embeddings are read from a ``VectorStore`` database (default: the daemon's
+shared store). The projection is written next to it as ``<store.db>.proj.npz``
+by default. ``VectorStore`` picks that file up when it builds its index, so
+refitting after the corpus has drifted only needs a restart.
+``ONDEVICE_STORE_PROJECTION`` points it at a different file.
+
+The report scores the projected search against an exact full-dimension scan.
+It gives recall@k of the projected candidates alone and after the
+oversampled re-rank, plus the average per-query latency of each path.
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import numpy as np  # noqa: E402
+
+from core.projection import KINDS, Projection, fit, recall_report  # noqa: E402
+from core.vector_store import VectorStore, default_store_path  # noqa: E402
+
+
+def load_vectors(path: Path) -> np.ndarray:
+    if not path.exists():
+        raise SystemExit(f"No store at {path}")
+    store = VectorStore(str(path))
+    try:
+        rows = [vec for _, vec, _ in store.all_embeddings()]
+    finally:
+        store.close()
+    if not rows:
+        raise SystemExit(f"No embeddings in {path}")
+    return np.asarray(rows, dtype=np.float32)
+
+
+def default_output(path: Path) -> Path:
+    return Path(f"{path}.proj.npz")
+
+
+def _print_report(report) -> None:
+    print(f"{report['rows']:,} vectors, {report['dim_in']} -> {report['dim_out']} dimensions "
+          f"({report['explained']:.1%} of energy kept)")
+    print(f"recall@{report['k']}: {report['candidate_recall']:.3f} projected only, "
+          f"{report['recall']:.3f} after re-ranking {report['oversample']}x candidates")
+    print(f"per query: {report['full_ms']:.2f} ms full scan, {report['reduced_ms']:.2f} ms reduced + re-rank")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit a reduced-dimension search projection.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("fit", "report"):
+        p = sub.add_parser(name)
+        p.add_argument("input", nargs="?", default=None, help="VectorStore database (default: the shared store)")
+        p.add_argument("--k", type=int, default=10)
+        p.add_argument("--oversample", type=int, default=int(os.environ.get("ONDEVICE_STORE_OVERSAMPLE", "8")))
+        p.add_argument("--queries", type=int, default=200)
+        p.add_argument("--report", help="Also write the report as JSON to this path")
+        if name == "fit":
+            p.add_argument("--dim", type=int, required=True, help="Reduced dimension")
+            p.add_argument("--kind", choices=KINDS, default="pca")
+            p.add_argument("--sample", type=int, default=50_000, help="Fit on at most this many vectors")
+            p.add_argument("--out", help="Projection file (default: next to the input)")
+        else:
+            p.add_argument("--projection", help="Projection file (default: next to the input)")
+    args = parser.parse_args()
+
+    path = Path(args.input or default_store_path())
+    vecs = load_vectors(path)
+    if args.command == "fit":
+        try:
+            projection = fit(vecs, args.dim, args.kind, args.sample)
+        except ValueError as exc:
+            parser.error(str(exc))
+        out = Path(args.out) if args.out else default_output(path)
+        projection.save(str(out))
+        print(f"Wrote {args.kind} projection to {out}")
+    else:
+        projection = Projection.load(args.projection or str(default_output(path)))
+    report = recall_report(vecs, projection, args.k, args.oversample, args.queries)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+# tools/inference.py
+"""Bounded inference queue with worker slots and batching for the MLX runtime.
+
+Generation requests are queued rather than run on whichever werkzeug thread
+accepted them. A fixed number of worker slots drain the queue. A worker that
+picks up a request also takes any queued requests with identical parameters,
+up to ``max_batch``, and runs them together when the backend exposes a batch
+entry point. When the queue is full, ``submit`` raises ``QueueFull`` so the
+caller can answer 429 / ``RESOURCE_EXHAUSTED``.
+
+Streaming generations (``submit_stream``) hold a slot for their whole
+duration and are never batched. Their chunks are handed to the consumer
+through a small queue.
+
+A ``timeout`` gives a job a deadline. A job whose deadline passes while it is
+queued is dropped without running. A stream past its deadline stops at the
+next chunk. Both are counted as ``expired``. A job cancelled (or a stream
+closed) while still queued is taken off the queue at once, so it no longer
+counts towards ``max_queue``.
+"""
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+Runner = Callable[[str, Dict[str, Any]], str]
+BatchRunner = Callable[[Sequence[str], Dict[str, Any]], List[str]]
+StreamRunner = Callable[[str, Dict[str, Any]], Iterable[str]]
+
+_END = object()
+
+
+class QueueFull(Exception):
+    """Raised when the inference queue is at capacity."""
+
+
+class _Job:
+    __slots__ = ("prompt", "params", "key", "future", "enqueued", "chunks", "abandoned", "deadline")
+
+    def __init__(self, prompt: str, params: Dict[str, Any], stream: bool = False,
+                 timeout: Optional[float] = None) -> None:
+        self.prompt = prompt
+        self.params = params
+        # Streaming jobs get a key no other job can share, so they are never batched.
+        self.key = f"stream:{id(self)}" if stream else json.dumps(params, sort_keys=True, default=str)
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+        self.chunks: Optional["queue.Queue[Any]"] = queue.Queue(maxsize=256) if stream else None
+        self.abandoned = threading.Event()
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+
+class _ChunkStream:
+    """Iterator returned by ``submit_stream``.
+
+    ``close`` abandons the job even if no chunk has been read yet; closing a
+    generator that never started would skip its cleanup.
+    """
+
+    def __init__(self, job: _Job, chunks: Iterator[str]) -> None:
+        self._job = job
+        self._chunks = chunks
+
+    def __iter__(self) -> "_ChunkStream":
+        return self
+
+    def __next__(self) -> str:
+        return next(self._chunks)
+
+    def close(self) -> None:
+        self._chunks.close()
+        self._job.abandoned.set()
+        self._job.future.cancel()
+
+
+class _Window:
+    """Fixed-size window of recent samples for percentile reporting."""
+
+    def __init__(self, size: int = 512) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self._samples.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        if not self._samples:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(self._samples)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {"p50": round(pick(0.50), 3), "p95": round(pick(0.95), 3), "max": round(ordered[-1], 3)}
+
+
+class InferenceScheduler:
+    def __init__(
+        self,
+        runner: Runner,
+        batch_runner: Optional[Callable[[], Optional[BatchRunner]]] = None,
+        stream_runner: Optional[StreamRunner] = None,
+        slots: int = 1,
+        max_queue: int = 16,
+        max_batch: int = 4,
+    ) -> None:
+        self._runner = runner
+        # Resolved per batch because the model (and its batch support) is
+        # swapped in by warmup after the scheduler is created.
+        self._batch_runner = batch_runner or (lambda: None)
+        self._stream_runner = stream_runner or (lambda prompt, params: [runner(prompt, params)])
+        self.slots = max(1, int(slots))
+        self.max_queue = max(1, int(max_queue))
+        self.max_batch = max(1, int(max_batch))
+        self._queue: Deque[_Job] = deque()
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._batches = 0
+        self._expired = 0
+        self._cancelled = 0
+        self._wait_ms = _Window()
+        self._run_ms = _Window()
+
+    def submit(self, prompt: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> str:
+        """Queue a generation and block until it completes.
+
+        If ``timeout`` passes first, ``TimeoutError`` is raised and the job is
+        withdrawn if it has not started yet.
+        """
+        future = self.submit_async(prompt, params, timeout=timeout)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()  # withdraws it from the queue if it has not started
+            raise
+
+    def submit_async(self, prompt: str, params: Optional[Dict[str, Any]] = None,
+                     timeout: Optional[float] = None) -> Future:
+        job = _Job(prompt, dict(params or {}), timeout=timeout)
+        self._enqueue(job)
+        return job.future
+
+    def submit_stream(self, prompt: str, params: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None) -> Iterator[str]:
+        """Queue a streaming generation; ``QueueFull`` is raised immediately.
+
+        The returned iterator yields text chunks as the worker produces them.
+        Closing it early tells the worker to stop generating. Once ``timeout``
+        has passed, the iterator raises ``TimeoutError``.
+        """
+        job = _Job(prompt, dict(params or {}), stream=True, timeout=timeout)
+        self._enqueue(job)
+        return _ChunkStream(job, self._drain(job))
+
+    @staticmethod
+    def _drain(job: _Job) -> Iterator[str]:
+        assert job.chunks is not None
+        try:
+            while True:
+                item = job.chunks.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            job.abandoned.set()
+            job.future.cancel()
+
+    def _enqueue(self, job: _Job) -> None:
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._rejected += 1
+                raise QueueFull(f"inference queue full ({self.max_queue} pending)")
+            self._ensure_workers()
+            self._queue.append(job)
+            self._cond.notify()
+        job.future.add_done_callback(lambda future: future.cancelled() and self._withdraw(job))
+
+    def _withdraw(self, job: _Job) -> None:
+        """Drop a cancelled job that no worker has taken yet."""
+        with self._cond:
+            try:
+                self._queue.remove(job)
+            except ValueError:
+                return  # already taken; the worker accounts for it
+            if job.expired():
+                self._expired += 1
+            else:
+                self._cancelled += 1
+
+    def _ensure_workers(self) -> None:
+        while len(self._workers) < self.slots:
+            worker = threading.Thread(target=self._work, name=f"inference-slot-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _take_batch(self) -> List[_Job]:
+        first = self._queue.popleft()
+        batch = [first]
+        if self.max_batch > 1:
+            for job in list(self._queue):
+                if len(batch) >= self.max_batch:
+                    break
+                if job.key == first.key:
+                    self._queue.remove(job)
+                    batch.append(job)
+        return batch
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                batch = self._take_batch()
+                self._in_flight += len(batch)
+            started = time.perf_counter()
+            expired = [job for job in batch if job.expired() and job.future.cancel()]
+            if expired:
+                for job in expired:
+                    self._put_expired(job)
+                with self._cond:
+                    self._expired += len(expired)
+            live = [job for job in batch if job.future.set_running_or_notify_cancel()]
+            for job in live:
+                self._wait_ms.add((started - job.enqueued) * 1000.0)
+            try:
+                self._run_batch(live)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000.0
+                with self._cond:
+                    self._in_flight -= len(batch)
+                    self._completed += len(live)
+                    self._batches += 1
+                    self._run_ms.add(elapsed)
+
+    def _run_batch(self, jobs: List[_Job]) -> None:
+        if not jobs:
+            return
+        if jobs[0].chunks is not None:
+            self._run_stream(jobs[0])
+            return
+        batch_fn = self._batch_runner() if len(jobs) > 1 else None
+        if batch_fn is not None:
+            try:
+                outputs = list(batch_fn([job.prompt for job in jobs], jobs[0].params))
+                if len(outputs) != len(jobs):
+                    raise RuntimeError(f"batch runner returned {len(outputs)} outputs for {len(jobs)} prompts")
+                for job, text in zip(jobs, outputs):
+                    job.future.set_result(text)
+            except Exception as exc:
+                # Every caller must hear back, including those after a partial result.
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(exc)
+            return
+        for job in jobs:
+            try:
+                job.future.set_result(self._runner(job.prompt, job.params))
+            except Exception as exc:
+                job.future.set_exception(exc)
+
+    def _run_stream(self, job: _Job) -> None:
+        assert job.chunks is not None
+        parts: List[str] = []
+        try:
+            for chunk in self._stream_runner(job.prompt, job.params):
+                if job.abandoned.is_set():
+                    break
+                if job.expired():
+                    with self._cond:
+                        self._expired += 1
+                    raise TimeoutError("generation deadline exceeded")
+                parts.append(chunk)
+                self._put(job, chunk)
+        except Exception as exc:
+            job.future.set_exception(exc)
+            self._put(job, exc)
+            return
+        job.future.set_result("".join(parts))
+        self._put(job, _END)
+
+    def _put_expired(self, job: _Job) -> None:
+        if job.chunks is not None:
+            self._put(job, TimeoutError("generation deadline exceeded"), stall_seconds=1.0)
+
+    @staticmethod
+    def _put(job: _Job, item: Any, stall_seconds: float = 30.0) -> None:
+        assert job.chunks is not None
+        # Don't block a slot forever on a consumer that has gone away without
+        # closing its iterator (e.g. one that was never started).
+        deadline = time.monotonic() + stall_seconds
+        while not job.abandoned.is_set():
+            try:
+                job.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if time.monotonic() > deadline:
+                    job.abandoned.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "max_queue": self.max_queue,
+                "max_batch": self.max_batch,
+                "queue_depth": len(self._queue),
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "batches": self._batches,
+                "expired": self._expired,
+                "cancelled": self._cancelled,
+                "wait_ms": self._wait_ms.summary(),
+                "run_ms": self._run_ms.summary(),
+            }
+
+
+__all__ = ["InferenceScheduler", "QueueFull"]
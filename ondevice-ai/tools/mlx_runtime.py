@@ -1,21 +1,30 @@
 # tools/mlx_runtime.py
 from __future__ import annotations
 
+import functools
 import hashlib
 import json
 import os
 import shutil
 import threading
 import time
-import uuid
+from collections import OrderedDict
+from dataclasses import asdict
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 import numpy as np
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 
+from core import deadline, events
+from core.action_stream import ActionStreamParser
+from core.activity import REQUEST_METER
 from core.audit import read_events, write_event
-from core.plugins import PluginManifest
+from core.bundle_loader import LoadedBundle, open_bundle
+from core.plugins import MANIFESTS
+from core.vector_store import DEFAULT_PARTITION, QuotaExceeded, VectorStore, default_store_path
+from core.tracing import enabled as _tracing_enabled, extract_context, span, start_span
+from tools.inference import InferenceScheduler, QueueFull
 
 
 DATA_ROOT = Path(os.environ.get("EKUPKARAN_DATA_DIR", Path.home() / ".ekupkaran"))
@@ -23,11 +32,15 @@ MODELS_ROOT = Path(os.environ.get("ML_MODELS_DIR", DATA_ROOT / "models"))
 PLANNER_DIR = MODELS_ROOT / "planner"
 _DEFAULT_PLUGINS_DIR = Path(__file__).resolve().parents[1] / "plugins"
 _PLUGINS_DIR = Path(os.environ.get("PLUGINS_DIR", DATA_ROOT / "plugins"))
+# Pre-store knowledge base; imported into the shared store once on warmup.
 DOCUMENTS_PATH = DATA_ROOT / "documents.json"
 
-DATA_ROOT.mkdir(parents=True, exist_ok=True)
-MODELS_ROOT.mkdir(parents=True, exist_ok=True)
-_PLUGINS_DIR.mkdir(parents=True, exist_ok=True)
+# "queue" holds early requests until warmup reaches the stage they need;
+# "fail" answers them immediately with 503 + Retry-After.
+WARMUP_POLICY = os.environ.get("ONDEVICE_WARMUP_POLICY", "queue")
+WARMUP_TIMEOUT = float(os.environ.get("ONDEVICE_WARMUP_TIMEOUT", "120"))
+# An idle /events stream sends a comment this often, so proxies and clients notice a dead connection.
+EVENTS_HEARTBEAT = float(os.environ.get("ONDEVICE_EVENTS_HEARTBEAT", "15"))
 
 
 def _fallback_embed(text: str) -> np.ndarray:
@@ -56,42 +69,264 @@ def _fallback_generate(prompt: str, **kwargs: Any) -> str:
 embed_text = _fallback_embed
 generate = _fallback_generate
 
-try:  # pragma: no cover - optional dependency
-    from mlx_lm import load_model  # type: ignore[import]
-
-    _planner_target: Path | None
-    env_target = os.environ.get("PLANNER_MODEL_PATH")
-    if env_target:
-        _planner_target = Path(env_target)
-    elif PLANNER_DIR.exists():
-        _planner_target = PLANNER_DIR
-    else:
-        _planner_target = None
-
-    if _planner_target and _planner_target.exists():
-        MODEL = load_model(str(_planner_target), device="metal")
-    else:
-        MODEL = load_model(os.environ.get("PLANNER_MODEL_NAME", "mlx-community/mistral-7b-instruct-q4_0"), device="metal")
+MODEL: Any = None
+MODEL_BACKEND = "fallback"
+BUNDLE: LoadedBundle | None = None
+
+
+def _planner_bundle() -> Path | None:
+    env_bundle = os.environ.get("PLANNER_BUNDLE_PATH")
+    if env_bundle:
+        return Path(env_bundle)
+    default = Path(os.environ.get("ML_MODELS_DIR", MODELS_ROOT)) / "planner.zip"
+    return default if default.exists() else None
+
+
+def _load_model() -> None:
+    global MODEL, MODEL_BACKEND, BUNDLE, embed_text, generate
+    # Verified before the optional backend import, so a bad bundle fails the
+    # "model" warmup stage (reported on /ready) even where mlx_lm is missing.
+    bundle_path = _planner_bundle()
+    if bundle_path is not None:
+        BUNDLE = open_bundle(str(bundle_path), pubkey_b64=os.environ.get("PLANNER_BUNDLE_PUBKEY"),
+                             allow_unsigned=os.environ.get("PLANNER_BUNDLE_ALLOW_UNSIGNED") == "1")
+    try:  # pragma: no cover - optional dependency
+        from mlx_lm import load_model  # type: ignore[import]
+    except Exception:  # pragma: no cover - deterministic fallback
+        return
+    try:  # pragma: no cover - optional dependency
+        _planner_target: Path | None
+        # Resolved at load time so a daemon-level --models-dir override applies.
+        planner_dir = Path(os.environ.get("ML_MODELS_DIR", MODELS_ROOT)) / "planner"
+        env_target = os.environ.get("PLANNER_MODEL_PATH")
+        if BUNDLE is not None:
+            # Extracted once into the shared cache.
+            _planner_target = BUNDLE.root
+        elif env_target:
+            _planner_target = Path(env_target)
+        elif planner_dir.exists():
+            _planner_target = planner_dir
+        else:
+            _planner_target = None
+
+        if _planner_target and _planner_target.exists():
+            model = load_model(str(_planner_target), device="metal")
+        else:
+            model = load_model(os.environ.get("PLANNER_MODEL_NAME", "mlx-community/mistral-7b-instruct-q4_0"), device="metal")
+    except Exception:  # pragma: no cover - deterministic fallback
+        return
 
     def _model_embed(text: str) -> np.ndarray:
-        return np.array(MODEL.embed(text), dtype=np.float32)
+        return np.array(model.embed(text), dtype=np.float32)
 
     def _model_generate(prompt: str, **kwargs: Any) -> str:
-        return MODEL.generate(prompt, **kwargs)
+        return model.generate(prompt, **kwargs)
 
+    MODEL = model
+    MODEL_BACKEND = "mlx"
     embed_text = _model_embed
     generate = _model_generate
-except Exception:  # pragma: no cover - deterministic fallback
-    pass
+
+
+class _PrefixCache:
+    """Processed prompt-prefix state for backends exposing ``prefill``.
+
+    Callers declare how many leading characters of the prompt are a constant
+    template (``prefix_chars``). The backend processes that prefix once, and
+    the resulting state is handed back to ``generate`` as ``prompt_cache``.
+    """
+
+    def __init__(self, max_entries: int = 8) -> None:
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def state_for(self, prefix: str) -> Any:
+        prefill = getattr(MODEL, "prefill", None)
+        if prefill is None or not prefix:
+            return None
+        key = hashlib.sha256(f"{MODEL_BACKEND}:{prefix}".encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        state = prefill(prefix)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = state
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return state
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_PREFIX_CACHE = _PrefixCache()
+
+
+def _with_adapter(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Swap an ``adapter`` name for the bundle's LoRA adapter, mapped from the cache on first use."""
+    name = params.get("adapter")
+    if name and BUNDLE is not None:
+        params = {**params, "adapter": BUNDLE.adapter(str(name))}
+    return params
+
+
+def _generation_params(prompt: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    params = _with_adapter(dict(params))
+    prefix_chars = int(params.pop("prefix_chars", 0) or 0)
+    if prefix_chars > 0:
+        state = _PREFIX_CACHE.state_for(prompt[:prefix_chars])
+        if state is not None:
+            params["prompt_cache"] = state
+    return params
+
+
+def _run_generation(prompt: str, params: Dict[str, Any]) -> str:
+    return generate(prompt, **_generation_params(prompt, params))
+
+
+def _stream_generation(prompt: str, params: Dict[str, Any]) -> Iterator[str]:
+    params = _generation_params(prompt, params)
+    stream_fn = getattr(MODEL, "stream_generate", None)
+    if stream_fn is not None:
+        yield from stream_fn(prompt, **params)
+        return
+    # Backends without token streaming: generate, then emit in small chunks
+    # so clients exercise the same incremental path.
+    text = generate(prompt, **params)
+    for start in range(0, len(text), 16):
+        yield text[start:start + 16]
+
+
+def _sse(event: str, data: Any, event_id: int | None = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _batch_generate() -> Any:
+    batch_fn = getattr(MODEL, "generate_batch", None)
+    if batch_fn is None:
+        return None
+
+    def run(prompts: Iterable[str], params: Dict[str, Any]) -> List[str]:
+        params = _with_adapter({key: value for key, value in params.items() if key != "prefix_chars"})
+        return list(batch_fn(list(prompts), **params))
+
+    return run
+
+
+_SCHEDULER = InferenceScheduler(
+    runner=_run_generation,
+    stream_runner=_stream_generation,
+    batch_runner=_batch_generate,
+    slots=int(os.environ.get("ONDEVICE_INFERENCE_SLOTS", "1")),
+    max_queue=int(os.environ.get("ONDEVICE_INFERENCE_QUEUE", "16")),
+    max_batch=int(os.environ.get("ONDEVICE_INFERENCE_BATCH", "4")),
+)
+
+
+def _busy(exc: QueueFull) -> Any:
+    body = {"error": "busy", "detail": str(exc), "inference": _SCHEDULER.metrics()}
+    return jsonify(body), 429, {"Retry-After": "1"}
+
+
+def _expired() -> Any:
+    return jsonify({"error": "deadline_exceeded", "detail": "request deadline exceeded"}), 504
 
 
 app = Flask("mlx_runtime")
 
-_DOCUMENTS: Dict[str, Dict[str, Any]] = {}
-_VECTORS: Dict[str, np.ndarray] = {}
+
+# Polling endpoints and the change feed; they don't count as interactive load.
+_UNMETERED_PATHS = {"/health", "/ready", "/metrics", "/events"}
+
+_METRICS_PROVIDERS: Dict[str, Callable[[], Any]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], Any]) -> None:
+    """Expose an extra section (e.g. the daemon's job scheduler) on /metrics."""
+    _METRICS_PROVIDERS[name] = provider
+
+
+@app.before_request
+def _mark_request() -> None:
+    if request.path not in _UNMETERED_PATHS:
+        REQUEST_METER.mark()
+
+
+@app.before_request
+def _start_request_span() -> None:
+    parent = extract_context(request.headers)
+    if parent is None and not _tracing_enabled():
+        return
+    g.trace_span = start_span(f"http {request.method} {request.path}", parent=parent)
+
+
+@app.teardown_request
+def _end_request_span(error: BaseException | None) -> None:
+    current = g.pop("trace_span", None)
+    if current is not None:
+        current.end(error=error)
+
+
+STORE: VectorStore | None = None
+# Opens the store in the "storage" warmup stage instead of up front; see ``configure_store_opener``.
+_STORE_OPENER: Callable[[], VectorStore] | None = None
 _STATE_LOCK = threading.Lock()
 
 
+def _on_store_change(kind: str, data: Dict[str, Any]) -> None:
+    """Forward store changes to the change feed; text is cut down to the list preview."""
+    if "text" in data:
+        data = {key: value for key, value in data.items() if key != "text"} | {"preview": _doc_preview(data["text"])}
+    events.publish(kind, data)
+
+
+def configure_store(store: VectorStore) -> None:
+    """Serve documents from ``store``; the daemon passes the orchestrator's so both share one corpus."""
+    global STORE
+    with _STATE_LOCK:
+        STORE = store
+        store.add_listener(_on_store_change)
+
+
+def configure_store_opener(opener: Callable[[], VectorStore]) -> None:
+    """Open the store with ``opener`` during warmup, after the servers are bound.
+
+    The daemon uses this so a restore or a legacy migration does not hold up
+    binding. Until the "storage" stage has run it, ``/ready`` is 503 and the
+    document endpoints wait (or 503, per the warmup policy).
+    """
+    global _STORE_OPENER
+    with _STATE_LOCK:
+        _STORE_OPENER = opener
+
+
+def _store(wait: bool = True) -> VectorStore | None:
+    """The shared store; with ``wait`` false, None while the warmup opener has not finished."""
+    global STORE
+    with _STATE_LOCK:
+        if STORE is not None or _STORE_OPENER is not None:
+            opened = STORE
+        else:
+            STORE = VectorStore(default_store_path())
+            STORE.add_listener(_on_store_change)
+            return STORE
+    if opened is not None or not wait:
+        return opened
+    _WARMUP.start()
+    _WARMUP.wait("storage", None)
+    with _STATE_LOCK:
+        if STORE is None:
+            raise RuntimeError("The document store failed to open; see /ready")
+        return STORE
+
+
 def _seed_plugins_directory() -> None:
     if not any(_PLUGINS_DIR.iterdir()) and _DEFAULT_PLUGINS_DIR.exists():
         for item in _DEFAULT_PLUGINS_DIR.iterdir():
@@ -104,116 +339,287 @@ def _seed_plugins_directory() -> None:
                 shutil.copy2(item, dest)
 
 
+def _prepare_storage() -> None:
+    DATA_ROOT.mkdir(parents=True, exist_ok=True)
+    MODELS_ROOT.mkdir(parents=True, exist_ok=True)
+    _PLUGINS_DIR.mkdir(parents=True, exist_ok=True)
+    _seed_plugins_directory()
+    with _STATE_LOCK:
+        opener = _STORE_OPENER if STORE is None else None
+    if opener is not None:
+        configure_store(opener())
+
+
 def _load_documents() -> None:
+    store = _store()
     if not DOCUMENTS_PATH.exists():
-        _seed_plugins_directory()
         return
     try:
         with DOCUMENTS_PATH.open("r", encoding="utf-8") as handle:
             payload = json.load(handle)
     except Exception:
         return
-    for doc in payload.get("documents", []):
-        doc_id = doc.get("id")
-        vector = doc.get("vector")
-        if not doc_id or vector is None:
-            continue
-        _DOCUMENTS[doc_id] = {
-            key: value for key, value in doc.items() if key not in {"vector"}
+    imported = store.import_records(payload.get("documents", []))
+    DOCUMENTS_PATH.replace(DOCUMENTS_PATH.with_name(DOCUMENTS_PATH.name + ".migrated"))
+    write_event({"type": "documents_migrated", "source": str(DOCUMENTS_PATH), "count": imported})
+
+
+def _backfill_embeddings() -> None:
+    """Embed documents stored without a vector (legacy ``documents.json`` entries), once the model is loaded."""
+    store = _store()
+    for doc_id, text in store.unembedded():
+        store.insert_embedding(doc_id, embed_text(text))
+
+
+def _warm_model() -> None:
+    _load_model()
+    _backfill_embeddings()
+
+
+class _Warmup:
+    """Runs the slow startup stages on a background thread, in order."""
+
+    STAGES = ("storage", "documents", "model")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._started_at: float | None = None
+        self._stages: Dict[str, Dict[str, Any]] = {name: {"state": "pending"} for name in self.STAGES}
+        self._events = {name: threading.Event() for name in self.STAGES}
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="mlx-runtime-warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        steps = {"storage": _prepare_storage, "documents": _load_documents, "model": _warm_model}
+        for name in self.STAGES:
+            info = self._stages[name]
+            info["state"] = "running"
+            started = time.perf_counter()
+            try:
+                steps[name]()
+                info["state"] = "done"
+            except Exception as exc:
+                info["state"] = "failed"
+                info["error"] = str(exc)
+            finally:
+                info["duration_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+                self._events[name].set()
+                events.publish("ready", {"stage": name, **self.snapshot()})
+
+    def done(self, stage: str) -> bool:
+        return self._events[stage].is_set()
+
+    def wait(self, stage: str, timeout: float | None) -> bool:
+        return self._events[stage].wait(timeout)
+
+    def snapshot(self) -> Dict[str, Any]:
+        # A failed stage (e.g. a planner bundle that does not verify) keeps the runtime unready.
+        failed = any(info["state"] == "failed" for info in self._stages.values())
+        return {
+            "ready": all(event.is_set() for event in self._events.values()) and not failed,
+            "started_at": self._started_at,
+            "stages": {name: dict(info) for name, info in self._stages.items()},
         }
-        _VECTORS[doc_id] = np.array(vector, dtype=np.float32)
 
 
-def _persist_documents() -> None:
-    with _STATE_LOCK:
-        serialisable: List[Dict[str, Any]] = []
-        for doc_id, doc in _DOCUMENTS.items():
-            vector = _VECTORS.get(doc_id)
-            serialisable.append({
-                **doc,
-                "id": doc_id,
-                "vector": vector.astype(float).tolist() if vector is not None else [],
-            })
-        DOCUMENTS_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with DOCUMENTS_PATH.open("w", encoding="utf-8") as handle:
-            json.dump({"documents": serialisable}, handle, ensure_ascii=False, indent=2)
+_WARMUP = _Warmup()
+
+
+def start_warmup() -> None:
+    """Begin loading documents and the model in the background (idempotent)."""
+    _WARMUP.start()
+
+
+def configure_warmup(policy: str | None = None, timeout: float | None = None) -> None:
+    global WARMUP_POLICY, WARMUP_TIMEOUT
+    if policy is not None:
+        if policy not in {"queue", "fail"}:
+            raise ValueError(f"Unknown warmup policy: {policy}")
+        WARMUP_POLICY = policy
+    if timeout is not None:
+        WARMUP_TIMEOUT = float(timeout)
+
+
+def _requires_warm(stage: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Hold (or reject with 503) a request until warmup has finished ``stage``."""
 
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _WARMUP.done(stage):
+                _WARMUP.start()
+                if WARMUP_POLICY != "queue" or not _WARMUP.wait(stage, WARMUP_TIMEOUT):
+                    body = {"error": "warming_up", "stage": stage, **_WARMUP.snapshot()}
+                    return jsonify(body), 503, {"Retry-After": "1"}
+            return fn(*args, **kwargs)
 
-_load_documents()
+        return wrapper
+
+    return decorator
 
 
 def plugin_list() -> List[Dict[str, Any]]:
     manifests: List[Dict[str, Any]] = []
     for base in (_PLUGINS_DIR, _DEFAULT_PLUGINS_DIR):
-        manifest_path = base / "plugin-manifest.yaml"
-        if not manifest_path.exists():
-            continue
         try:
-            manifest = PluginManifest.load(str(manifest_path))
+            manifest = MANIFESTS.get(str(base / "plugin-manifest.yaml"))
         except Exception:
             continue
-        manifests.append(manifest.__dict__)
+        if manifest is not None:
+            manifests.append(asdict(manifest))
     return manifests
 
 
-def _cosine(a: np.ndarray, b: np.ndarray) -> float:
-    denom = np.linalg.norm(a) * np.linalg.norm(b)
-    if denom == 0:
-        return 0.0
-    return float(np.dot(a, b) / denom)
+def _user_id(payload: Dict[str, Any] | None = None) -> str:
+    """Store partition of the request: ``user_id`` in the body or query string, else the default one."""
+    return str((payload or {}).get("user_id") or request.args.get("user_id") or DEFAULT_PARTITION)
+
+
+PREVIEW_CHARS = 200
+# GET /documents page size: the default, and the most a client may ask for.
+DOCUMENTS_PAGE = 100
+DOCUMENTS_PAGE_MAX = 1000
 
 
 def _doc_preview(text: str) -> str:
-    return text[:200]
+    return text[:PREVIEW_CHARS]
+
+
+# Store and plugin figures for /health, keyed on the change feed's sequence.
+_HEALTH_TTL = 30.0
+_HEALTH_LOCK = threading.Lock()
+_HEALTH_CACHE: Dict[str, Any] = {"seq": -1, "expires": 0.0, "body": {}}
+
+
+def _health(host: str) -> Dict[str, Any]:
+    """Recounted only after a change was published, or every ``_HEALTH_TTL`` s to pick up plugin edits."""
+    seq = events.FEED.last_seq
+    now = time.monotonic()
+    with _HEALTH_LOCK:
+        cached = dict(_HEALTH_CACHE)
+    if cached["seq"] != seq or now >= cached["expires"]:
+        # A liveness check: it does not wait for a store that is still opening.
+        store = _store(wait=False)
+        cached = {"seq": seq, "expires": now + (_HEALTH_TTL if store is not None else 0.0), "body": {
+            "documents": store.stats()["documents"] if store is not None else 0,
+            "plugins": len(plugin_list()),
+            "storage": store.path if store is not None else None,
+        }}
+        with _HEALTH_LOCK:
+            _HEALTH_CACHE.update(cached)
+    body = cached["body"]
+    return {
+        "status": "ok",
+        "ready": _WARMUP.snapshot()["ready"],
+        "documents": body["documents"],
+        "backend": {"host": host, "plugins": body["plugins"], "storage": body["storage"]},
+    }
 
 
 @app.route("/health", methods=["GET"])
 def health() -> Any:
-    return jsonify({
-        "status": "ok",
-        "documents": len(_DOCUMENTS),
-        "backend": {
-            "host": request.host,
-            "plugins": len(list(plugin_list())),
-            "storage": str(DOCUMENTS_PATH),
-        },
-    })
+    return jsonify(_health(request.host))
+
+
+@app.route("/ready", methods=["GET"])
+def ready() -> Any:
+    _WARMUP.start()
+    snapshot = _WARMUP.snapshot()
+    snapshot["model_backend"] = MODEL_BACKEND
+    return jsonify(snapshot), 200 if snapshot["ready"] else 503
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics() -> Any:
+    body = {"inference": _SCHEDULER.metrics(), "prefix_cache": _PREFIX_CACHE.stats()}
+    body["request_rate"] = round(REQUEST_METER.rate(), 3)
+    body["events"] = events.FEED.metrics()
+    for name, provider in _METRICS_PROVIDERS.items():
+        body[name] = provider()
+    return jsonify(body)
 
 
 @app.route("/embed", methods=["POST"])
+@_requires_warm("model")
 def embed() -> Any:
     payload = request.get_json(silent=True) or {}
     texts: Iterable[str] = payload.get("texts", [])
-    vectors = [embed_text(text).astype(float).tolist() for text in texts]
+    with span("runtime.embed"):
+        vectors = [embed_text(text).astype(float).tolist() for text in texts]
     return jsonify({"vectors": vectors})
 
 
 @app.route("/predict", methods=["POST"])
+@_requires_warm("model")
 def predict() -> Any:
     payload = request.get_json(silent=True) or {}
     prompt = payload.get("prompt", "")
     params = payload.get("params", {}) or {}
-    return jsonify({"text": generate(prompt, **params)})
+    adapter = params.get("adapter")
+    if adapter and (BUNDLE is None or str(adapter) not in BUNDLE.adapters()):
+        return jsonify({"error": f"Unknown adapter: {adapter}"}), 400
+    # Time the caller (e.g. a gRPC request with a deadline) is still waiting.
+    wait = deadline.from_headers(request.headers)
+    if wait == 0:
+        return _expired()
+    if payload.get("stream"):
+        try:
+            chunks = _SCHEDULER.submit_stream(prompt, params, timeout=wait)
+        except QueueFull as exc:
+            return _busy(exc)
+
+        def _events() -> Iterator[str]:
+            try:
+                for chunk in chunks:
+                    yield _sse("token", {"text": chunk})
+            except TimeoutError:
+                yield _sse("error", {"error": "request deadline exceeded", "code": "deadline_exceeded"})
+                return
+            except Exception as exc:
+                yield _sse("error", {"error": str(exc)})
+                return
+            yield _sse("done", {})
+
+        return Response(stream_with_context(_events()), mimetype="text/event-stream")
+    with span("runtime.generate"):
+        try:
+            text = _SCHEDULER.submit(prompt, params, timeout=wait)
+        except QueueFull as exc:
+            return _busy(exc)
+        except TimeoutError:
+            return _expired()
+    return jsonify({"text": text})
 
 
 @app.route("/index", methods=["POST"])
+@_requires_warm("model")
 def index_document() -> Any:
     payload = request.get_json(silent=True) or {}
     text = str(payload.get("text", "")).strip()
     if not text:
         return jsonify({"error": "text is required"}), 400
     source = (payload.get("source") or "api").strip() or "api"
-    doc_id = str(uuid.uuid4())
-    ts = int(time.time())
-    vector = embed_text(text)
-    _DOCUMENTS[doc_id] = {"id": doc_id, "source": source, "ts": ts, "text": text}
-    _VECTORS[doc_id] = vector
-    write_event({"type": "document_indexed", "id": doc_id, "source": source})
-    _persist_documents()
-    return jsonify({"id": doc_id, "source": source, "ts": ts, "preview": _doc_preview(text)})
+    store = _store()
+    try:
+        # The same exact and near-duplicate checks, and per-text lock, as gRPC IndexText.
+        doc_id, _, _ = store.ingest(text, source, _user_id(payload), os.environ.get("ONDEVICE_DEDUP", "link"),
+                                    embed=embed_text)
+    except QuotaExceeded as exc:
+        return jsonify({"error": "quota_exceeded", "detail": str(exc)}), 429
+    doc = store.get_document(doc_id) or {"ts": int(time.time())}
+    write_event({"type": "document_indexed", "id": doc_id, "source": source, "user_id": _user_id(payload)})
+    return jsonify({"id": doc_id, "source": source, "ts": doc["ts"], "preview": _doc_preview(text)})
 
 
 @app.route("/query", methods=["POST"])
+@_requires_warm("model")
 def semantic_query() -> Any:
     payload = request.get_json(silent=True) or {}
     query = str(payload.get("query", "")).strip()
@@ -221,62 +627,190 @@ def semantic_query() -> Any:
     if not query:
         return jsonify({"hits": []})
     q_vec = embed_text(query)
-    scored: List[Dict[str, Any]] = []
-    for doc_id, vector in _VECTORS.items():
-        score = _cosine(q_vec, vector)
-        doc = _DOCUMENTS[doc_id]
-        scored.append({"doc_id": doc_id, "score": score, "preview": _doc_preview(doc["text"])})
-    scored.sort(key=lambda item: item["score"], reverse=True)
-    return jsonify({"hits": scored[: limit if limit > 0 else 5]})
+    store = _store()
+    hits = store.search(q_vec, limit if limit > 0 else 5, _user_id(payload))
+    docs = store.get_documents([doc_id for _, doc_id in hits])
+    return jsonify({"hits": [
+        {"doc_id": doc_id, "score": score, "preview": _doc_preview(docs[doc_id]["text"])}
+        for score, doc_id in hits if doc_id in docs
+    ]})
 
 
 @app.route("/plan", methods=["POST"])
+@_requires_warm("model")
 def plan() -> Any:
     payload = request.get_json(silent=True) or {}
     goal = payload.get("goal", "")
+    wait = deadline.from_headers(request.headers)
+    if wait == 0:
+        return _expired()
+    if payload.get("stream"):
+        return _plan_stream(goal, wait)
+    try:
+        raw = _SCHEDULER.submit(f"Plan steps for: {goal}", timeout=wait)
+    except QueueFull as exc:
+        return _busy(exc)
+    except TimeoutError:
+        return _expired()
+    except Exception:
+        raw = ""
     try:
-        actions = json.loads(generate(f"Plan steps for: {goal}"))
+        actions = json.loads(raw)
         if isinstance(actions, list):
             return jsonify({"actions": actions})
     except Exception:
         pass
-    return jsonify({
-        "actions": [
-            {"name": "research", "payload": json.dumps({"goal": goal}), "sensitive": False, "preview_required": False},
-            {"name": "summarize", "payload": json.dumps({"goal": goal}), "sensitive": False, "preview_required": False},
-        ]
-    })
+    return jsonify({"actions": _default_plan(goal)})
+
+
+def _default_plan(goal: str) -> List[Dict[str, Any]]:
+    return [
+        {"name": "research", "payload": json.dumps({"goal": goal}), "sensitive": False, "preview_required": False},
+        {"name": "summarize", "payload": json.dumps({"goal": goal}), "sensitive": False, "preview_required": False},
+    ]
+
+
+def _plan_stream(goal: str, wait: Optional[float] = None) -> Any:
+    try:
+        chunks = _SCHEDULER.submit_stream(f"Plan steps for: {goal}", timeout=wait)
+    except QueueFull as exc:
+        return _busy(exc)
+
+    def _events() -> Iterator[str]:
+        parser = ActionStreamParser()
+        index = 0
+        try:
+            for chunk in chunks:
+                for action in parser.feed(chunk):
+                    yield _sse("action", {"index": index, "action": action})
+                    index += 1
+        except TimeoutError:
+            yield _sse("error", {"error": "request deadline exceeded", "code": "deadline_exceeded"})
+            return
+        except Exception as exc:
+            app.logger.exception("plan generation failed for goal %r", goal)
+            yield _sse("error", {"error": str(exc)})
+            return
+        # Only a generation that finished without a usable action falls back to the default plan.
+        if index == 0:
+            for action in _default_plan(goal):
+                yield _sse("action", {"index": index, "action": action})
+                index += 1
+        yield _sse("done", {"count": index})
+
+    return Response(stream_with_context(_events()), mimetype="text/event-stream")
 
 
 @app.route("/documents", methods=["GET"])
+@_requires_warm("documents")
 def list_documents() -> Any:
-    docs = [
-        {"id": doc_id, "source": doc["source"], "ts": doc["ts"], "preview": _doc_preview(doc["text"])}
-        for doc_id, doc in _DOCUMENTS.items()
-    ]
-    docs.sort(key=lambda d: d["ts"], reverse=True)
-    return jsonify({"documents": docs})
+    """A newest-first page of the partition's documents.
+
+    ``limit`` (default 100, at most 1000) sets the page size and ``after``
+    takes the previous page's ``next`` cursor. ``fields`` picks a
+    comma-separated subset of id, source, ts, preview, text and user_id
+    (default id, source, ts, preview). The ETag follows the store version,
+    so a client sending it back in ``If-None-Match`` gets 304 until a
+    document is added or deleted.
+    """
+    store = _store()
+    # Read before the page: a write in between makes the tag stale, never the body.
+    tag = store.version
+    if request.if_none_match.contains(tag):
+        response = Response(status=304)
+    else:
+        try:
+            limit = min(int(request.args.get("limit") or DOCUMENTS_PAGE), DOCUMENTS_PAGE_MAX)
+            fields = [f.strip() for f in (request.args.get("fields") or "id,source,ts,preview").split(",") if f.strip()]
+            docs, cursor = store.page_documents(_user_id(), limit, request.args.get("after"), fields, PREVIEW_CHARS)
+        except ValueError as exc:
+            return jsonify({"error": "bad_request", "detail": str(exc)}), 400
+        response = jsonify({"documents": docs, "next": cursor})
+    response.set_etag(tag)
+    # Cacheable, but always revalidated.
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @app.route("/documents/<doc_id>", methods=["GET"])
+@_requires_warm("documents")
 def document_detail(doc_id: str) -> Any:
-    doc = _DOCUMENTS.get(doc_id)
+    doc = _store().get_document(doc_id, _user_id())
     if not doc:
         return jsonify({"error": "not_found"}), 404
     return jsonify(doc)
 
 
 @app.route("/documents/<doc_id>", methods=["DELETE"])
+@_requires_warm("documents")
 def delete_document(doc_id: str) -> Any:
-    if doc_id not in _DOCUMENTS:
+    partition = _user_id()
+    if not _store().delete([doc_id], user_id=partition):
         return jsonify({"status": "not_found"}), 404
-    _DOCUMENTS.pop(doc_id, None)
-    _VECTORS.pop(doc_id, None)
-    write_event({"type": "document_deleted", "id": doc_id})
-    _persist_documents()
+    write_event({"type": "document_deleted", "id": doc_id, "user_id": partition})
     return jsonify({"status": "deleted"})
 
 
+def _visible(event: events.Event, partition: str) -> bool:
+    """Events tagged with another partition's ``user_id`` (document changes and their audit entries) stay private."""
+    owner = event.data.get("user_id")
+    return owner is None or owner == partition
+
+
+@app.route("/events", methods=["GET"])
+def change_feed() -> Any:
+    """Server-sent change feed.
+
+    The stream opens with a ``status`` event (the ``/health`` body plus the
+    feed's ``epoch`` and current ``seq``), then carries ``document.indexed``,
+    ``document.deleted``, ``store.reloaded``, ``audit`` and ``ready`` events
+    as they happen, each with its sequence number as the SSE id. Document
+    events and document audit entries are limited to the caller's
+    partition, and the ``status`` document count is the partition's.
+
+    A client resumes with ``Last-Event-ID`` (or ``?since=``) and ``?epoch=``
+    and is sent what it missed. If those events have been dropped from the
+    feed's buffer, or the runtime restarted, it gets ``reset`` and should
+    reload its state.
+    """
+    feed = events.FEED
+    partition = _user_id()
+    host = request.host
+    raw = request.headers.get("Last-Event-ID") or request.args.get("since")
+    epoch = request.args.get("epoch")
+    try:
+        since = int(raw) if raw else None
+    except ValueError:
+        since = -1
+
+    def _events() -> Iterator[str]:
+        after = feed.last_seq
+        store = _store(wait=False)
+        documents = store.partition_stats(partition)["documents"] if store is not None else 0
+        yield _sse("status", {**_health(host), "documents": documents, "epoch": feed.epoch, "seq": after})
+        if since is not None:
+            if (epoch and epoch != feed.epoch) or since < 0:
+                yield _sse("reset", {"epoch": feed.epoch, "seq": after}, after)
+            else:
+                after = since
+        while True:
+            batch, gap = feed.read(after, EVENTS_HEARTBEAT)
+            if gap:
+                after = feed.last_seq
+                yield _sse("reset", {"epoch": feed.epoch, "seq": after}, after)
+                continue
+            if not batch:
+                yield ": ping\n\n"
+                continue
+            for event in batch:
+                after = event.seq
+                if _visible(event, partition):
+                    yield _sse(event.kind, event.data, event.seq)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(_events(), mimetype="text/event-stream", headers=headers)
+
+
 @app.route("/audit", methods=["GET", "POST"])
 def audit() -> Any:
     if request.method == "POST":